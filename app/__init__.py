@@ -1,16 +1,42 @@
-from flask import Flask, render_template, redirect, url_for, session, request, flash
-from authlib.integrations.flask_client import OAuth
-from flask_sqlalchemy import SQLAlchemy
-from flask_socketio import SocketIO
-from app.models import db, User, FoodLog, CalorieEntry, ExerciseLog, ChatRoom, ChatMessage, ChatParticipant, ExerciseSetLog, UserExerciseTarget, EnergyBurnEntry, UserProfile, init_db
-from app.exercises import EXERCISE_DATABASE, get_workout_plan, get_all_exercises
-from app.chat import init_chat
 import os
-from datetime import datetime, date
 from dotenv import load_dotenv
 
+# Several app modules read their settings from the environment at import time, so .env goes in first
 load_dotenv()
 
+if os.environ.get('SOCKETIO_ASYNC_MODE') == 'eventlet':
+    # Before anything imports socket/threading; a no-op when gunicorn's eventlet worker already did it
+    import eventlet
+    eventlet.monkey_patch()
+
+from flask import Flask, render_template, redirect, url_for, session, request, flash, stream_with_context, abort
+from authlib.integrations.flask_client import OAuth
+from flask_sqlalchemy import SQLAlchemy
+from flask_socketio import SocketIO
+from app.models import db, User, FoodLog, CalorieEntry, ExerciseLog, ChatRoom, ChatMessage, ChatParticipant, ExerciseSetLog, UserExerciseTarget, EnergyBurnEntry, UserProfile, ImportJob, init_db
+from app.catalog import get_catalog
+from app.exercise_search import search_exercises, search_limit, invalidate_user_exercises
+from app.chat import init_chat
+from app.chat_history import history_page, page_size
+from app.dbpool import engine_options, pool_stats
+from app.profiler import init_profiler, endpoint_stats
+from app.metrics import init_metrics
+from app.socketio_queue import socketio_options
+from app.identity import get_identity, invalidate_identity
+from app.exercise_stats import target_adherence, exercise_averages
+from app.rollups import summary_for, exercise_summary_stats
+from app.workouts import parse_exercise, save_exercises
+from app.entries import (parse_food_form, parse_calories_form, parse_neat_form, parse_exercise_form,
+                         save_food, save_calories, save_energy_burns)
+from app.sync import sync_entries, SYNC_MAX_ITEMS
+from app.export import RECORDS as EXPORT_RECORDS, FORMATS as EXPORT_FORMATS, ndjson_lines, csv_lines
+from app.imports import create_import, run_import, job_status, IMPORT_MAX_BYTES
+from app.progress import progress as exercise_progress, window_days, FORMULAS as E1RM_FORMULAS, MAX_LOOKBACK_DAYS
+from app.trends import trends as trend_series, trend_points, RESOLUTIONS as TREND_RESOLUTIONS, MAX_RANGE_DAYS as TREND_MAX_DAYS
+from app.personal_records import records_for, record_logs, notice as record_notice, describe as describe_record
+from app.dateranges import current_timezone, local_now, today_range, month_to_date_range
+from datetime import date, datetime, timedelta
+
 def create_app():
     # Resolve template/static directories to work in both Docker (/app) and local dev
     container_tpl = '/app/templates'
@@ -35,12 +61,22 @@ def create_app():
 
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+
+    # Fallback timezone for "today" when the browser hasn't sent one
+    app.config['APP_TIMEZONE'] = os.environ.get('APP_TIMEZONE')
 
     # Initialize database
     db.init_app(app)
 
-    # Initialize SocketIO
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+    # Per-request query counts and timings (see /debug/db)
+    init_profiler(app)
+
+    # Prometheus metrics at /metrics
+    init_metrics(app, db)
+
+    # Initialize SocketIO (message queue and async mode come from SOCKETIO_* env vars)
+    socketio = SocketIO(app, **socketio_options())
 
     # Fix redirect URI for HTTPS behind reverse proxy
     from werkzeug.middleware.proxy_fix import ProxyFix
@@ -63,13 +99,27 @@ def create_app():
 
 app, google, socketio = create_app()
 
+# The built-in catalog (used until the catalog tables are seeded) changes only with a deploy
+APP_STARTED = datetime.utcnow().replace(microsecond=0)
+CATALOG_MAX_AGE = int(os.environ.get('CATALOG_MAX_AGE_S', '300'))
+
 # Add offline page route
 @app.route('/offline')
 def offline():
     return render_template('offline.html')
 
+def debug_only(f):
+    """Hide a diagnostics route (404) unless the app runs in debug mode (FLASK_DEBUG=1)"""
+    def decorated_function(*args, **kwargs):
+        if not app.debug:
+            abort(404)
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
 # Add debug route for database connection
 @app.route('/debug/db')
+@debug_only
 def debug_db():
     try:
         # Test database connection
@@ -89,18 +139,27 @@ def debug_db():
 
         return {
             'database_connection': 'OK',
+            'dialect': db.engine.dialect.name,
             'test_query': test_result[0] if test_result else None,
             'user_count': user_count,
             'session': session_info,
-            'database_url': app.config['SQLALCHEMY_DATABASE_URI']
+            'pool': pool_stats(db.engine),
+            # Totals for this worker since it started
+            'endpoints': endpoint_stats()
         }
     except Exception as e:
         return {
             'database_connection': 'ERROR',
-            'error': str(e),
-            'database_url': app.config['SQLALCHEMY_DATABASE_URI']
+            'error': e.__class__.__name__,
+            'endpoints': endpoint_stats()
         }
 
+# Per-worker connection pool usage; production reads the same numbers from /metrics
+@app.route('/debug/pool')
+@debug_only
+def debug_pool():
+    return pool_stats(db.engine)
+
 def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
@@ -110,6 +169,15 @@ def login_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def api_login_required(f):
+    """Like login_required, but answers JSON endpoints with a 401 instead of a redirect"""
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return {'error': 'Not authenticated'}, 401
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
 # Add settings page route
 @app.route('/settings')
 @login_required
@@ -121,11 +189,44 @@ def settings():
 def chat():
     return render_template('chat.html')
 
+@app.route('/api/chat/rooms/<room_name>/messages')
+@api_login_required
+def api_chat_history(room_name):
+    """Older chat messages, paged with ?before=<cursor>&limit=<n>"""
+    room = ChatRoom.query.filter_by(name=room_name, is_active=True).first()
+    if not room:
+        return {'error': 'Room not found'}, 404
+    try:
+        page = history_page(room.id, before=request.args.get('before'), limit=page_size(request.args.get('limit')))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    return dict(room=room_name, **page)
+
+@app.route('/api/catalog')
+def api_catalog():
+    """The exercise catalog; clients revalidate with If-None-Match / If-Modified-Since"""
+    catalog = get_catalog()
+    response = app.response_class(catalog.catalog_json, mimetype='application/json')
+    response.set_etag(catalog.etag)
+    response.last_modified = catalog.updated_at or APP_STARTED
+    response.cache_control.public = True
+    response.cache_control.max_age = CATALOG_MAX_AGE
+    return response.make_conditional(request)
+
+@app.route('/api/exercises/search')
+@api_login_required
+def api_exercise_search():
+    """Exercise name suggestions for ?q=, from the catalog and the user's own history"""
+    query = request.args.get('q', '')
+    results = search_exercises(session['user_id'], query, limit=search_limit(request.args.get('limit')))
+    return {'query': query, 'results': results}
+
 
 def get_current_user():
+    """Cached Identity for the logged-in user (not an ORM object)"""
     if 'user_id' not in session:
         return None
-    return User.query.get(session['user_id'])
+    return get_identity(session['user_id'])
 
 @app.route('/')
 def index():
@@ -135,9 +236,11 @@ def index():
 @login_required
 def food():
     user = get_current_user()
+    day_start, day_end = today_range(current_timezone())
     today_food = FoodLog.query.filter(
         FoodLog.user_id == user.id,
-        db.func.date(FoodLog.meal_time) == date.today()
+        FoodLog.meal_time >= day_start,
+        FoodLog.meal_time < day_end
     ).order_by(FoodLog.meal_time.desc()).all()
     return render_template('food.html', food_logs=today_food)
 
@@ -145,30 +248,13 @@ def food():
 @login_required
 def add_food():
     user = get_current_user()
-    meal_type = request.form.get('meal-type')
-    food_name = request.form.get('food-name')
-    portion_size = request.form.get('portion-size')
-    meal_time_str = request.form.get('meal-time')
-
-    if not all([meal_type, food_name, portion_size, meal_time_str]):
-        flash('All fields are required.', 'error')
-        return redirect(url_for('food'))
-
     try:
-        meal_time = datetime.fromisoformat(meal_time_str.replace('T', ' '))
-    except ValueError:
-        meal_time = datetime.now()
-
-    food_log = FoodLog(
-        user_id=user.id,
-        meal_type=meal_type,
-        food_name=food_name,
-        portion_size=portion_size,
-        meal_time=meal_time,
-        notes=request.form.get('notes', '')
-    )
+        entry = parse_food_form(request.form, current_timezone())
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('food'))
 
-    db.session.add(food_log)
+    save_food(user.id, [entry])
     db.session.commit()
     flash('Food logged successfully!', 'success')
     return redirect(url_for('food'))
@@ -177,23 +263,26 @@ def add_food():
 @login_required
 def calories():
     user = get_current_user()
+    day_start, day_end = today_range(current_timezone())
     today_calories = CalorieEntry.query.filter(
         CalorieEntry.user_id == user.id,
-        db.func.date(CalorieEntry.entry_time) == date.today()
+        CalorieEntry.entry_time >= day_start,
+        CalorieEntry.entry_time < day_end
     ).order_by(CalorieEntry.entry_time.desc()).all()
 
     # Energy burned today (NEAT/Cardio/Exercise)
     today_burns = EnergyBurnEntry.query.filter(
         EnergyBurnEntry.user_id == user.id,
-        db.func.date(EnergyBurnEntry.entry_time) == date.today()
+        EnergyBurnEntry.entry_time >= day_start,
+        EnergyBurnEntry.entry_time < day_end
     ).order_by(EnergyBurnEntry.entry_time.desc()).all()
 
-    total_calories = sum(entry.calories for entry in today_calories)
-    burned_calories = sum(b.calories_burned for b in today_burns)
+    summary = summary_for(user.id, day_start.date())
+    total_calories = summary.calories_in if summary else 0
+    burned_calories = summary.calories_burned if summary else 0
 
     # Daily goal from profile if available
-    profile = UserProfile.query.filter_by(user_id=user.id).first()
-    daily_goal = profile.daily_calorie_goal if profile and profile.daily_calorie_goal else 2000
+    daily_goal = user.calorie_goal
     net_calories = total_calories - burned_calories
 
     return render_template('calories.html',
@@ -208,29 +297,13 @@ def calories():
 @login_required
 def add_calories():
     user = get_current_user()
-    food_item = request.form.get('food-item')
-    calories = request.form.get('calories')
-    quantity = request.form.get('quantity')
-
-    if not all([food_item, calories, quantity]):
-        flash('All fields are required.', 'error')
-        return redirect(url_for('calories'))
-
     try:
-        calories = int(calories)
-    except ValueError:
-        flash('Calories must be a number.', 'error')
+        entry = parse_calories_form(request.form, current_timezone())
+    except ValueError as e:
+        flash(str(e), 'error')
         return redirect(url_for('calories'))
 
-    calorie_entry = CalorieEntry(
-        user_id=user.id,
-        food_item=food_item,
-        calories=calories,
-        quantity=quantity,
-        notes=request.form.get('notes', '')
-    )
-
-    db.session.add(calorie_entry)
+    save_calories(user.id, [entry])
     db.session.commit()
     flash('Calories logged successfully!', 'success')
     return redirect(url_for('calories'))
@@ -240,48 +313,28 @@ def add_calories():
 @login_required
 def neat():
     user = get_current_user()
+    day_start, day_end = today_range(current_timezone())
     today_burns = EnergyBurnEntry.query.filter(
         EnergyBurnEntry.user_id == user.id,
-        db.func.date(EnergyBurnEntry.entry_time) == date.today()
+        EnergyBurnEntry.entry_time >= day_start,
+        EnergyBurnEntry.entry_time < day_end
     ).order_by(EnergyBurnEntry.entry_time.desc()).all()
-    return render_template('neat.html', energy_burns=today_burns)
+    summary = summary_for(user.id, day_start.date())
+    return render_template('neat.html',
+                         energy_burns=today_burns,
+                         burned_total=summary.calories_burned if summary else 0)
 
 @app.route('/add_neat', methods=['POST'])
 @login_required
 def add_neat():
     user = get_current_user()
-    source = request.form.get('source') or 'neat'
-    activity_name = request.form.get('activity-name')
-    calories_burned = request.form.get('calories-burned')
-    duration = request.form.get('duration-minutes')
-    entry_time_str = request.form.get('entry-time')
-    notes = request.form.get('notes', '')
-
-    if not all([activity_name, calories_burned]):
-        flash('Activity and calories burned are required.', 'error')
-        return redirect(url_for('neat'))
-
     try:
-        calories_burned = int(calories_burned)
-        duration_minutes = float(duration) if duration else None
-        if entry_time_str:
-            entry_time = datetime.fromisoformat(entry_time_str.replace('T', ' '))
-        else:
-            entry_time = datetime.now()
-    except ValueError:
-        flash('Invalid input for calories or duration.', 'error')
+        entry = parse_neat_form(request.form, current_timezone())
+    except ValueError as e:
+        flash(str(e), 'error')
         return redirect(url_for('neat'))
 
-    burn = EnergyBurnEntry(
-        user_id=user.id,
-        source=source,
-        activity_name=activity_name,
-        calories_burned=calories_burned,
-        duration_minutes=duration_minutes,
-        entry_time=entry_time,
-        notes=notes
-    )
-    db.session.add(burn)
+    save_energy_burns(user.id, [entry])
     db.session.commit()
     flash('Energy burn logged successfully!', 'success')
     return redirect(url_for('neat'))
@@ -294,301 +347,225 @@ def exercise():
         flash('Session expired. Please log in again.', 'error')
         return redirect(url_for('login'))
 
+    tz = current_timezone()
+    day_start, day_end = today_range(tz)
     today_exercise = ExerciseLog.query.filter(
         ExerciseLog.user_id == user.id,
-        db.func.date(ExerciseLog.workout_time) == date.today()
+        ExerciseLog.workout_time >= day_start,
+        ExerciseLog.workout_time < day_end
     ).order_by(ExerciseLog.workout_time.desc()).all()
 
     # Get previous exercises for quick copy
     previous_exercises = ExerciseLog.query.filter(
         ExerciseLog.user_id == user.id,
-        ExerciseLog.workout_time < datetime.now()
+        ExerciseLog.workout_time < local_now(tz)
     ).order_by(ExerciseLog.workout_time.desc()).limit(10).all()
 
-    # Calculate monthly stats and trends (from start of current month)
-    week_start = date.today().replace(day=1)  # Simple: start of month
-    week_exercises = ExerciseLog.query.filter(
-        ExerciseLog.user_id == user.id,
-        ExerciseLog.workout_time >= week_start
-    ).all()
-
-    total_workouts = len(set(ex.workout_time.date() for ex in week_exercises))
-    total_sets = sum(ex.sets for ex in week_exercises)
-    total_reps = sum(ex.reps for ex in week_exercises)
-    max_weight = max((ex.weight for ex in week_exercises if ex.weight), default=0)
-
-    # New quantitative stats (prefer set-level if available)
-    set_form_scores = []
-    set_effort_scores = []
-    set_quality_scores = []
-    total_volume = 0
-    for ex in week_exercises:
-        if ex.sets_detail:
-            for s in ex.sets_detail:
-                if s.form_score is not None:
-                    set_form_scores.append(s.form_score)
-                if s.effort_score is not None:
-                    set_effort_scores.append(s.effort_score)
-                if s.quality_score is not None:
-                    set_quality_scores.append(s.quality_score)
-                if s.weight is not None:
-                    try:
-                        total_volume += (s.reps or 0) * float(s.weight)
-                    except Exception:
-                        pass
-        else:
-            # Fallback to exercise-level
-            if ex.form_score is not None:
-                set_form_scores.append(ex.form_score)
-            if ex.effort_score is not None:
-                set_effort_scores.append(ex.effort_score)
-            if ex.form_score is not None and ex.effort_score is not None:
-                set_quality_scores.append(ex.form_score * (ex.effort_score / 10.0))
-            if ex.weight is not None:
-                try:
-                    total_volume += (ex.sets or 0) * (ex.reps or 0) * float(ex.weight)
-                except Exception:
-                    pass
-
-    avg_form = round(sum(set_form_scores) / len(set_form_scores), 1) if set_form_scores else 0
-    avg_effort = round(sum(set_effort_scores) / len(set_effort_scores), 1) if set_effort_scores else 0
-
-    # Build trends per day for current month
-    from datetime import timedelta
-    day = week_start
-    today = date.today()
-    trend_labels = []
-    trend_form = []
-    trend_effort = []
-    trend_quality = []
-    trend_volume = []
-
-    while day <= today:
-        # Collect logs for this day
-        day_logs = [ex for ex in week_exercises if ex.workout_time.date() == day]
-        day_form, day_effort, day_quality, day_volume = [], [], [], 0
-        for ex in day_logs:
-            if ex.sets_detail:
-                for s in ex.sets_detail:
-                    if s.form_score is not None:
-                        day_form.append(s.form_score)
-                    if s.effort_score is not None:
-                        day_effort.append(s.effort_score)
-                    if s.quality_score is not None:
-                        day_quality.append(s.quality_score)
-                    if s.weight is not None:
-                        try:
-                            day_volume += (s.reps or 0) * float(s.weight)
-                        except Exception:
-                            pass
-            else:
-                if ex.form_score is not None:
-                    day_form.append(ex.form_score)
-                if ex.effort_score is not None:
-                    day_effort.append(ex.effort_score)
-                if ex.form_score is not None and ex.effort_score is not None:
-                    day_quality.append(ex.form_score * (ex.effort_score / 10.0))
-                if ex.weight is not None:
-                    try:
-                        day_volume += (ex.sets or 0) * (ex.reps or 0) * float(ex.weight)
-                    except Exception:
-                        pass
-        trend_labels.append(day.strftime('%m/%d'))
-        trend_form.append(round(sum(day_form) / len(day_form), 2) if day_form else None)
-        trend_effort.append(round(sum(day_effort) / len(day_effort), 2) if day_effort else None)
-        trend_quality.append(round(sum(day_quality) / len(day_quality), 2) if day_quality else None)
-        trend_volume.append(int(day_volume))
-        day += timedelta(days=1)
-
-    # Targets adherence
-    targets = UserExerciseTarget.query.filter_by(user_id=user.id).all()
-    target_cards = []
-    if targets:
-        for t in targets:
-            total_sets = 0
-            meets = 0
-            for ex in week_exercises:
-                if ex.exercise_name == t.exercise_name:
-                    if ex.sets_detail:
-                        for s in ex.sets_detail:
-                            total_sets += 1
-                            ok_form = (t.min_form_score is None) or (s.form_score is not None and s.form_score >= t.min_form_score)
-                            ok_effort = True
-                            if t.effort_min is not None:
-                                ok_effort = ok_effort and (s.effort_score is not None and s.effort_score >= t.effort_min)
-                            if t.effort_max is not None:
-                                ok_effort = ok_effort and (s.effort_score is not None and s.effort_score <= t.effort_max)
-                            if ok_form and ok_effort:
-                                meets += 1
-                    else:
-                        total_sets += ex.sets or 1
-                        # Consider the whole exercise as a single check scaled by number of sets
-                        ok_form = (t.min_form_score is None) or (ex.form_score is not None and ex.form_score >= t.min_form_score)
-                        ok_effort = True
-                        if t.effort_min is not None:
-                            ok_effort = ok_effort and (ex.effort_score is not None and ex.effort_score >= t.effort_min)
-                        if t.effort_max is not None:
-                            ok_effort = ok_effort and (ex.effort_score is not None and ex.effort_score <= t.effort_max)
-                        if ok_form and ok_effort:
-                            meets += (ex.sets or 1)
-            adherence = round((meets / total_sets) * 100, 1) if total_sets else 0
-            target_cards.append({
-                'exercise_name': t.exercise_name,
-                'adherence': adherence,
-                'min_form_score': t.min_form_score,
-                'effort_min': t.effort_min,
-                'effort_max': t.effort_max,
-            })
+    # Monthly stats and trends come from the daily rollup; target adherence is aggregated in SQL
+    month_start, month_end = month_to_date_range(tz)
+    stats = exercise_summary_stats(user.id, month_start.date(), month_end.date())
+    stats['targets'] = target_adherence(user.id, month_start, month_end)
 
     # Derived per-exercise (today) averages for display
-    derived = {}
-    for ex in today_exercise:
-        forms, efforts, qualities = [], [], []
-        if ex.sets_detail:
-            for s in ex.sets_detail:
-                if s.form_score is not None:
-                    forms.append(s.form_score)
-                if s.effort_score is not None:
-                    efforts.append(s.effort_score)
-                if s.quality_score is not None:
-                    qualities.append(s.quality_score)
-        else:
-            if ex.form_score is not None:
-                forms.append(ex.form_score)
-            if ex.effort_score is not None:
-                efforts.append(ex.effort_score)
-            if ex.form_score is not None and ex.effort_score is not None:
-                qualities.append(ex.form_score * (ex.effort_score / 10.0))
-        derived[ex.id] = {
-            'avg_form': round(sum(forms) / len(forms), 1) if forms else None,
-            'avg_effort': round(sum(efforts) / len(efforts), 1) if efforts else None,
-            'avg_quality': round(sum(qualities) / len(qualities), 2) if qualities else None,
-        }
+    derived = exercise_averages(today_exercise)
 
     return render_template('exercise.html',
                          exercise_logs=today_exercise,
                          previous_exercises=previous_exercises,
-                         workout_a=EXERCISE_DATABASE.get('workout_a'),
-                         workout_b=EXERCISE_DATABASE.get('workout_b'),
-                         all_exercises=get_all_exercises(),
-                         stats={
-                             'workouts': total_workouts,
-                             'sets': total_sets,
-                             'reps': total_reps,
-                             'max_weight': max_weight,
-                             'avg_form': avg_form,
-                             'avg_effort': avg_effort,
-                             'volume': int(total_volume),
-                             'trend_labels': trend_labels,
-                             'trend_form': trend_form,
-                             'trend_effort': trend_effort,
-                             'trend_quality': trend_quality,
-                             'trend_volume': trend_volume,
-                             'targets': target_cards,
-                         },
-                         derived=derived)
+                         stats=stats,
+                         derived=derived,
+                         record_log_ids=record_logs(user.id, [log.id for log in today_exercise]))
 
 @app.route('/add_exercise', methods=['POST'])
 @login_required
 def add_exercise():
     user = get_current_user()
-    exercise_name = request.form.get('exercise-name')
-    exercise_type = request.form.get('exercise-type')
-    sets = request.form.get('sets')
-    reps = request.form.get('reps')
-    weight = request.form.get('weight')
-    form_score = request.form.get('form-score')
-    effort_score = request.form.get('effort-score')
-    workout_time_str = request.form.get('workout-time')
-    duration_minutes = request.form.get('duration-minutes')
-    calories_burned = request.form.get('calories-burned')
-
-    if not all([exercise_name, exercise_type, sets, reps, workout_time_str]):
-        flash('All fields except weight are required.', 'error')
-        return redirect(url_for('exercise'))
-
     try:
-        sets = int(sets)
-        reps = int(reps)
-        weight = float(weight) if weight else None
-        workout_time = datetime.fromisoformat(workout_time_str.replace('T', ' '))
-
-        # Optional scoring fields with validation
-        form_score = int(form_score) if form_score else None
-        effort_score = int(effort_score) if effort_score else None
-        if form_score is not None and not (1 <= form_score <= 5):
-            raise ValueError('Form score must be between 1 and 5')
-        if effort_score is not None and not (1 <= effort_score <= 10):
-            raise ValueError('Effort score must be between 1 and 10')
+        entry = parse_exercise_form(request.form, current_timezone())
     except ValueError as e:
-        flash(f'Invalid input: {str(e)}', 'error')
+        flash(str(e), 'error')
         return redirect(url_for('exercise'))
 
-    exercise_log = ExerciseLog(
-        user_id=user.id,
-        exercise_name=exercise_name,
-        exercise_type=exercise_type,
-        sets=sets,
-        reps=reps,
-        weight=weight,
-        form_score=form_score,
-        effort_score=effort_score,
-        workout_time=workout_time,
-        notes=request.form.get('notes', '')
-    )
-
-    db.session.add(exercise_log)
+    # Log, sets and optional energy burn are written in a single transaction
+    new_records = []
+    save_exercises(user.id, [entry], new_records)
     db.session.commit()
+    flash('Exercise logged successfully!', 'success')
+    beaten = [describe_record(record) for record in new_records if record['previous'] is not None]
+    if beaten:
+        flash('New personal record! ' + '; '.join(beaten), 'success')
+    return redirect(url_for('exercise'))
 
-    # Create per-set entries with defaults using provided reps/weight/form/effort
-    # This allows later edit of each set individually if needed
-    for i in range(1, (sets or 0) + 1):
-        q = None
-        if form_score is not None and effort_score is not None:
-            q = round(form_score * (effort_score / 10.0), 2)
-        set_log = ExerciseSetLog(
-            exercise_log_id=exercise_log.id,
-            set_number=i,
-            reps=reps,
-            weight=weight,
-            form_score=form_score,
-            effort_score=effort_score,
-            quality_score=q,
-        )
-        db.session.add(set_log)
+@app.route('/api/workouts', methods=['POST'])
+@api_login_required
+def api_log_workout():
+    """Log a whole workout (many exercises, each with its sets) in one request"""
+    user = get_current_user()
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return {'error': 'expected a JSON object with an exercises list'}, 400
+    exercises = payload.get('exercises')
+    if not isinstance(exercises, list) or not exercises:
+        return {'error': 'exercises must be a non-empty list'}, 400
+
+    tz = current_timezone()
+    entries = []
+    for i, item in enumerate(exercises):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('each exercise must be an object')
+            entries.append(parse_exercise(item, default_time=payload.get('workout_time'), tz=tz))
+        except (TypeError, ValueError, OverflowError) as e:
+            # OverflowError: JSON Infinity as a count (int(inf))
+            return {'error': f'exercises[{i}]: {str(e)}'}, 400
+
+    new_records = []
+    exercise_ids = [log.id for log in save_exercises(user.id, entries, new_records)]
     db.session.commit()
-    # Optionally create an energy burn entry when provided
+    return {
+        'logged': len(exercise_ids),
+        'exercise_ids': exercise_ids,
+        'sets': sum(entry['sets'] for entry in entries),
+        'personal_records': [record_notice(record) for record in new_records],
+    }, 201
+
+@app.route('/api/sync', methods=['POST'])
+@api_login_required
+def api_sync():
+    """Save entries queued while offline in one transaction; safe to retry with the same keys"""
+    payload = request.get_json(silent=True)
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return {'error': 'items must be a non-empty list'}, 400
+    if len(items) > SYNC_MAX_ITEMS:
+        return {'error': f'at most {SYNC_MAX_ITEMS} items per request'}, 413
+
+    results = sync_entries(session['user_id'], items, current_timezone())
+    counts = {'created': 0, 'duplicate': 0, 'error': 0, 'retry': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return {'results': results, **counts}
+
+@app.route('/export')
+@login_required
+def export():
+    """Download the user's full history: ?format=ndjson (everything) or ?format=csv&record=<kind>"""
+    fmt = request.args.get('format', 'ndjson')
+    record = request.args.get('record')
+    if fmt not in EXPORT_FORMATS:
+        return {'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}, 400
+    if record is not None and record not in EXPORT_RECORDS:
+        return {'error': f"record must be one of {', '.join(EXPORT_RECORDS)}"}, 400
+    if fmt == 'csv' and record is None:
+        return {'error': f"CSV exports one record kind at a time; add record=<{'|'.join(EXPORT_RECORDS)}>"}, 400
+
+    user_id = session['user_id']
+    if fmt == 'csv':
+        body, mimetype = csv_lines(user_id, record), 'text/csv'
+    else:
+        body, mimetype = ndjson_lines(user_id, [record] if record else None), 'application/x-ndjson'
+    filename = f"fitness-{record or 'history'}-{local_now(current_timezone()).date().isoformat()}.{fmt}"
+    response = app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    # Don't let a buffering proxy hold the whole export in memory
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/imports', methods=['POST'])
+@api_login_required
+def api_import_create():
+    """Start importing an uploaded CSV/JSON file (multipart: file, kind, optional format)"""
+    if request.content_length and request.content_length > IMPORT_MAX_BYTES + 64 * 1024:
+        return {'error': f'File is larger than {IMPORT_MAX_BYTES // (1024 * 1024)} MB'}, 413
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return {'error': 'file is required'}, 400
     try:
-        if calories_burned:
-            cb = int(calories_burned)
-            dur = float(duration_minutes) if duration_minutes else None
-            if cb > 0:
-                eb = EnergyBurnEntry(
-                    user_id=user.id,
-                    source='exercise',
-                    activity_name=exercise_name,
-                    calories_burned=cb,
-                    duration_minutes=dur,
-                    entry_time=workout_time,
-                    notes=f'Logged via exercise form ({exercise_type})'
-                )
-                db.session.add(eb)
-                db.session.commit()
-    except Exception:
-        # Do not block exercise logging due to energy burn issues
-        pass
-    flash('Exercise logged successfully!', 'success')
-    return redirect(url_for('exercise'))
+        job, path = create_import(session['user_id'], request.form.get('kind'), request.form.get('format'), upload)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    db.session.commit()
+    socketio.start_background_task(run_import, app, job.id, path)
+    return job_status(job), 202, {'Location': url_for('api_import_status', job_id=job.id)}
+
+@app.route('/api/imports')
+@api_login_required
+def api_imports():
+    """The user's recent imports, newest first"""
+    jobs = ImportJob.query.filter_by(user_id=session['user_id']).order_by(ImportJob.created_at.desc()).limit(20)
+    return {'imports': [job_status(job) for job in jobs]}
+
+@app.route('/api/imports/<int:job_id>')
+@api_login_required
+def api_import_status(job_id):
+    job = ImportJob.query.filter_by(id=job_id, user_id=session['user_id']).first()
+    if not job:
+        return {'error': 'Import not found'}, 404
+    return job_status(job)
+
+@app.route('/api/progress/<path:exercise_name>')
+@api_login_required
+def api_progress(exercise_name):
+    """e1RM, volume, rolling averages and PRs per session; ?days=<lookback>&window=<days>&formula=epley|brzycki"""
+    formula = request.args.get('formula', 'epley')
+    if formula not in E1RM_FORMULAS:
+        return {'error': f"formula must be one of {', '.join(E1RM_FORMULAS)}"}, 400
+    start = None
+    if request.args.get('days'):
+        try:
+            days = int(request.args['days'])
+        except ValueError:
+            return {'error': 'days must be a number'}, 400
+        days = max(1, min(days, MAX_LOOKBACK_DAYS))
+        start = datetime.combine(local_now(current_timezone()).date() - timedelta(days=days - 1), datetime.min.time())
+    result = exercise_progress(session['user_id'], exercise_name, start=start,
+                               window=window_days(request.args.get('window')), formula=formula)
+    if result is None:
+        return {'error': 'No sets logged for this exercise'}, 404
+    return result
+
+@app.route('/api/records')
+@api_login_required
+def api_records():
+    """Current personal records, for every exercise or just ?exercise="""
+    exercise_name = (request.args.get('exercise') or '').strip() or None
+    return {'records': records_for(session['user_id'], exercise_name)}
+
+@app.route('/api/trends')
+@api_login_required
+def api_trends():
+    """Bucketed trends; ?resolution=day|week|month|year, ?start=&end= (YYYY-MM-DD) or ?days=, ?points="""
+    resolution = request.args.get('resolution', 'day')
+    if resolution not in TREND_RESOLUTIONS:
+        return {'error': f"resolution must be one of {', '.join(TREND_RESOLUTIONS)}"}, 400
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else local_now(current_timezone()).date()
+        if request.args.get('start'):
+            start = date.fromisoformat(request.args['start'])
+        else:
+            days = max(1, min(int(request.args.get('days', 30)), TREND_MAX_DAYS))
+            start = end - timedelta(days=days - 1)
+    except (ValueError, OverflowError):
+        # OverflowError: a range reaching back before year 1
+        return {'error': 'start and end must be dates (YYYY-MM-DD) and days a number'}, 400
+    if start > end:
+        return {'error': 'start must not be after end'}, 400
+    if (end - start).days >= TREND_MAX_DAYS:
+        return {'error': f'the range may cover at most {TREND_MAX_DAYS} days'}, 400
+    return trend_series(session['user_id'], start, end, resolution, trend_points(request.args.get('points')))
 
 # Calculator page for BMR/TDEE and profile settings
 @app.route('/calculator', methods=['GET', 'POST'])
 @login_required
 def calculator():
     user = get_current_user()
-    profile = UserProfile.query.filter_by(user_id=user.id).first()
+    # Identity carries the profile fields the form needs
+    profile = user
 
     result = None
     if request.method == 'POST':
+        profile = UserProfile.query.filter_by(user_id=user.id).first()
         sex = request.form.get('sex') or (profile.sex if profile else None)
         age = request.form.get('age')
         weight_kg = request.form.get('weight_kg')
@@ -637,6 +614,7 @@ def calculator():
         elif tdee:
             profile.daily_calorie_goal = int(tdee)
         db.session.commit()
+        invalidate_identity(user.id)
 
         result = {
             'bmr': int(bmr) if bmr is not None else None,
@@ -685,6 +663,7 @@ def add_target():
     )
     db.session.add(target)
     db.session.commit()
+    invalidate_user_exercises(user.id)
     flash('Target added successfully!', 'success')
     return redirect(url_for('exercise'))
 @app.route('/login')
@@ -728,6 +707,7 @@ def authorize():
             user.name = user_info.get('name', '')
             user.profile_picture = user_info.get('picture')
             db.session.commit()
+            invalidate_identity(user.id)
 
         # Verify user was saved properly
         if not user.id:
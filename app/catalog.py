@@ -0,0 +1,198 @@
+"""
+The exercise catalog, read from the database.
+
+Exercises, muscles and workout templates live in tables (seeded from
+app.exercises.EXERCISE_DATABASE by migration 009), so changing the catalog is
+a data change rather than a deploy. Each worker keeps the compiled catalog in
+memory and checks the one-row catalog_version table at most every
+CATALOG_CHECK_S seconds, reloading when the version has moved. Anything that
+edits the catalog tables must call bump_catalog_version() in the same
+transaction (or run UPDATE catalog_version SET version = version + 1).
+
+/api/catalog serves the compiled JSON with an ETag derived from the version
+and contents, so browsers and the service worker revalidate with a 304.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app.exercises import BUILTIN_CATALOG, CompiledCatalog, plan_names
+from app.metrics import record_cache
+from app.models import (db, CatalogVersion, Exercise, ExerciseAlternative, Muscle, WorkoutTemplate,
+                        WorkoutTemplateExercise, exercise_muscle)
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHECK = int(os.environ.get('CATALOG_CHECK_S', '30'))
+
+_lock = threading.Lock()
+_cached = {'catalog': None, 'checked': 0.0}
+
+
+def catalog_rows(database):
+    """Rows for the catalog tables describing a catalog in EXERCISE_DATABASE's shape
+
+    Returns {table name: [row dicts]} with explicit ids, for seeding empty tables.
+    An exercise's muscles come from where it is a primary (or standalone) exercise,
+    falling back to the slot it is first an alternative in.
+    """
+    exercises, muscles, links = {}, {}, {}
+
+    def exercise_id(name, exercise_type, target_muscles, owns_muscles, default_sets=None, default_reps=None):
+        row = exercises.get(name)
+        if row is None:
+            row = exercises[name] = {'id': len(exercises) + 1, 'name': name, 'exercise_type': exercise_type,
+                                     'default_sets': default_sets, 'default_reps': default_reps,
+                                     'is_active': True}
+        if owns_muscles or row['id'] not in links:
+            links[row['id']] = [muscle_id(m) for m in target_muscles]
+        return row['id']
+
+    def muscle_id(name):
+        if name not in muscles:
+            muscles[name] = {'id': len(muscles) + 1, 'name': name}
+        return muscles[name]['id']
+
+    templates, slots, alternatives = [], [], []
+    # Primaries first so they own their muscle lists
+    for slug in plan_names(database):
+        for slot in database[slug]['exercises']:
+            exercise_id(slot['primary'], slot['type'], slot['target_muscles'], True)
+    for position, slug in enumerate(plan_names(database)):
+        plan = database[slug]
+        templates.append({'id': position + 1, 'slug': slug, 'name': plan['name'],
+                          'description': plan.get('description'), 'position': position, 'is_active': True})
+        for slot_position, slot in enumerate(plan['exercises']):
+            slot_id = len(slots) + 1
+            slots.append({'id': slot_id, 'template_id': position + 1, 'position': slot_position,
+                          'exercise_id': exercises[slot['primary']]['id'], 'category': slot['category'],
+                          'sets': slot['sets'], 'reps': slot['reps']})
+            for alt_position, alt in enumerate(slot['alternatives']):
+                alternatives.append({
+                    'id': len(alternatives) + 1, 'slot_id': slot_id, 'position': alt_position, 'note': alt.get('note'),
+                    'exercise_id': exercise_id(alt['name'], slot['type'], slot['target_muscles'], False),
+                })
+    for group, entries in database.items():
+        if isinstance(entries, list):
+            for entry in entries:
+                exercise_id(entry['name'], entry['type'], entry['target_muscles'], True,
+                            entry.get('sets'), entry.get('suggested_reps'))
+
+    return {
+        'exercise': list(exercises.values()),
+        'muscle': list(muscles.values()),
+        'exercise_muscle': [{'exercise_id': ex_id, 'muscle_id': m_id, 'position': i}
+                            for ex_id, muscle_ids in links.items() for i, m_id in enumerate(muscle_ids)],
+        'workout_template': templates,
+        'workout_template_exercise': slots,
+        'exercise_alternative': alternatives,
+        'catalog_version': [{'id': 1, 'version': 1, 'updated_at': datetime.utcnow()}],
+    }
+
+
+def load_catalog_database():
+    """The active catalog from the tables, in EXERCISE_DATABASE's shape"""
+    exercises = {e.id: e for e in Exercise.query.filter_by(is_active=True)}
+    muscles = {m.id: m.name for m in Muscle.query}
+    targets = {}
+    for exercise_id, muscle_id, _ in db.session.execute(
+            db.select(exercise_muscle).order_by(exercise_muscle.c.exercise_id, exercise_muscle.c.position)):
+        targets.setdefault(exercise_id, []).append(muscles[muscle_id])
+
+    alternatives = {}
+    for alt in ExerciseAlternative.query.order_by(ExerciseAlternative.slot_id, ExerciseAlternative.position):
+        if alt.exercise_id in exercises:
+            alternatives.setdefault(alt.slot_id, []).append((alt.exercise_id, alt.note))
+
+    database = {}
+    in_templates = set()
+    templates = WorkoutTemplate.query.filter_by(is_active=True).order_by(WorkoutTemplate.position).all()
+    slots = {}
+    for slot in WorkoutTemplateExercise.query.order_by(WorkoutTemplateExercise.template_id,
+                                                       WorkoutTemplateExercise.position):
+        slots.setdefault(slot.template_id, []).append(slot)
+    for template in templates:
+        plan_exercises = []
+        for slot in slots.get(template.id, ()):
+            primary = exercises.get(slot.exercise_id)
+            if primary is None:
+                continue
+            in_templates.add(primary.id)
+            slot_alternatives = alternatives.get(slot.id, [])
+            in_templates.update(exercise_id for exercise_id, _ in slot_alternatives)
+            plan_exercises.append({
+                'category': slot.category,
+                'primary': primary.name,
+                'sets': slot.sets,
+                'reps': slot.reps,
+                'alternatives': [{'name': exercises[exercise_id].name, 'note': note}
+                                 for exercise_id, note in slot_alternatives],
+                'target_muscles': targets.get(primary.id, []),
+                'type': primary.exercise_type,
+            })
+        database[template.slug] = {'name': template.name, 'description': template.description,
+                                   'exercises': plan_exercises}
+
+    # Exercises outside any template are listed on their own, grouped by type
+    for exercise in sorted(exercises.values(), key=lambda e: e.id):
+        if exercise.id in in_templates:
+            continue
+        database.setdefault(exercise.exercise_type, []).append({
+            'name': exercise.name,
+            'type': exercise.exercise_type,
+            'target_muscles': targets.get(exercise.id, []),
+            'suggested_reps': exercise.default_reps,
+            'sets': exercise.default_sets,
+        })
+    return database
+
+
+def current_version():
+    """(version, updated_at) of the catalog tables, or None if they're empty or missing"""
+    try:
+        row = db.session.get(CatalogVersion, 1)
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()
+        logger.warning('Catalog tables missing; using the built-in exercise catalog (run alembic upgrade)')
+        return None
+    return (row.version, row.updated_at) if row is not None else None
+
+
+def get_catalog():
+    """The compiled catalog, reloaded when catalog_version changes"""
+    now = time.monotonic()
+    cached = _cached['catalog']
+    if cached is not None and now - _cached['checked'] < CATALOG_CHECK:
+        record_cache('exercise_catalog', True)
+        return cached
+
+    version = current_version()
+    if version is None:
+        catalog = BUILTIN_CATALOG
+    elif cached is not None and cached.version == version[0]:
+        catalog = cached
+    else:
+        catalog = CompiledCatalog(load_catalog_database(), version=version[0], updated_at=version[1])
+    record_cache('exercise_catalog', catalog is cached)
+    with _lock:
+        _cached['catalog'], _cached['checked'] = catalog, now
+    return catalog
+
+
+def bump_catalog_version():
+    """Mark the catalog as changed; the caller commits. Workers reload within CATALOG_CHECK_S."""
+    result = db.session.execute(update(CatalogVersion).where(CatalogVersion.id == 1)
+                                .values(version=CatalogVersion.version + 1, updated_at=datetime.utcnow()))
+    if result.rowcount == 0:
+        db.session.add(CatalogVersion(id=1, version=1, updated_at=datetime.utcnow()))
+    with _lock:
+        _cached['checked'] = 0.0
+
+
+def get_exercise_by_name(name):
+    """Find an exercise by name in the catalog"""
+    return get_catalog().by_name.get(name)
+
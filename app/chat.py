@@ -1,92 +1,132 @@
-from flask import request, jsonify
+import logging
+from flask import session, request
+from sqlalchemy.exc import IntegrityError
 from flask_socketio import emit, join_room, leave_room, rooms
-from app.models import db, User, ChatRoom, ChatMessage, ChatParticipant
+from app.models import db, ChatParticipant
+from app.identity import get_identity
+from app.chat_writer import ChatWriter
+from app.chat_state import create_chat_state, serialize_message, row_key
+from app.chat_history import cursor_for, history_page, page_size
+from app.chat_typing import TypingAggregator
+from app.presence import Presence
+from app.metrics import track_event, client_connected, client_disconnected, room_joined, room_left
 from datetime import datetime
-import json
+
+logger = logging.getLogger(__name__)
 
 def init_chat(socketio):
+    # Rooms, recent history and members, warmed lazily from the database
+    state = create_chat_state()
+
+    def _written(rows):
+        """Give buffered history the ids the database assigned to a flushed batch"""
+        by_room = {}
+        for row in rows:
+            by_room.setdefault(row['room_id'], {})[row_key(row)] = row['id']
+        for room_id, ids in by_room.items():
+            state.assign_ids(room_id, ids)
+
+    # Messages and presence are broadcast first and persisted in batches
+    writer = ChatWriter(socketio, on_write=_written)
+    # Who is online in each room, kept alive by heartbeats
+    presence = Presence(socketio, writer)
+    # Typing indicators are coalesced into periodic per-room snapshots
+    typing = TypingAggregator(socketio)
+
+    def _user_name(user_id):
+        identity = get_identity(user_id)
+        return identity.name if identity else None
+
+    def _warm(room_id):
+        pending = [serialize_message(None, m['user_id'], _user_name(m['user_id']), m['message'],
+                                     m['message_type'], m['created_at'], m['is_edited'])
+                   for m in writer.pending_messages(room_id)]
+        state.ensure_room(room_id, pending)
+
+    def _joined_rooms():
+        """Active rooms this connection has joined"""
+        active_rooms = state.rooms()
+        return [active_rooms[name] for name in rooms() if name in active_rooms]
+
+    def _post(room_id, user_id, user_name, message, message_type, now):
+        """Record a message in the history buffer and queue it for the database"""
+        payload = serialize_message(None, user_id, user_name, message, message_type, now)
+        state.append(room_id, payload)
+        writer.add_message(room_id, user_id, message, message_type, now)
+        return payload
 
     @socketio.on('connect')
-    def handle_connect():
+    @track_event('connect')
+    def handle_connect(auth=None):
         """Handle client connection"""
-        if 'user_id' not in request.session:
+        if 'user_id' not in session:
             return False  # Reject connection if not authenticated
+        client_connected()
         emit('status', {'message': 'Connected to chat server'})
 
     @socketio.on('disconnect')
-    def handle_disconnect():
+    @track_event('disconnect')
+    def handle_disconnect(reason=None):
         """Handle client disconnection"""
-        if 'user_id' in request.session:
-            user_id = request.session['user_id']
-            # Update online status for all rooms
-            participations = ChatParticipant.query.filter_by(user_id=user_id, is_online=True).all()
-            for participation in participations:
-                participation.is_online = False
-                participation.last_active = datetime.utcnow()
-
-                # Notify room that user left
-                room_name = participation.room.name
-                emit('user_left', {
-                    'user_id': user_id,
-                    'user_name': participation.user.name,
-                    'room': room_name
-                }, room=room_name)
-
-            db.session.commit()
+        if 'user_id' in session:
+            user_id = session['user_id']
+            client_disconnected()
+            typing.stop_all(user_id)
+            # Rooms hear about it in the next batched presence update
+            for room in _joined_rooms():
+                room_left(room['name'])
+                presence.leave(room, user_id, request.sid)
 
     @socketio.on('join_room')
+    @track_event('join_room')
     def handle_join_room(data):
         """Handle user joining a chat room"""
-        if 'user_id' not in request.session:
+        if 'user_id' not in session:
             emit('error', {'message': 'Not authenticated'})
             return
 
         try:
-            user_id = request.session['user_id']
+            user_id = session['user_id']
             room_name = data['room']
 
             # Get room and user
-            room = ChatRoom.query.filter_by(name=room_name, is_active=True).first()
-            user = User.query.get(user_id)
+            room = state.rooms().get(room_name)
+            user = get_identity(user_id)
 
             if not room or not user:
                 emit('error', {'message': 'Room or user not found'})
                 return
 
             # Join socket.io room
+            if room_name not in rooms():
+                room_joined(room_name)
             join_room(room_name)
+            room_id = room['id']
+            # Whole seconds, as chat_message.created_at stores them, so cursors built from buffered copies match the rows
+            now = datetime.utcnow().replace(microsecond=0)
+            _warm(room_id)
 
-            # Add or update participant
-            participant = ChatParticipant.query.filter_by(
-                user_id=user_id,
-                room_id=room.id
-            ).first()
-
-            if participant:
-                participant.is_online = True
-                participant.last_active = datetime.utcnow()
+            # Add participant; only a first-time join touches the database right away
+            if state.is_member(room_id, user_id):
                 join_message = f"{user.name} reconnected to the room"
             else:
-                participant = ChatParticipant(
-                    user_id=user_id,
-                    room_id=room.id,
-                    is_online=True,
-                    last_active=datetime.utcnow()
-                )
-                db.session.add(participant)
+                try:
+                    db.session.add(ChatParticipant(
+                        user_id=user_id,
+                        room_id=room_id,
+                        is_online=True,
+                        last_active=now
+                    ))
+                    db.session.commit()
+                except IntegrityError:
+                    # Another connection (or worker) added the row first; the unique constraint keeps one
+                    db.session.rollback()
+                state.add_member(room_id, user_id)
                 join_message = f"{user.name} joined the room"
-
-            db.session.commit()
+            presence.join(room, user_id, user.name, request.sid)
 
             # Send join message
-            join_msg = ChatMessage(
-                room_id=room.id,
-                user_id=user_id,
-                message=join_message,
-                message_type='join'
-            )
-            db.session.add(join_msg)
-            db.session.commit()
+            _post(room_id, user_id, user.name, join_message, 'join', now)
 
             # Notify room
             emit('user_joined', {
@@ -94,103 +134,78 @@ def init_chat(socketio):
                 'user_name': user.name,
                 'room': room_name,
                 'message': join_message,
-                'timestamp': join_msg.created_at.isoformat()
+                'timestamp': now.isoformat()
             }, room=room_name)
 
-            # Send room info to user
-            recent_messages = ChatMessage.query.filter_by(room_id=room.id)\
-                .order_by(ChatMessage.created_at.desc())\
-                .limit(50)\
-                .all()
-
-            participants = ChatParticipant.query.filter_by(
-                room_id=room.id,
-                is_online=True
-            ).all()
-
+            # Send room info to user; older messages are fetched with load_history
+            history = state.history(room_id)
             emit('room_joined', {
                 'room': room_name,
-                'room_description': room.description,
-                'messages': [{
-                    'id': msg.id,
-                    'user_id': msg.user_id,
-                    'user_name': msg.user.name,
-                    'message': msg.message,
-                    'message_type': msg.message_type,
-                    'timestamp': msg.created_at.isoformat(),
-                    'is_edited': msg.is_edited
-                } for msg in recent_messages[::-1]],  # Reverse for chronological order
+                'room_description': room['description'],
+                'messages': history,
+                'next_cursor': cursor_for(history[0]) if history else None,
                 'participants': [{
-                    'user_id': p.user_id,
-                    'user_name': p.user.name,
-                    'is_online': p.is_online
-                } for p in participants]
+                    'user_id': participant_id,
+                    'user_name': _user_name(participant_id),
+                    'is_online': True
+                } for participant_id in sorted(presence.online(room_id))]
             })
 
         except Exception as e:
             emit('error', {'message': f'Failed to join room: {str(e)}'})
 
     @socketio.on('leave_room')
+    @track_event('leave_room')
     def handle_leave_room(data):
         """Handle user leaving a chat room"""
-        if 'user_id' not in request.session:
+        if 'user_id' not in session:
             return
 
         try:
-            user_id = request.session['user_id']
+            user_id = session['user_id']
             room_name = data['room']
 
-            room = ChatRoom.query.filter_by(name=room_name).first()
-            user = User.query.get(user_id)
+            room = state.rooms().get(room_name)
+            user = get_identity(user_id)
 
             if not room or not user:
                 return
 
+            # Only a connection that joined the room has a participant row to update
+            joined = room_name in rooms()
+
             # Leave socket.io room
             leave_room(room_name)
 
-            # Update participant status
-            participant = ChatParticipant.query.filter_by(
-                user_id=user_id,
-                room_id=room.id
-            ).first()
-
-            if participant:
-                participant.is_online = False
-                participant.last_active = datetime.utcnow()
-                db.session.commit()
-
-                # Send leave message
-                leave_msg = ChatMessage(
-                    room_id=room.id,
-                    user_id=user_id,
-                    message=f"{user.name} left the room",
-                    message_type='leave'
-                )
-                db.session.add(leave_msg)
-                db.session.commit()
+            if joined:
+                room_left(room_name)
+                now = datetime.utcnow().replace(microsecond=0)
+                leave_message = f"{user.name} left the room"
+                presence.leave(room, user_id, request.sid)
+                _post(room['id'], user_id, user.name, leave_message, 'leave', now)
 
                 # Notify room
                 emit('user_left', {
                     'user_id': user_id,
                     'user_name': user.name,
                     'room': room_name,
-                    'message': f"{user.name} left the room",
-                    'timestamp': leave_msg.created_at.isoformat()
+                    'message': leave_message,
+                    'timestamp': now.isoformat()
                 }, room=room_name)
 
         except Exception as e:
             emit('error', {'message': f'Failed to leave room: {str(e)}'})
 
     @socketio.on('send_message')
+    @track_event('send_message')
     def handle_send_message(data):
         """Handle sending a chat message"""
-        if 'user_id' not in request.session:
+        if 'user_id' not in session:
             emit('error', {'message': 'Not authenticated'})
             return
 
         try:
-            user_id = request.session['user_id']
+            user_id = session['user_id']
             room_name = data['room']
             message = data['message'].strip()
 
@@ -198,97 +213,98 @@ def init_chat(socketio):
                 emit('error', {'message': 'Message cannot be empty'})
                 return
 
-            # Get room and verify user is participant
-            room = ChatRoom.query.filter_by(name=room_name, is_active=True).first()
-            participant = ChatParticipant.query.filter_by(
-                user_id=user_id,
-                room_id=room.id
-            ).first()
-
-            if not room or not participant:
+            # Joining an active room (which makes the user a participant) is what authorizes sending
+            room = state.rooms().get(room_name)
+            if room is None or room_name not in rooms():
                 emit('error', {'message': 'Not authorized to send message in this room'})
                 return
 
-            user = User.query.get(user_id)
+            user = get_identity(user_id)
+            now = datetime.utcnow().replace(microsecond=0)
 
-            # Create message
-            chat_message = ChatMessage(
-                room_id=room.id,
-                user_id=user_id,
-                message=message,
-                message_type='text'
-            )
-            db.session.add(chat_message)
+            typing.stop_typing(room_name, user_id)
 
-            # Update participant activity
-            participant.last_active = datetime.utcnow()
-            participant.is_online = True
+            # Broadcast message to room; it is written to the database in the next batch
+            emit('new_message', _post(room['id'], user_id, user.name, message, 'text', now), room=room_name)
+            presence.heartbeat([room], user_id, user.name, request.sid)
 
-            db.session.commit()
+        except Exception as e:
+            emit('error', {'message': f'Failed to send message: {str(e)}'})
 
-            # Broadcast message to room
-            emit('new_message', {
-                'id': chat_message.id,
-                'user_id': user_id,
-                'user_name': user.name,
-                'message': message,
-                'message_type': 'text',
-                'timestamp': chat_message.created_at.isoformat(),
-                'is_edited': False
-            }, room=room_name)
+    @socketio.on('heartbeat')
+    @track_event('heartbeat')
+    def handle_heartbeat():
+        """Keep this connection marked online in the rooms it has joined"""
+        if 'user_id' not in session:
+            return
+
+        user_id = session['user_id']
+        user = get_identity(user_id)
+        presence.heartbeat(_joined_rooms(), user_id, user.name if user else None, request.sid)
+
+    @socketio.on('load_history')
+    @track_event('load_history')
+    def handle_load_history(data):
+        """Send a page of messages older than data['before']"""
+        if 'user_id' not in session:
+            emit('error', {'message': 'Not authenticated'})
+            return
+
+        try:
+            room_name = data['room']
+            room = state.rooms().get(room_name)
+            if not room:
+                emit('error', {'message': 'Room not found'})
+                return
+
+            page = history_page(room['id'], before=data.get('before'), limit=page_size(data.get('limit')))
+            emit('history_page', dict(room=room_name, **page))
 
         except Exception as e:
-            emit('error', {'message': f'Failed to send message: {str(e)}'})
+            emit('error', {'message': f'Failed to load history: {str(e)}'})
 
     @socketio.on('get_rooms')
+    @track_event('get_rooms')
     def handle_get_rooms():
         """Get list of available chat rooms"""
         try:
-            rooms = ChatRoom.query.filter_by(is_active=True).all()
             emit('rooms_list', [{
-                'name': room.name,
-                'description': room.description,
-                'created_at': room.created_at.isoformat()
-            } for room in rooms])
+                'name': room['name'],
+                'description': room['description'],
+                'created_at': room['created_at']
+            } for room in state.rooms().values()])
         except Exception as e:
             emit('error', {'message': f'Failed to get rooms: {str(e)}'})
 
     @socketio.on('typing_start')
+    @track_event('typing_start')
     def handle_typing_start(data):
         """Handle user typing indicator"""
-        if 'user_id' not in request.session:
+        if 'user_id' not in session:
             return
 
         try:
-            user_id = request.session['user_id']
+            user_id = session['user_id']
             room_name = data['room']
-            user = User.query.get(user_id)
-
-            emit('user_typing', {
-                'user_id': user_id,
-                'user_name': user.name,
-                'is_typing': True
-            }, room=room_name)
+            if room_name not in rooms():
+                return
+            user = get_identity(user_id)
+            if user is None:
+                return
+            typing.start_typing(room_name, user_id, user.name)
 
-        except Exception as e:
-            pass  # Silently handle typing errors
+        except (KeyError, TypeError):
+            logger.debug('Ignoring malformed typing_start payload: %r', data)
 
     @socketio.on('typing_stop')
+    @track_event('typing_stop')
     def handle_typing_stop(data):
         """Handle user stopped typing indicator"""
-        if 'user_id' not in request.session:
+        if 'user_id' not in session:
             return
 
         try:
-            user_id = request.session['user_id']
-            room_name = data['room']
-            user = User.query.get(user_id)
+            typing.stop_typing(data['room'], session['user_id'])
 
-            emit('user_typing', {
-                'user_id': user_id,
-                'user_name': user.name,
-                'is_typing': False
-            }, room=room_name)
-
-        except Exception as e:
-            pass  # Silently handle typing errors
\ No newline at end of file
+        except (KeyError, TypeError):
+            logger.debug('Ignoring malformed typing_stop payload: %r', data)
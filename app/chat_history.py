@@ -0,0 +1,88 @@
+"""
+Keyset-paginated chat history.
+
+Pages walk backwards through a room ordered by (created_at, id) using the
+chat_message(room_id, created_at, id) index, so fetching any page costs the
+same no matter how old the room is. Cursors are opaque strings encoding
+the (created_at, id) of the oldest message the client already has.
+"""
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app.models import db, ChatMessage, User
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at, message_id=None):
+    raw = f"{created_at.isoformat()}|{message_id if message_id is not None else ''}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor; id is None for messages not yet written. Raises ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, _, message_id = raw.partition('|')
+        return datetime.fromisoformat(timestamp), int(message_id) if message_id else None
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def cursor_for(message):
+    """Cursor pointing before a serialized message (see chat_state.serialize_message)"""
+    return encode_cursor(datetime.fromisoformat(message['timestamp']), message.get('id'))
+
+
+def page_size(value):
+    try:
+        size = int(value) if value is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def history_page(room_id, before=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Messages older than the `before` cursor, oldest first, in a compact form:
+    author names are sent once in `users` rather than on every message.
+    """
+    query = db.session.query(
+        ChatMessage.id, ChatMessage.user_id, ChatMessage.message, ChatMessage.message_type,
+        ChatMessage.created_at, ChatMessage.is_edited,
+    ).filter(ChatMessage.room_id == room_id)
+
+    if before:
+        created_at, message_id = decode_cursor(before)
+        if message_id is None:
+            query = query.filter(ChatMessage.created_at < created_at)
+        else:
+            query = query.filter(or_(
+                ChatMessage.created_at < created_at,
+                and_(ChatMessage.created_at == created_at, ChatMessage.id < message_id),
+            ))
+
+    # One extra row tells us whether there is another page
+    rows = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit][::-1]
+
+    user_ids = {row.user_id for row in rows}
+    users = {}
+    if user_ids:
+        users = {str(user_id): name for user_id, name in
+                 db.session.query(User.id, User.name).filter(User.id.in_(user_ids))}
+
+    return {
+        'messages': [{
+            'id': row.id,
+            'user_id': row.user_id,
+            'message': row.message,
+            'message_type': row.message_type,
+            'timestamp': row.created_at.isoformat(),
+            'is_edited': bool(row.is_edited),
+        } for row in rows],
+        'users': users,
+        'next_cursor': encode_cursor(rows[0].created_at, rows[0].id) if has_more else None,
+    }
@@ -0,0 +1,228 @@
+"""
+Hot chat state kept out of the database: the active rooms, and for each room
+a ring buffer of the most recent serialized messages plus its members (who
+is online lives in app.presence). A room is warmed from the database the
+first time it is used; after that joins and reconnects are served from here.
+
+CHAT_STATE_URL selects the backend. The default in-process store is right
+for a single worker (or several servers in one process). With more than
+one gunicorn worker it must point at Redis (redis://...) so every worker
+sees the same history; gunicorn.conf.py refuses to start otherwise.
+
+Messages enter the buffers before the write-behind flush gives them an id
+(see app.chat_writer); assign_ids() fills the ids in once they exist.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from app.models import db, ChatRoom, ChatMessage, ChatParticipant, User
+from app.metrics import record_cache
+
+HISTORY_SIZE = int(os.environ.get('CHAT_HISTORY_SIZE', '50'))
+ROOM_TTL = int(os.environ.get('CHAT_ROOM_CACHE_TTL', '60'))
+
+
+def serialize_message(message_id, user_id, user_name, message, message_type, created_at, is_edited=False):
+    """Wire format of a chat message, as sent in new_message and room_joined"""
+    return {
+        'id': message_id,
+        'user_id': user_id,
+        'user_name': user_name,
+        'message': message,
+        'message_type': message_type,
+        'timestamp': created_at.isoformat(),
+        'is_edited': bool(is_edited),
+    }
+
+
+def message_key(message):
+    """Identifies a serialized message whether or not it has an id yet"""
+    # To the second: MariaDB DATETIME columns drop the microseconds the buffered copy still has
+    return message['user_id'], message['timestamp'][:19], message['message_type'], message['message']
+
+
+def row_key(row):
+    """message_key() of a ChatMessage row as queued by ChatWriter"""
+    return row['user_id'], row['created_at'].isoformat()[:19], row['message_type'], row['message']
+
+
+def _with_ids(messages, ids):
+    """Copies of the messages that are still missing an id and have one in ids, by position"""
+    updates = {}
+    for i, message in enumerate(messages):
+        if message.get('id') is None:
+            message_id = ids.get(message_key(message))
+            if message_id is not None:
+                updates[i] = dict(message, id=message_id)
+    return updates
+
+
+def load_rooms():
+    """Active rooms keyed by name"""
+    return {
+        room.name: {'id': room.id, 'name': room.name, 'description': room.description,
+                    'created_at': room.created_at.isoformat() if room.created_at else None}
+        for room in ChatRoom.query.filter_by(is_active=True).order_by(ChatRoom.id)
+    }
+
+
+def load_room(room_id, pending=()):
+    """Recent history (names joined in, no lazy loads) and members of a room"""
+    rows = db.session.query(ChatMessage, User.name)\
+        .join(User, User.id == ChatMessage.user_id)\
+        .filter(ChatMessage.room_id == room_id)\
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())\
+        .limit(HISTORY_SIZE)\
+        .all()
+    history = [serialize_message(m.id, m.user_id, name, m.message, m.message_type, m.created_at, m.is_edited)
+               for m, name in reversed(rows)]
+    # A flush between reading the pending messages and this query leaves them in both; keep the written copy
+    written = {message_key(m) for m in history}
+    history = (history + [m for m in pending if message_key(m) not in written])[-HISTORY_SIZE:]
+
+    members = {user_id for (user_id,) in db.session.query(ChatParticipant.user_id)
+               .filter(ChatParticipant.room_id == room_id)}
+    return history, members
+
+
+class MemoryChatState:
+    """Per-process chat state"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = None
+        self._rooms_expire = 0
+        self._history = {}
+        self._members = {}
+
+    def rooms(self):
+        now = time.monotonic()
+        fresh = self._rooms is not None and now < self._rooms_expire
+        record_cache('chat_rooms', fresh)
+        if not fresh:
+            rooms = load_rooms()
+            with self._lock:
+                self._rooms, self._rooms_expire = rooms, now + ROOM_TTL
+        return self._rooms
+
+    def ensure_room(self, room_id, pending=()):
+        record_cache('chat_room_state', room_id in self._history)
+        if room_id in self._history:
+            return
+        history, members = load_room(room_id, pending)
+        with self._lock:
+            if room_id not in self._history:
+                self._history[room_id] = deque(history, maxlen=HISTORY_SIZE)
+                self._members[room_id] = members
+
+    def history(self, room_id):
+        with self._lock:
+            return list(self._history.get(room_id, ()))
+
+    def append(self, room_id, message):
+        with self._lock:
+            if room_id in self._history:
+                self._history[room_id].append(message)
+
+    def assign_ids(self, room_id, ids):
+        """Fill in ids (message_key -> id) for buffered messages that were broadcast without one"""
+        with self._lock:
+            buffer = self._history.get(room_id)
+            if buffer is None:
+                return
+            for i, message in _with_ids(buffer, ids).items():
+                buffer[i] = message
+
+    def is_member(self, room_id, user_id):
+        return user_id in self._members.get(room_id, ())
+
+    def add_member(self, room_id, user_id):
+        with self._lock:
+            self._members.setdefault(room_id, set()).add(user_id)
+
+
+class RedisChatState:
+    """Chat state shared by every worker through Redis"""
+
+    def __init__(self, url, prefix='chat'):
+        import redis
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, room_id, name):
+        return f'{self.prefix}:room:{room_id}:{name}'
+
+    def rooms(self):
+        key = f'{self.prefix}:rooms'
+        cached = self.redis.get(key)
+        record_cache('chat_rooms', cached is not None)
+        if cached is not None:
+            return json.loads(cached)
+        rooms = load_rooms()
+        self.redis.set(key, json.dumps(rooms), ex=ROOM_TTL)
+        return rooms
+
+    def ensure_room(self, room_id, pending=()):
+        warm = bool(self.redis.exists(self._key(room_id, 'warm')))
+        record_cache('chat_room_state', warm)
+        if warm:
+            return
+        history, members = load_room(room_id, pending)
+        pipe = self.redis.pipeline()
+        pipe.delete(self._key(room_id, 'history'), self._key(room_id, 'members'))
+        if history:
+            pipe.rpush(self._key(room_id, 'history'), *[json.dumps(m) for m in history])
+        if members:
+            pipe.sadd(self._key(room_id, 'members'), *members)
+        pipe.set(self._key(room_id, 'warm'), 1)
+        pipe.execute()
+
+    def history(self, room_id):
+        return [json.loads(m) for m in self.redis.lrange(self._key(room_id, 'history'), 0, -1)]
+
+    def append(self, room_id, message):
+        key = self._key(room_id, 'history')
+        pipe = self.redis.pipeline()
+        pipe.rpush(key, json.dumps(message))
+        pipe.ltrim(key, -HISTORY_SIZE, -1)
+        pipe.execute()
+
+    def assign_ids(self, room_id, ids):
+        """Fill in ids (message_key -> id) for buffered messages that were broadcast without one"""
+        import redis
+        key = self._key(room_id, 'history')
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    # Other workers append and trim concurrently; retry if the list moves under us
+                    pipe.watch(key)
+                    updates = _with_ids([json.loads(m) for m in pipe.lrange(key, 0, -1)], ids)
+                    if not updates:
+                        pipe.unwatch()
+                        return
+                    pipe.multi()
+                    for i, message in updates.items():
+                        pipe.lset(key, i, json.dumps(message))
+                    pipe.execute()
+                    return
+                except redis.WatchError:
+                    continue
+
+    def is_member(self, room_id, user_id):
+        return bool(self.redis.sismember(self._key(room_id, 'members'), user_id))
+
+    def add_member(self, room_id, user_id):
+        self.redis.sadd(self._key(room_id, 'members'), user_id)
+
+
+def create_chat_state():
+    """Chat state backend for CHAT_STATE_URL"""
+    url = os.environ.get('CHAT_STATE_URL', 'memory://')
+    if url.startswith('redis'):
+        return RedisChatState(url)
+    return _shared_memory_state
+
+
+_shared_memory_state = MemoryChatState()
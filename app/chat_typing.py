@@ -0,0 +1,100 @@
+"""
+Coalesced typing indicators.
+
+typing_start/typing_stop only update in-memory state here. A background task
+emits at most one users_typing snapshot per room every TYPING_INTERVAL_MS,
+and only when the set of typers changed. It also sends a keepalive copy
+of non-empty snapshots, and drops typers who haven't refreshed within
+TYPING_TTL_MS. Each process sends its own snapshots, tagged with a source
+id; clients union them, so this works unchanged behind a message queue.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+TYPING_INTERVAL = int(os.environ.get('TYPING_INTERVAL_MS', '500')) / 1000.0
+TYPING_TTL = int(os.environ.get('TYPING_TTL_MS', '5000')) / 1000.0
+TYPING_KEEPALIVE = TYPING_TTL / 2
+
+
+class TypingAggregator:
+    """Per-room typing state for this process, flushed to clients as snapshots"""
+
+    def __init__(self, socketio, interval=TYPING_INTERVAL, ttl=TYPING_TTL):
+        self.socketio = socketio
+        self.interval = interval
+        self.ttl = ttl
+        self.source = uuid.uuid4().hex[:8]
+        self._rooms = {}    # room name -> {user_id: (user_name, expires_at)}
+        self._dirty = set()
+        self._sent_at = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start_typing(self, room, user_id, user_name):
+        now = time.monotonic()
+        with self._lock:
+            typers = self._rooms.setdefault(room, {})
+            if user_id not in typers:
+                self._dirty.add(room)
+            typers[user_id] = (user_name, now + self.ttl)
+        self._ensure_started()
+
+    def stop_typing(self, room, user_id):
+        with self._lock:
+            typers = self._rooms.get(room)
+            if typers and typers.pop(user_id, None) is not None:
+                self._dirty.add(room)
+        self._ensure_started()
+
+    def stop_all(self, user_id):
+        """Forget the user in every room, e.g. on disconnect"""
+        with self._lock:
+            for room, typers in self._rooms.items():
+                if typers.pop(user_id, None) is not None:
+                    self._dirty.add(room)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                for room, users in self.snapshots():
+                    self.socketio.emit('users_typing', {'room': room, 'source': self.source, 'users': users},
+                                       to=room)
+            except Exception:
+                logger.exception('Typing update failed')
+
+    def snapshots(self):
+        """(room, users) pairs that are due to be sent, expiring stale typers on the way"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for room, typers in list(self._rooms.items()):
+                expired = [user_id for user_id, (_, expires_at) in typers.items() if expires_at <= now]
+                for user_id in expired:
+                    del typers[user_id]
+                if expired:
+                    self._dirty.add(room)
+                keepalive = typers and now - self._sent_at.get(room, 0) >= TYPING_KEEPALIVE
+                if room in self._dirty or keepalive:
+                    due.append((room, [{'user_id': user_id, 'user_name': name}
+                                       for user_id, (name, _) in typers.items()]))
+                    self._sent_at[room] = now
+                if not typers:
+                    del self._rooms[room]
+                    self._sent_at.pop(room, None)
+            self._dirty.clear()
+        return due
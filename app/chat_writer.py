@@ -0,0 +1,180 @@
+"""
+Write-behind persistence for chat.
+
+Socket handlers broadcast straight from memory and hand the rows to a
+ChatWriter, which inserts ChatMessage rows and applies ChatParticipant
+activity updates in bulk from a background task. A flush happens every
+CHAT_FLUSH_INTERVAL_MS or as soon as CHAT_FLUSH_BATCH messages are waiting,
+and once more when the process exits (gunicorn's SIGTERM/SIGQUIT paths run
+atexit handlers). A hard kill loses at most one interval of messages.
+Setting CHAT_FLUSH_INTERVAL_MS=0 writes synchronously instead.
+
+Messages are broadcast before they have an id; once a batch is committed
+the rows, ids included, are passed to the on_write callback so buffered
+copies can be given theirs.
+"""
+import atexit
+import logging
+import os
+import threading
+from flask import current_app
+from sqlalchemy import and_, bindparam, update
+from app.models import db, ChatMessage, ChatParticipant
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = int(os.environ.get('CHAT_FLUSH_INTERVAL_MS', '200')) / 1000.0
+FLUSH_BATCH = int(os.environ.get('CHAT_FLUSH_BATCH', '100'))
+MAX_PENDING = int(os.environ.get('CHAT_MAX_PENDING', '10000'))
+
+_participant_update = update(ChatParticipant.__table__)\
+    .where(and_(ChatParticipant.__table__.c.user_id == bindparam('p_user_id'),
+                ChatParticipant.__table__.c.room_id == bindparam('p_room_id')))\
+    .values(last_active=bindparam('p_last_active'), is_online=bindparam('p_is_online'))
+
+
+class ChatWriter:
+    """Buffers chat rows in memory and writes them to the database in batches"""
+
+    def __init__(self, socketio, interval=FLUSH_INTERVAL, batch=FLUSH_BATCH, max_pending=MAX_PENDING, on_write=None):
+        self.socketio = socketio
+        self.on_write = on_write
+        self.interval = interval
+        self.batch = batch
+        self.max_pending = max_pending
+        self.app = None
+        self._messages = []
+        self._inflight = []
+        self._activity = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Created with the background task, from the server, so waiting on it yields under eventlet/gevent
+        self._wake = None
+        self._pid = None
+        self._stopping = False
+
+    def add_message(self, room_id, user_id, message, message_type, created_at):
+        """Queue a ChatMessage insert"""
+        row = {
+            'room_id': room_id,
+            'user_id': user_id,
+            'message': message,
+            'message_type': message_type,
+            'created_at': created_at,
+            'is_edited': False,
+        }
+        with self._lock:
+            self._messages.append(row)
+            pending = len(self._messages)
+        self._after_add(pending)
+
+    def touch(self, user_id, room_id, when, is_online=True):
+        """Queue a participant's last_active/is_online update; later calls for the same pair win"""
+        with self._lock:
+            self._activity[(user_id, room_id)] = (when, is_online)
+            pending = len(self._messages)
+        self._after_add(pending)
+
+    def pending_messages(self, room_id):
+        """Messages for room_id that have been broadcast but not committed yet, oldest first"""
+        with self._lock:
+            return [dict(m) for m in self._inflight + self._messages if m['room_id'] == room_id]
+
+    def _after_add(self, pending):
+        if self.interval <= 0 or self._stopping:
+            self.flush()
+            return
+        self._ensure_started()
+        if pending >= self.max_pending:
+            # The database is falling behind; make the caller wait rather than grow without bound
+            self.flush()
+        elif pending >= self.batch:
+            self._wake.set()
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own task
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            if self.app is None:
+                self.app = current_app._get_current_object()
+            self._wake = self.socketio.server.eio.create_event()
+            atexit.register(self.stop)
+            self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Chat flush failed; will retry')
+
+    def flush(self):
+        """Write everything buffered so far in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                messages, self._messages = self._messages, []
+                activity, self._activity = self._activity, {}
+                self._inflight = messages
+            if not messages and not activity:
+                return 0
+            try:
+                if self.app is None:
+                    self.app = current_app._get_current_object()
+                with self.app.app_context():
+                    ids = self._write(messages, activity)
+            except Exception:
+                with self._lock:
+                    # Put the batch back in front of anything queued meanwhile
+                    self._messages = messages + self._messages
+                    for key, value in activity.items():
+                        self._activity.setdefault(key, value)
+                    self._inflight = []
+                raise
+            if messages and self.on_write:
+                # The rows are committed, so a failure here must not put them back in the queue
+                try:
+                    self.on_write([dict(row, id=message_id) for row, message_id in zip(messages, ids)])
+                except Exception:
+                    logger.exception('Chat on_write callback failed')
+            with self._lock:
+                self._inflight = []
+            return len(messages)
+
+    def _write(self, messages, activity):
+        try:
+            ids = self._insert(messages) if messages else []
+            if activity:
+                db.session.execute(_participant_update, [
+                    {'p_user_id': user_id, 'p_room_id': room_id, 'p_last_active': when, 'p_is_online': online}
+                    for (user_id, room_id), (when, online) in activity.items()
+                ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return ids
+
+    def _insert(self, messages):
+        """Insert ChatMessage rows and return their ids, in order"""
+        table = ChatMessage.__table__
+        if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+            return db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True),
+                                      messages).scalars().all()
+        # No RETURNING for executemany on this backend: one statement per row
+        return [db.session.execute(table.insert(), row).inserted_primary_key[0] for row in messages]
+
+    def stop(self):
+        """Stop the background task and write whatever is left"""
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Chat flush on shutdown failed; %d messages lost', len(self._messages))
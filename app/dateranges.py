@@ -0,0 +1,55 @@
+"""
+Half-open [start, end) datetime ranges for "today" / "this month" queries.
+
+Log timestamps are stored as naive wall-clock times, so the user's timezone
+only decides which calendar day it currently is; the returned bounds are
+naive too. Comparing the raw column against bounds (instead of wrapping it in
+DATE()) lets MariaDB use the (user_id, time) indexes.
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from flask import current_app, has_request_context, request
+
+
+def current_timezone():
+    """The browser's timezone (tz cookie), else APP_TIMEZONE, else server local time"""
+    name = request.cookies.get('tz') if has_request_context() else None
+    for candidate in (name, current_app.config.get('APP_TIMEZONE')):
+        if not candidate:
+            continue
+        try:
+            return ZoneInfo(candidate)
+        except (ZoneInfoNotFoundError, ValueError):
+            continue
+    return None
+
+
+def local_now(tz=None):
+    """Naive wall-clock time in tz (server local time when tz is None)"""
+    if tz is None:
+        return datetime.now()
+    return datetime.now(tz).replace(tzinfo=None)
+
+
+def to_local(moment, tz=None):
+    """An aware datetime as naive wall-clock time in tz (server local time when tz is None)"""
+    return moment.astimezone(tz).replace(tzinfo=None)
+
+
+def local_today(tz=None):
+    return local_now(tz).date()
+
+
+def day_range(day):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def today_range(tz=None):
+    return day_range(local_today(tz))
+
+
+def month_to_date_range(tz=None):
+    """From the first of the current month up to the end of today"""
+    today = local_today(tz)
+    return datetime.combine(today.replace(day=1), time.min), day_range(today)[1]
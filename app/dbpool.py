@@ -0,0 +1,108 @@
+"""
+Connection pool configuration and per-worker pool metrics.
+
+Pool sizing comes from DB_* environment variables so it can be matched to the
+database's connection limit (workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW)).
+"""
+import os
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that counts checkouts, new connections and time spent waiting for a slot"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            # Only a full pool counts; connect errors surface as themselves
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _create_connection(self):
+        with self._stats_lock:
+            self.connects += 1
+        return super()._create_connection()
+
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database"""
+    options = {
+        # Test connections on checkout so ones dropped while idle are replaced transparently
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    }
+    if database_url.startswith('sqlite'):
+        return options
+
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+    })
+    if 'pymysql' in database_url:
+        options['connect_args'] = {
+            'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 10),
+            'read_timeout': _env_int('DB_READ_TIMEOUT', 30),
+            'write_timeout': _env_int('DB_WRITE_TIMEOUT', 30),
+        }
+    return options
+
+
+def pool_stats(engine):
+    """Snapshot of this worker's pool usage"""
+    pool = engine.pool
+    stats = {'pid': os.getpid(), 'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                'checkouts': pool.checkouts,
+                'connects': pool.connects,
+                'timeouts': pool.timeouts,
+                'wait_ms_total': round(pool.wait_seconds_total * 1000, 3),
+                'wait_ms_max': round(pool.wait_seconds_max * 1000, 3),
+                'wait_ms_avg': round(pool.wait_seconds_total * 1000 / pool.checkouts, 3) if pool.checkouts else 0,
+            })
+    return stats
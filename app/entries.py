@@ -0,0 +1,171 @@
+"""
+Validation and batched saving of food, calorie and energy burn entries.
+
+The parse_*_form helpers take the fields of the /add_* forms (a request.form
+or a plain dict of the same names) and return the values to save, or raise
+ValueError with the message the form shows; that includes text too long for
+its column, which strict MariaDB would otherwise reject for the whole batch. The forms, /api/sync and bulk
+imports all go through them so an entry is accepted or rejected the same
+way wherever it comes from. Exercises are parsed by app.workouts.
+
+The save_* helpers insert many entries at once and update the daily rollup
+once per day touched; the caller commits.
+"""
+from datetime import datetime
+from app.models import db, FoodLog, CalorieEntry, EnergyBurnEntry
+from app.rollups import record_calories, record_energy_burn
+from app.workouts import parse_exercise, check_length
+from app.dateranges import local_now
+
+
+def _form_time(value):
+    return datetime.fromisoformat(value.replace('T', ' '))
+
+
+def parse_food_form(form, tz=None, default_time=None):
+    meal_type = form.get('meal-type')
+    food_name = form.get('food-name')
+    portion_size = form.get('portion-size')
+    meal_time_str = form.get('meal-time')
+
+    if not all([meal_type, food_name, portion_size, meal_time_str]):
+        raise ValueError('All fields are required.')
+    check_length(meal_type, FoodLog.meal_type, 'Meal type')
+    check_length(food_name, FoodLog.food_name, 'Food name')
+    check_length(portion_size, FoodLog.portion_size, 'Portion size')
+
+    try:
+        meal_time = _form_time(meal_time_str)
+    except ValueError:
+        meal_time = default_time or local_now(tz)
+
+    return {
+        'meal_type': meal_type,
+        'food_name': food_name,
+        'portion_size': portion_size,
+        'meal_time': meal_time,
+        'notes': form.get('notes', ''),
+    }
+
+
+def parse_calories_form(form, tz=None, default_time=None):
+    food_item = form.get('food-item')
+    calories = form.get('calories')
+    quantity = form.get('quantity')
+
+    if not all([food_item, calories, quantity]):
+        raise ValueError('All fields are required.')
+    check_length(food_item, CalorieEntry.food_item, 'Food item')
+    check_length(quantity, CalorieEntry.quantity, 'Quantity')
+
+    try:
+        calories = int(calories)
+    except ValueError:
+        raise ValueError('Calories must be a number.')
+
+    return {
+        'food_item': food_item,
+        'calories': calories,
+        'quantity': quantity,
+        'entry_time': default_time or local_now(tz),
+        'notes': form.get('notes', ''),
+    }
+
+
+def parse_neat_form(form, tz=None, default_time=None):
+    source = form.get('source') or 'neat'
+    activity_name = form.get('activity-name')
+    calories_burned = form.get('calories-burned')
+    duration = form.get('duration-minutes')
+    entry_time_str = form.get('entry-time')
+
+    if not all([activity_name, calories_burned]):
+        raise ValueError('Activity and calories burned are required.')
+    check_length(source, EnergyBurnEntry.source, 'Source')
+    check_length(activity_name, EnergyBurnEntry.activity_name, 'Activity name')
+
+    try:
+        calories_burned = int(calories_burned)
+        duration_minutes = float(duration) if duration else None
+        if entry_time_str:
+            entry_time = _form_time(entry_time_str)
+        else:
+            entry_time = default_time or local_now(tz)
+    except ValueError:
+        raise ValueError('Invalid input for calories or duration.')
+
+    return {
+        'source': source,
+        'activity_name': activity_name,
+        'calories_burned': calories_burned,
+        'duration_minutes': duration_minutes,
+        'entry_time': entry_time,
+        'notes': form.get('notes', ''),
+    }
+
+
+def parse_exercise_form(form, tz=None, default_time=None):
+    """The /add_exercise form as a save_exercises() entry"""
+    exercise_name = form.get('exercise-name')
+    exercise_type = form.get('exercise-type')
+    sets = form.get('sets')
+    reps = form.get('reps')
+    workout_time = form.get('workout-time') or default_time or local_now(tz)
+
+    if not all([exercise_name, exercise_type, sets, reps]):
+        raise ValueError('All fields except weight are required.')
+
+    try:
+        # Per-set entries default to the provided reps/weight/form/effort
+        # This allows later edit of each set individually if needed
+        return parse_exercise({
+            'exercise_name': exercise_name,
+            'exercise_type': exercise_type,
+            'sets': sets,
+            'reps': reps,
+            'weight': form.get('weight'),
+            'form_score': form.get('form-score'),
+            'effort_score': form.get('effort-score'),
+            'workout_time': workout_time,
+            'notes': form.get('notes', ''),
+            'duration_minutes': form.get('duration-minutes'),
+            'calories_burned': form.get('calories-burned'),
+        }, tz=tz)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid input: {str(e)}')
+
+
+def save_food(user_id, entries):
+    """Insert FoodLog rows; returns them with ids"""
+    logs = [FoodLog(user_id=user_id, **entry) for entry in entries]
+    db.session.add_all(logs)
+    db.session.flush()
+    return logs
+
+
+def save_calories(user_id, entries):
+    """Insert CalorieEntry rows and add them to the rollup; returns them with ids"""
+    rows = [CalorieEntry(user_id=user_id, **entry) for entry in entries]
+    db.session.add_all(rows)
+    db.session.flush()
+    by_day = {}
+    for row in rows:
+        day = row.entry_time.date()
+        by_day[day] = by_day.get(day, 0) + row.calories
+    for day, calories in by_day.items():
+        record_calories(user_id, day, calories)
+    return rows
+
+
+def save_energy_burns(user_id, entries):
+    """Insert EnergyBurnEntry rows and add them to the rollup; returns them with ids"""
+    rows = [EnergyBurnEntry(user_id=user_id, **entry) for entry in entries]
+    db.session.add_all(rows)
+    db.session.flush()
+    totals = {}
+    for row in rows:
+        key = (row.entry_time.date(), row.source)
+        totals[key] = totals.get(key, 0) + row.calories_burned
+    for (day, source), calories in totals.items():
+        record_energy_burn(user_id, day, source, calories)
+    return rows
@@ -0,0 +1,213 @@
+"""
+Exercise name suggestions for /api/exercises/search.
+
+Exercise names are free text, and targets only match logs whose name is
+spelled exactly the same, so the forms suggest names as the user types:
+the exercise catalog plus every name the user has logged or set a target
+for. Both sets are indexed in memory:
+
+  - a prefix trie over every word start, so "pre" finds "Bench Press"
+  - a trigram index, so typos and partial words ("dumbell rw") still rank
+    "Dumbbell Rows"
+
+The catalog index is rebuilt whenever app.catalog reloads the catalog.
+Each user's names are loaded with one GROUP BY query and cached per
+process for EXERCISE_SEARCH_TTL seconds, in an LRU of at most
+EXERCISE_SEARCH_CACHE_SIZE users; writes call invalidate_user_exercises().
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import func
+from app.catalog import get_catalog
+from app.models import db, ExerciseLog, UserExerciseTarget
+
+SEARCH_TTL = int(os.environ.get('EXERCISE_SEARCH_TTL', '300'))
+SEARCH_CACHE_SIZE = int(os.environ.get('EXERCISE_SEARCH_CACHE_SIZE', '1000'))
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MIN_SIMILARITY = 0.2
+
+_user_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize(text):
+    """Lowercase words only: "Pull-ups / Chin-ups" -> "pull ups chin ups" """
+    return ' '.join(re.findall(r'[a-z0-9]+', (text or '').lower()))
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Prefix trie and trigram index over a fixed list of names"""
+
+    def __init__(self, entries):
+        # entries: dicts with at least 'name'; one per distinct normalized name
+        self.entries = []
+        self._ids = {}
+        self._trie = {}
+        self._grams = {}
+        self._entry_grams = []
+        for entry in entries:
+            key = normalize(entry['name'])
+            if not key or key in self._ids:
+                continue
+            entry_id = len(self.entries)
+            self._ids[key] = entry_id
+            self.entries.append(entry)
+            self._insert_prefixes(key, entry_id)
+            grams = trigrams(key)
+            self._entry_grams.append(len(grams))
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(entry_id)
+
+    def _insert_prefixes(self, key, entry_id):
+        words = key.split(' ')
+        for start in range(len(words)):
+            node = self._trie
+            for char in ' '.join(words[start:]):
+                node = node.setdefault(char, {})
+                ids = node.setdefault('', [])
+                if not ids or ids[-1] != entry_id:
+                    ids.append(entry_id)
+
+    def get(self, name):
+        entry_id = self._ids.get(normalize(name))
+        return None if entry_id is None else self.entries[entry_id]
+
+    def prefix_matches(self, key):
+        node = self._trie
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return ()
+        return node['']
+
+    def search(self, query):
+        """{entry id: score} for a normalized query; higher is better"""
+        scores = {}
+        for entry_id in self.prefix_matches(query):
+            name = normalize(self.entries[entry_id]['name'])
+            if name == query:
+                scores[entry_id] = 3.0
+            elif name.startswith(query):
+                scores[entry_id] = 2.0
+            else:
+                scores[entry_id] = 1.5  # a later word starts with the query
+        if len(query) >= 3:
+            query_grams = trigrams(query)
+            shared = {}
+            for gram in query_grams:
+                for entry_id in self._grams.get(gram, ()):
+                    shared[entry_id] = shared.get(entry_id, 0) + 1
+            for entry_id, count in shared.items():
+                # Dice coefficient over trigram sets
+                similarity = 2.0 * count / (len(query_grams) + self._entry_grams[entry_id])
+                if similarity >= MIN_SIMILARITY:
+                    scores[entry_id] = max(scores.get(entry_id, 0), similarity)
+        return scores
+
+
+_catalog_index = {'catalog': None, 'index': None}
+
+
+def catalog_index():
+    """Index over the current catalog, rebuilt when the catalog is reloaded"""
+    catalog = get_catalog()
+    if _catalog_index['catalog'] is not catalog:
+        index = NameIndex([{'name': e['name'], 'type': e['type'], 'category': e.get('category')}
+                           for e in catalog.unique_exercises])
+        _catalog_index.update(catalog=catalog, index=index)
+    return _catalog_index['index']
+
+
+def load_user_exercises(user_id):
+    """Names the user has logged (with how often) or set targets for"""
+    uses = dict(db.session.query(ExerciseLog.exercise_name, func.count(ExerciseLog.id))
+                .filter(ExerciseLog.user_id == user_id)
+                .group_by(ExerciseLog.exercise_name))
+    for (name,) in db.session.query(UserExerciseTarget.exercise_name).filter(UserExerciseTarget.user_id == user_id):
+        uses.setdefault(name, 0)
+    entries = [{'name': name, 'uses': count}
+               for name, count in sorted(uses.items(), key=lambda item: (-item[1], item[0]))]
+    return NameIndex(entries)
+
+
+def user_index(user_id):
+    now = time.monotonic()
+    with _lock:
+        cached = _user_indexes.get(user_id)
+        if cached and cached[0] > now:
+            _user_indexes.move_to_end(user_id)
+            return cached[1]
+        if cached:
+            del _user_indexes[user_id]
+    index = load_user_exercises(user_id)
+    with _lock:
+        _user_indexes[user_id] = (now + SEARCH_TTL, index)
+        _user_indexes.move_to_end(user_id)
+        # Least recently used first: drop the expired ones, then whatever is over the cap
+        while _user_indexes and (len(_user_indexes) > SEARCH_CACHE_SIZE
+                                 or next(iter(_user_indexes.values()))[0] <= now):
+            _user_indexes.popitem(last=False)
+    return index
+
+
+def invalidate_user_exercises(user_id):
+    with _lock:
+        _user_indexes.pop(user_id, None)
+
+
+def _suggestion(name, catalog_entry, uses):
+    return {
+        'name': name,
+        'type': catalog_entry['type'] if catalog_entry else None,
+        'category': catalog_entry['category'] if catalog_entry else None,
+        'source': 'history' if uses is not None else 'catalog',
+        'uses': uses or 0,
+    }
+
+
+def search_exercises(user_id, query, limit=DEFAULT_LIMIT):
+    """Ranked suggestions from the catalog and the user's own exercise names"""
+    history = user_index(user_id)
+    catalog = catalog_index()
+    key = normalize(query)
+    if not key:
+        # Nothing typed yet: the user's most used names, then the catalog
+        names = [e['name'] for e in history.entries[:limit]]
+        seen = {normalize(n) for n in names}
+        names += [e['name'] for e in catalog.entries if normalize(e['name']) not in seen][:limit - len(names)]
+    else:
+        ranked = {}
+        for entry_id, score in catalog.search(key).items():
+            ranked[normalize(catalog.entries[entry_id]['name'])] = (score, catalog.entries[entry_id]['name'])
+        for entry_id, score in history.search(key).items():
+            entry = history.entries[entry_id]
+            # The user's own spelling wins, ranked a little higher and by how often it's used
+            score += 0.5 + min(entry['uses'], 50) / 100
+            norm = normalize(entry['name'])
+            if score >= ranked.get(norm, (0,))[0]:
+                ranked[norm] = (score, entry['name'])
+        best = sorted(ranked.values(), key=lambda item: (-item[0], len(item[1]), item[1]))
+        names = [name for _, name in best[:limit]]
+
+    results = []
+    for name in names:
+        entry = history.get(name)
+        results.append(_suggestion(name, catalog.get(name), entry['uses'] if entry else None))
+    return results
+
+
+def search_limit(value):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
@@ -0,0 +1,112 @@
+"""
+SQL aggregations backing the /exercise dashboard that the daily rollup
+can't answer (target adherence and per-log averages).
+
+Logs that have per-set rows are scored from ``exercise_set_log``; older logs
+without set rows fall back to their exercise-level scores, mirroring how the
+dashboard has always counted them.
+"""
+from sqlalchemy import and_, case, func, or_, select
+from app.models import db, ExerciseLog, ExerciseSetLog, UserExerciseTarget
+
+
+def _has_sets():
+    return select(ExerciseSetLog.id).where(ExerciseSetLog.exercise_log_id == ExerciseLog.id).exists()
+
+
+def _in_range(user_id, start, end):
+    return and_(
+        ExerciseLog.user_id == user_id,
+        ExerciseLog.workout_time >= start,
+        ExerciseLog.workout_time < end,
+    )
+
+
+def target_adherence(user_id, start, end):
+    """Share of sets in [start, end) meeting each of the user's targets"""
+    T = UserExerciseTarget
+    targets = T.query.filter_by(user_id=user_id).all()
+    if not targets:
+        return []
+
+    def meets(form_col, effort_col):
+        return and_(
+            or_(T.min_form_score.is_(None), form_col >= T.min_form_score),
+            or_(T.effort_min.is_(None), effort_col >= T.effort_min),
+            or_(T.effort_max.is_(None), effort_col <= T.effort_max),
+        )
+
+    target_join = and_(ExerciseLog.user_id == T.user_id, ExerciseLog.exercise_name == T.exercise_name)
+    set_rows = db.session.execute(
+        select(
+            T.id,
+            func.count(ExerciseSetLog.id),
+            func.sum(case((meets(ExerciseSetLog.form_score, ExerciseSetLog.effort_score), 1), else_=0)),
+        )
+        .join(ExerciseLog, target_join)
+        .join(ExerciseSetLog, ExerciseSetLog.exercise_log_id == ExerciseLog.id)
+        .where(T.user_id == user_id, _in_range(user_id, start, end))
+        .group_by(T.id)
+    ).all()
+
+    # Logs without set rows count as `sets` identical checks (at least one)
+    weight = func.coalesce(func.nullif(ExerciseLog.sets, 0), 1)
+    fallback_rows = db.session.execute(
+        select(
+            T.id,
+            func.sum(weight),
+            func.sum(case((meets(ExerciseLog.form_score, ExerciseLog.effort_score), weight), else_=0)),
+        )
+        .join(ExerciseLog, target_join)
+        .where(T.user_id == user_id, _in_range(user_id, start, end), ~_has_sets())
+        .group_by(T.id)
+    ).all()
+
+    counts = {}
+    for target_id, total, met in list(set_rows) + list(fallback_rows):
+        acc = counts.setdefault(target_id, [0, 0])
+        acc[0] += int(total or 0)
+        acc[1] += int(met or 0)
+
+    cards = []
+    for t in targets:
+        total, met = counts.get(t.id, (0, 0))
+        cards.append({
+            'exercise_name': t.exercise_name,
+            'adherence': round((met / total) * 100, 1) if total else 0,
+            'min_form_score': t.min_form_score,
+            'effort_min': t.effort_min,
+            'effort_max': t.effort_max,
+        })
+    return cards
+
+
+def exercise_averages(logs):
+    """Average form/effort/quality per exercise log, keyed by log id"""
+    if not logs:
+        return {}
+    rows = db.session.execute(
+        select(
+            ExerciseSetLog.exercise_log_id,
+            func.avg(ExerciseSetLog.form_score),
+            func.avg(ExerciseSetLog.effort_score),
+            func.avg(ExerciseSetLog.quality_score),
+        )
+        .where(ExerciseSetLog.exercise_log_id.in_([ex.id for ex in logs]))
+        .group_by(ExerciseSetLog.exercise_log_id)
+    ).all()
+    by_log = {row[0]: row[1:] for row in rows}
+
+    derived = {}
+    for ex in logs:
+        if ex.id in by_log:
+            form, effort, quality = by_log[ex.id]
+        else:
+            form, effort = ex.form_score, ex.effort_score
+            quality = form * (effort / 10.0) if form is not None and effort is not None else None
+        derived[ex.id] = {
+            'avg_form': round(float(form), 1) if form is not None else None,
+            'avg_effort': round(float(effort), 1) if effort is not None else None,
+            'avg_quality': round(float(quality), 2) if quality is not None else None,
+        }
+    return derived
@@ -1,6 +1,15 @@
 """
-Exercise database with structured templates for workout plans
+Exercise database with structured templates for workout plans.
+
+The catalog lives in the exercise/workout template tables (see
+app.catalog); EXERCISE_DATABASE is the built-in copy they were seeded
+from, used until they hold data. Either way the catalog is compiled into
+read-only lookup tables (by name, target muscle, category and type) and
+JSON blobs once, so lookups and page renders don't walk or copy it.
 """
+import hashlib
+from types import MappingProxyType
+from jinja2.utils import htmlsafe_json_dumps
 
 EXERCISE_DATABASE = {
     "workout_a": {
@@ -185,69 +194,89 @@ EXERCISE_DATABASE = {
     ]
 }
 
-def get_exercise_by_name(name):
-    """Find an exercise by name in the database"""
-    for workout_name, workout_data in EXERCISE_DATABASE.items():
-        if workout_name in ["workout_a", "workout_b"]:
-            for exercise in workout_data["exercises"]:
-                if exercise["primary"] == name:
-                    return exercise
-                for alt in exercise["alternatives"]:
-                    if alt["name"] == name:
-                        return {
-                            "name": alt["name"],
-                            "type": exercise["type"],
-                            "target_muscles": exercise["target_muscles"],
-                            "category": exercise["category"]
-                        }
+def _freeze(value):
+    """Read-only copy: dicts become mappingproxies, lists become tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
 
-    # Check cardio and flexibility exercises
-    for exercise in EXERCISE_DATABASE.get("cardio", []):
-        if exercise["name"] == name:
-            return exercise
 
-    for exercise in EXERCISE_DATABASE.get("flexibility", []):
-        if exercise["name"] == name:
-            return exercise
+def plan_names(database):
+    """Workout template keys (e.g. workout_a); the other keys are lists of standalone exercises"""
+    return [key for key, value in database.items() if isinstance(value, dict)]
 
-    return None
 
-def get_workout_plan(workout_name):
-    """Get a complete workout plan by name"""
-    return EXERCISE_DATABASE.get(workout_name)
+class CompiledCatalog:
+    """A catalog in EXERCISE_DATABASE's shape, flattened once into read-only lookup tables
 
-def get_all_exercises():
-    """Get all exercises from all workout plans"""
-    all_exercises = []
+    Instances are shared by every request; nothing here may be mutated.
+    """
 
-    for workout_name, workout_data in EXERCISE_DATABASE.items():
-        if workout_name in ["workout_a", "workout_b"]:
-            for exercise in workout_data["exercises"]:
-                all_exercises.append({
-                    "name": exercise["primary"],
+    def __init__(self, database, version=0, updated_at=None):
+        self.version = version
+        self.updated_at = updated_at
+
+        catalog = []       # every plan exercise, alternative and standalone entry, in order
+        by_name = {}       # first definition of each name wins, as the old linear scan did
+        for workout_name in plan_names(database):
+            for exercise in database[workout_name]["exercises"]:
+                shared = {
                     "type": exercise["type"],
                     "category": exercise["category"],
                     "target_muscles": exercise["target_muscles"],
                     "sets": exercise["sets"],
-                    "reps": exercise["reps"]
-                })
-
-                # Add alternatives
+                    "reps": exercise["reps"],
+                }
+                catalog.append({"name": exercise["primary"], **shared})
+                by_name.setdefault(exercise["primary"], exercise)
                 for alt in exercise["alternatives"]:
-                    all_exercises.append({
+                    catalog.append({"name": alt["name"], **shared})
+                    by_name.setdefault(alt["name"], {
                         "name": alt["name"],
                         "type": exercise["type"],
-                        "category": exercise["category"],
                         "target_muscles": exercise["target_muscles"],
-                        "sets": exercise["sets"],
-                        "reps": exercise["reps"]
+                        "category": exercise["category"]
                     })
+        for group, exercises in database.items():
+            if isinstance(exercises, list):
+                for exercise in exercises:
+                    catalog.append(exercise)
+                    by_name.setdefault(exercise["name"], exercise)
 
-    # Add cardio and flexibility exercises
-    for exercise in EXERCISE_DATABASE.get("cardio", []):
-        all_exercises.append(exercise)
+        self.by_name = _freeze(by_name)
+
+        # The catalog JSON and search list each exercise once
+        unique, seen = [], set()
+        for entry in catalog:
+            if entry["name"] not in seen:
+                seen.add(entry["name"])
+                unique.append(entry)
+        self.unique_exercises = tuple(unique)
+
+        # Serialized once, safe to embed in <script> or send as-is
+        plans = {
+            workout_name: {
+                "name": database[workout_name]["name"],
+                "description": database[workout_name].get("description"),
+                "exercises": [{"name": e["primary"], "type": e["type"], "sets": e["sets"], "reps": e["reps"],
+                               "category": e["category"]}
+                              for e in database[workout_name]["exercises"]],
+            }
+            for workout_name in plan_names(database)
+        }
+        self.catalog_json = htmlsafe_json_dumps({
+            "version": version,
+            "plans": plans,
+            "exercises": [{"name": e["name"], "type": e["type"], "category": e.get("category"),
+                           "target_muscles": list(e["target_muscles"])} for e in unique],
+            "muscles": sorted({muscle for e in unique for muscle in e["target_muscles"]}),
+            "categories": sorted({e["category"] for e in unique if e.get("category")}),
+            "types": sorted({e["type"] for e in unique}),
+        })
+        self.etag = f'catalog-{version}-{hashlib.sha1(self.catalog_json.encode()).hexdigest()[:12]}'
 
-    for exercise in EXERCISE_DATABASE.get("flexibility", []):
-        all_exercises.append(exercise)
 
-    return all_exercises
\ No newline at end of file
+# The built-in catalog: seeds the catalog tables and stands in while they are empty
+BUILTIN_CATALOG = CompiledCatalog(EXERCISE_DATABASE)
@@ -0,0 +1,110 @@
+"""
+Streaming export of a user's full history for /export.
+
+Rows are read with yield_per, which makes SQLAlchemy use a server-side
+cursor (an unbuffered cursor on MariaDB) and fetch EXPORT_BATCH rows at a
+time, and are written out as they arrive through a generator response. Only
+plain column tuples are selected, never ORM objects, so nothing piles up in
+the session's identity map and memory stays flat however long the history is.
+
+NDJSON covers every kind of record in one file, one JSON object per line
+with a "record" field naming its kind. CSV needs one file per kind, chosen
+with ?record=.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from app.models import db, FoodLog, CalorieEntry, EnergyBurnEntry, ExerciseLog, ExerciseSetLog
+
+EXPORT_BATCH = int(os.environ.get('EXPORT_BATCH', '1000'))
+FORMATS = ('ndjson', 'csv')
+
+
+def _food(user_id):
+    return (db.select(FoodLog.id, FoodLog.meal_type, FoodLog.food_name, FoodLog.portion_size,
+                      FoodLog.meal_time, FoodLog.notes, FoodLog.created_at)
+            .where(FoodLog.user_id == user_id)
+            .order_by(FoodLog.meal_time, FoodLog.id))
+
+
+def _calories(user_id):
+    return (db.select(CalorieEntry.id, CalorieEntry.food_item, CalorieEntry.calories, CalorieEntry.quantity,
+                      CalorieEntry.entry_time, CalorieEntry.notes)
+            .where(CalorieEntry.user_id == user_id)
+            .order_by(CalorieEntry.entry_time, CalorieEntry.id))
+
+
+def _energy_burns(user_id):
+    return (db.select(EnergyBurnEntry.id, EnergyBurnEntry.source, EnergyBurnEntry.activity_name,
+                      EnergyBurnEntry.calories_burned, EnergyBurnEntry.duration_minutes,
+                      EnergyBurnEntry.entry_time, EnergyBurnEntry.notes)
+            .where(EnergyBurnEntry.user_id == user_id)
+            .order_by(EnergyBurnEntry.entry_time, EnergyBurnEntry.id))
+
+
+def _exercises(user_id):
+    return (db.select(ExerciseLog.id, ExerciseLog.exercise_name, ExerciseLog.exercise_type, ExerciseLog.sets,
+                      ExerciseLog.reps, ExerciseLog.weight, ExerciseLog.form_score, ExerciseLog.effort_score,
+                      ExerciseLog.workout_time, ExerciseLog.notes, ExerciseLog.created_at)
+            .where(ExerciseLog.user_id == user_id)
+            .order_by(ExerciseLog.workout_time, ExerciseLog.id))
+
+
+def _exercise_sets(user_id):
+    # Walks exercise_log by its (user_id, workout_time) index and joins each log's sets
+    return (db.select(ExerciseSetLog.id, ExerciseSetLog.exercise_log_id, ExerciseLog.exercise_name,
+                      ExerciseLog.exercise_type, ExerciseLog.workout_time, ExerciseSetLog.set_number, ExerciseSetLog.reps,
+                      ExerciseSetLog.weight, ExerciseSetLog.form_score, ExerciseSetLog.effort_score,
+                      ExerciseSetLog.quality_score)
+            .join(ExerciseLog, ExerciseSetLog.exercise_log_id == ExerciseLog.id)
+            .where(ExerciseLog.user_id == user_id)
+            .order_by(ExerciseLog.workout_time, ExerciseLog.id, ExerciseSetLog.set_number))
+
+
+# record kind -> query for one user's rows, in export order
+RECORDS = {
+    'food': _food,
+    'calories': _calories,
+    'energy_burns': _energy_burns,
+    'exercises': _exercises,
+    'exercise_sets': _exercise_sets,
+}
+
+
+def stream_rows(query):
+    """(column names, row iterator) for a query, fetched EXPORT_BATCH rows at a time"""
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH))
+    return list(result.keys()), result
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def ndjson_lines(user_id, records=None):
+    """The user's history as NDJSON, one chunk of lines per fetched batch"""
+    for record in records or RECORDS:
+        columns, rows = stream_rows(RECORDS[record](user_id))
+        for batch in rows.partitions():
+            yield ''.join(json.dumps({'record': record, **{c: _json_value(v) for c, v in zip(columns, row)}},
+                                     separators=(',', ':')) + '\n'
+                          for row in batch)
+
+
+def csv_lines(user_id, record):
+    """One kind of record as CSV with a header row, one chunk per fetched batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns, rows = stream_rows(RECORDS[record](user_id))
+    writer.writerow(columns)
+    for batch in rows.partitions():
+        writer.writerows([_json_value(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
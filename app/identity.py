@@ -0,0 +1,110 @@
+"""
+Cached identity for the logged-in user.
+
+Views and chat handlers mostly need the user's id, name and a few profile
+fields, so those are loaded once (user + profile in a single query) and
+cached per request on flask.g and per process with a TTL, in an LRU of at
+most IDENTITY_CACHE_SIZE users. Anything that writes User or UserProfile
+must call invalidate_identity(); other workers pick up the change when
+their cached copy expires.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from flask import g, has_app_context
+from app.models import db, User, UserProfile
+from app.metrics import record_cache
+
+IDENTITY_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', '300'))
+IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', '10000'))
+DEFAULT_CALORIE_GOAL = 2000
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Identity:
+    id: int
+    name: str
+    email: str
+    profile_picture: str = None
+    sex: str = None
+    age: int = None
+    weight_kg: float = None
+    height_cm: float = None
+    activity_level: str = None
+    daily_calorie_goal: int = None
+
+    @property
+    def calorie_goal(self):
+        return self.daily_calorie_goal or DEFAULT_CALORIE_GOAL
+
+
+def load_identity(user_id):
+    """Read the user and their profile from the database"""
+    row = db.session.query(User, UserProfile)\
+        .outerjoin(UserProfile, UserProfile.user_id == User.id)\
+        .filter(User.id == user_id)\
+        .first()
+    if row is None:
+        return None
+    user, profile = row
+    fields = {}
+    if profile is not None:
+        fields = {
+            'sex': profile.sex,
+            'age': profile.age,
+            'weight_kg': profile.weight_kg,
+            'height_cm': profile.height_cm,
+            'activity_level': profile.activity_level,
+            'daily_calorie_goal': profile.daily_calorie_goal,
+        }
+    return Identity(id=user.id, name=user.name, email=user.email,
+                    profile_picture=user.profile_picture, **fields)
+
+
+def get_identity(user_id):
+    """Identity for user_id from the request, then the process cache, then the database"""
+    if user_id is None:
+        return None
+    request_cache = None
+    if has_app_context():
+        request_cache = g.setdefault('_identities', {})
+        if user_id in request_cache:
+            return request_cache[user_id]
+
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(user_id)
+        if cached and cached[0] > now:
+            _cache.move_to_end(user_id)
+        elif cached:
+            del _cache[user_id]
+            cached = None
+    if cached:
+        record_cache('identity', True)
+        identity = cached[1]
+    else:
+        record_cache('identity', False)
+        identity = load_identity(user_id)
+        if identity is not None:
+            with _lock:
+                _cache[user_id] = (now + IDENTITY_TTL, identity)
+                _cache.move_to_end(user_id)
+                # Least recently used first: drop the expired ones, then whatever is over the cap
+                while _cache and (len(_cache) > IDENTITY_CACHE_SIZE or next(iter(_cache.values()))[0] <= now):
+                    _cache.popitem(last=False)
+
+    if request_cache is not None:
+        request_cache[user_id] = identity
+    return identity
+
+
+def invalidate_identity(user_id):
+    with _lock:
+        _cache.pop(user_id, None)
+    if has_app_context():
+        g.get('_identities', {}).pop(user_id, None)
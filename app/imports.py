@@ -0,0 +1,346 @@
+"""
+Bulk import of workout and calorie history from CSV or JSON files.
+
+An upload is saved to a temporary file and recorded as an ImportJob; a
+background task then reads it as a stream, validates each record with the
+same rules as the forms (app.workouts.parse_exercise, parse_calories_form),
+skips records that already exist and saves the rest IMPORT_BATCH entries per
+transaction. The job row is updated after every batch, so /api/imports/<id>
+reports progress while the file is still being read. Batches that committed
+before a failure stay saved; importing the same file again only adds what
+is missing.
+
+File layouts (CSV header names are case-insensitive, and spaces and dashes
+count as underscores, so the form field names work too):
+
+  exercise CSV  one row per set: workout_time, exercise_name, exercise_type,
+                reps, weight, form_score, effort_score, notes. Consecutive
+                rows with the same time, name and type form one exercise.
+                A row with a "sets" count is a whole exercise, like the form.
+                The /export exercise_sets CSV can be imported as it is.
+  calories CSV  entry_time, food_item, calories, quantity, notes
+  JSON          an array of objects, or one object per line (NDJSON), with
+                the same fields; exercises may carry a "sets" list like
+                /api/workouts. In NDJSON from /export, only the
+                exercise_sets or calories records are read.
+
+An exercise counts as a duplicate when the user already has one with the
+same name and time; a calorie entry when one has the same food, calories
+and time.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from sqlalchemy import update
+from app.models import db, ImportJob, ExerciseLog, CalorieEntry
+from app.workouts import parse_exercise, parse_workout_time, save_exercises
+from app.entries import parse_calories_form, save_calories
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH = int(os.environ.get('IMPORT_BATCH', '1000'))
+IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_MB', '50')) * 1024 * 1024
+IMPORT_DIR = os.environ.get('IMPORT_DIR') or None
+MAX_ERROR_SAMPLE = 50
+JSON_CHUNK = 64 * 1024
+FORMATS = ('csv', 'json')
+# The /export record kind each import kind reads; other records in an export are skipped
+EXPORT_RECORDS = {'exercise': 'exercise_sets', 'calories': 'calories'}
+EXTENSIONS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'json', '.jsonl': 'json'}
+SCALARS = (str, int, float, bool, type(None))
+
+
+class UnreadableFile(ValueError):
+    """The rest of the file cannot be read; line is the line or item number where reading stopped"""
+
+    def __init__(self, message, line=None):
+        super().__init__(message)
+        self.line = line
+
+
+def _header(name):
+    return (name or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def csv_records(text):
+    """(line number, row dict with normalized header names) for each CSV row"""
+    reader = csv.reader(text)
+    try:
+        header = [_header(name) for name in next(reader, [])]
+        for row in reader:
+            if any(value.strip() for value in row):
+                yield reader.line_num, dict(zip(header, (value.strip() for value in row)))
+    except csv.Error as e:
+        # A field over csv.field_size_limit(), a NUL byte...: nothing after it can be read reliably
+        raise UnreadableFile(f'Invalid CSV on line {reader.line_num}: {e}', reader.line_num)
+
+
+def json_records(text):
+    """(record number, value) for each item of a JSON array, or each line of NDJSON, read incrementally"""
+    decoder = json.JSONDecoder()
+    buffer = text.read(JSON_CHUNK).lstrip()
+    if not buffer.startswith('['):
+        number = 0
+        lines = io.StringIO(buffer + text.readline())
+        while True:
+            for line in lines:
+                if line.strip():
+                    number += 1
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as e:
+                        raise UnreadableFile(f'Invalid JSON on line {number}: {getattr(e, "msg", e)}', number)
+            chunk = text.read(JSON_CHUNK)
+            if not chunk:
+                return
+            lines = io.StringIO(chunk + text.readline())
+
+    pos, number, eof = 1, 0, False
+    while True:
+        # Skip whitespace and the comma between items, reading more whenever the buffer runs dry
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ',' and number:
+                pos += 1
+                continue
+            if pos < len(buffer) or eof:
+                break
+            chunk = text.read(JSON_CHUNK)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+        if pos >= len(buffer):
+            raise ValueError('Invalid JSON: the array is not closed')
+        if buffer[pos] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except ValueError as e:
+            if eof:
+                raise UnreadableFile(f'Invalid JSON in item {number + 1}: {getattr(e, "msg", e)}', number + 1)
+            chunk = text.read(JSON_CHUNK)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        number += 1
+        yield number, value
+        pos = end
+
+
+def exercise_records(records):
+    """Group per-set CSV rows into parse_exercise() dicts; whole exercises pass through"""
+    current, current_key, first_line = None, None, None
+    for line, row in records:
+        if not isinstance(row, dict) or row.get('sets') not in (None, ''):
+            if current:
+                yield first_line, current
+                current = current_key = None
+            yield line, row
+            continue
+        key = (row.get('workout_time'), row.get('exercise_name'), row.get('exercise_type'))
+        if key != current_key:
+            if current:
+                yield first_line, current
+            current_key, first_line = key, line
+            current = {'workout_time': key[0], 'exercise_name': key[1], 'exercise_type': key[2],
+                       'notes': row.get('notes', ''), 'sets': []}
+        current['sets'].append({field: row.get(field) for field in ('reps', 'weight', 'form_score', 'effort_score')})
+    if current:
+        yield first_line, current
+
+
+def check_shape(record):
+    """Raise ValueError unless a record is an object of plain values, with "sets" (if a list) a list of such objects
+
+    JSON can nest anything anywhere; checking up front keeps a stray list or
+    object from reaching the parsers or the database and failing the whole job.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('each record must be an object')
+    for field, value in record.items():
+        if field == 'sets' and isinstance(value, list):
+            if not all(isinstance(s, dict) and all(isinstance(v, SCALARS) for v in s.values()) for s in value):
+                raise ValueError('each set must be an object of plain values')
+        elif not isinstance(value, SCALARS):
+            raise ValueError(f'{field} must be a string, number or null')
+
+
+def parse_calorie_record(data):
+    """A calories record as a save_calories() entry, validated like the /add_calories form"""
+    if not data.get('entry_time'):
+        raise ValueError('entry_time is required')
+    entry_time = parse_workout_time(data['entry_time'])
+    form = {'food-item': data.get('food_item'), 'calories': data.get('calories'),
+            'quantity': data.get('quantity'), 'notes': data.get('notes') or ''}
+    form = {name: str(value) if value is not None else None for name, value in form.items()}
+    return parse_calories_form(form, default_time=entry_time)
+
+
+def _existing_exercises(user_id, entries):
+    times = {entry['workout_time'] for entry in entries}
+    return {tuple(row) for row in db.session.execute(
+        db.select(ExerciseLog.exercise_name, ExerciseLog.workout_time)
+        .where(ExerciseLog.user_id == user_id, ExerciseLog.workout_time.in_(times)))}
+
+
+def _existing_calories(user_id, entries):
+    times = {entry['entry_time'] for entry in entries}
+    return {tuple(row) for row in db.session.execute(
+        db.select(CalorieEntry.food_item, CalorieEntry.calories, CalorieEntry.entry_time)
+        .where(CalorieEntry.user_id == user_id, CalorieEntry.entry_time.in_(times)))}
+
+
+# kind -> (group raw records, validate one record, dedup key, existing keys for a batch, save a batch)
+KINDS = {
+    'exercise': (exercise_records, parse_exercise,
+                 lambda e: (e['exercise_name'], e['workout_time']), _existing_exercises, save_exercises),
+    'calories': (lambda records: records, parse_calorie_record,
+                 lambda e: (e['food_item'], e['calories'], e['entry_time']), _existing_calories, save_calories),
+}
+
+
+def import_format(requested, filename):
+    """csv or json, from the request or else the file extension; raises ValueError"""
+    fmt = requested or EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def create_import(user_id, kind, fmt, upload):
+    """Save an uploaded file and record a pending ImportJob; returns (job, path). The caller commits."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    fmt = import_format(fmt, upload.filename)
+    fd, path = tempfile.mkstemp(prefix='import-', suffix=f'.{fmt}', dir=IMPORT_DIR)
+    with os.fdopen(fd, 'wb') as out:
+        upload.save(out)
+    size = os.path.getsize(path)
+    if size > IMPORT_MAX_BYTES:
+        os.remove(path)
+        raise ValueError(f'File is larger than {IMPORT_MAX_BYTES // (1024 * 1024)} MB')
+    job = ImportJob(user_id=user_id, kind=kind, format=fmt, filename=(upload.filename or '')[:255],
+                    status='pending', bytes_total=size)
+    db.session.add(job)
+    db.session.flush()
+    return job, path
+
+
+class _Progress:
+    """Counters for a running job, committed to its row with every batch"""
+
+    def __init__(self, job_id, raw):
+        self.job_id = job_id
+        self.raw = raw
+        self.values = {'rows_read': 0, 'imported': 0, 'duplicates': 0, 'errors': 0}
+        self.error_sample = []
+        self._committed = (dict(self.values), 0)
+
+    def error(self, line, message):
+        self.values['errors'] += 1
+        if len(self.error_sample) < MAX_ERROR_SAMPLE:
+            self.error_sample.append({'line': line, 'error': message})
+
+    def save(self, **values):
+        values = dict(self.values, bytes_read=self.raw.tell(), error_sample=json.dumps(self.error_sample), **values)
+        db.session.execute(update(ImportJob).where(ImportJob.id == self.job_id).values(**values))
+
+    def commit(self, **values):
+        """Save the counters and commit them together with the batch they count"""
+        self.save(**values)
+        db.session.commit()
+        self._committed = (dict(self.values), len(self.error_sample))
+
+    def rollback(self):
+        """Roll back the open batch and go back to the counters of the last commit"""
+        db.session.rollback()
+        values, errors = self._committed
+        self.values = dict(values)
+        del self.error_sample[errors:]
+
+
+def _save_batch(user_id, kind, batch, progress):
+    _, _, key, existing_keys, save = KINDS[kind]
+    existing = existing_keys(user_id, batch)
+    fresh, seen = [], set()
+    for entry in batch:
+        entry_key = key(entry)
+        if entry_key in existing or entry_key in seen:
+            progress.values['duplicates'] += 1
+            continue
+        seen.add(entry_key)
+        fresh.append(entry)
+    if fresh:
+        save(user_id, fresh)
+    progress.values['imported'] += len(fresh)
+
+
+def _import_file(job, path):
+    group, parse, _, _, _ = KINDS[job.kind]
+    with open(path, 'rb') as raw:
+        text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        progress = _Progress(job.id, raw)
+        records = csv_records(text) if job.format == 'csv' else json_records(text)
+        batch = []
+        try:
+            wanted = EXPORT_RECORDS[job.kind]
+            records = ((line, r) for line, r in records
+                       if not isinstance(r, dict) or r.get('record', wanted) == wanted)
+            for line, record in group(records):
+                progress.values['rows_read'] += 1
+                try:
+                    check_shape(record)
+                    batch.append(parse(record))
+                except (TypeError, ValueError, OverflowError) as e:
+                    progress.error(line, str(e))
+                if len(batch) >= IMPORT_BATCH:
+                    _save_batch(job.user_id, job.kind, batch, progress)
+                    progress.commit()
+                    batch = []
+            if batch:
+                _save_batch(job.user_id, job.kind, batch, progress)
+            progress.commit(status='done', finished_at=datetime.utcnow())
+        except (csv.Error, ValueError) as e:
+            # Unreadable file (bad JSON or CSV, not UTF-8...): keep what was committed and report where it stopped
+            progress.rollback()
+            progress.error(getattr(e, 'line', None), f'Import stopped: {e}')
+            progress.commit(status='failed', finished_at=datetime.utcnow())
+
+
+def run_import(app, job_id, path):
+    """Process a pending job; meant to run as a background task"""
+    with app.app_context():
+        try:
+            job = db.session.get(ImportJob, job_id)
+            job.status, job.started_at = 'running', datetime.utcnow()
+            db.session.commit()
+            _import_file(job, path)
+        except Exception:
+            logger.exception('Import job %s failed', job_id)
+            db.session.rollback()
+            db.session.execute(update(ImportJob).where(ImportJob.id == job_id)
+                               .values(status='failed', finished_at=datetime.utcnow()))
+            db.session.commit()
+        finally:
+            os.remove(path)
+            db.session.remove()
+
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'format': job.format,
+        'filename': job.filename,
+        'status': job.status,
+        'progress': round(job.bytes_read / job.bytes_total, 3) if job.bytes_total else 0,
+        'rows_read': job.rows_read,
+        'imported': job.imported,
+        'duplicates': job.duplicates,
+        'errors': job.errors,
+        'error_sample': json.loads(job.error_sample) if job.error_sample else [],
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,173 @@
+"""
+Prometheus metrics, served at /metrics.
+
+  - http_request_duration_seconds / http_requests_total per Flask endpoint
+  - socketio_event_duration_seconds / socketio_events_total per chat event
+  - socketio_connected_clients and chat_room_clients (connections per room)
+  - db_pool_* from this worker's connection pool (see app.dbpool)
+  - cache_requests_total{cache, result} for the identity and chat caches
+
+Under gunicorn every worker has its own counters. Set PROMETHEUS_MULTIPROC_DIR
+to an empty, writable directory and prometheus_client writes each worker's
+values there; /metrics then sums them across workers, whichever worker
+answers the scrape. gunicorn.conf.py clears the directory on start and
+drops the gauges of workers that exit. METRICS_TOKEN, if set, must be sent
+as a bearer token to read /metrics; without it only scrapers on loopback or
+a private network (and not relayed by the public proxy) may read it.
+"""
+import ipaddress
+import os
+import threading
+import time
+from functools import wraps
+from flask import Response, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from app.dbpool import pool_stats
+
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ['method', 'endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by response status', ['method', 'endpoint', 'status'])
+
+SOCKETIO_LATENCY = Histogram(
+    'socketio_event_duration_seconds', 'Time spent in Socket.IO event handlers', ['event'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+SOCKETIO_EVENTS = Counter(
+    'socketio_events_total', 'Socket.IO events handled, by outcome', ['event', 'outcome'])
+SOCKETIO_CLIENTS = Gauge(
+    'socketio_connected_clients', 'Connected Socket.IO clients', multiprocess_mode='livesum')
+ROOM_CLIENTS = Gauge(
+    'chat_room_clients', 'Socket.IO connections joined to each chat room', ['room'],
+    multiprocess_mode='livesum')
+
+DB_POOL_SIZE = Gauge('db_pool_size', 'Configured pool size', multiprocess_mode='livesum')
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Connections in use', multiprocess_mode='livesum')
+DB_POOL_CHECKED_IN = Gauge('db_pool_checked_in', 'Idle connections in the pool', multiprocess_mode='livesum')
+DB_POOL_OVERFLOW = Gauge('db_pool_overflow', 'Connections opened beyond pool_size', multiprocess_mode='livesum')
+DB_POOL_CHECKOUTS = Counter('db_pool_checkouts_total', 'Connection checkouts')
+DB_POOL_CONNECTS = Counter('db_pool_connects_total', 'New database connections opened')
+DB_POOL_TIMEOUTS = Counter('db_pool_timeouts_total', 'Checkouts that timed out waiting for a connection')
+DB_POOL_WAIT = Counter('db_pool_wait_seconds_total', 'Time spent waiting for a pool connection')
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups', ['cache', 'result'])
+
+# Cumulative pool counters already reported, so only the increase is added
+_pool_reported = {'checkouts': 0, 'connects': 0, 'timeouts': 0, 'wait_ms_total': 0.0}
+# Every request thread reports, so reading and advancing _pool_reported must not interleave
+_pool_lock = threading.Lock()
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def track_event(event):
+    """Count a Socket.IO handler's calls and time them"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = 'ok'
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                outcome = 'error'
+                raise
+            finally:
+                SOCKETIO_LATENCY.labels(event).observe(time.perf_counter() - started)
+                SOCKETIO_EVENTS.labels(event, outcome).inc()
+        return wrapper
+    return decorator
+
+
+def client_connected():
+    SOCKETIO_CLIENTS.inc()
+
+
+def client_disconnected():
+    SOCKETIO_CLIENTS.dec()
+
+
+def room_joined(room_name):
+    ROOM_CLIENTS.labels(room_name).inc()
+
+
+def room_left(room_name):
+    ROOM_CLIENTS.labels(room_name).dec()
+
+
+def update_pool_metrics(engine):
+    """Copy this worker's pool_stats() into the db_pool_* metrics"""
+    stats = pool_stats(engine)
+    if 'size' not in stats:
+        return  # SQLite's pool has nothing to report
+    DB_POOL_SIZE.set(stats['size'])
+    DB_POOL_CHECKED_OUT.set(stats['checked_out'])
+    DB_POOL_CHECKED_IN.set(stats['checked_in'])
+    DB_POOL_OVERFLOW.set(max(stats['overflow'], 0))
+    if 'checkouts' not in stats:
+        return
+    with _pool_lock:
+        for key, counter in (('checkouts', DB_POOL_CHECKOUTS), ('connects', DB_POOL_CONNECTS),
+                             ('timeouts', DB_POOL_TIMEOUTS)):
+            delta = stats[key] - _pool_reported[key]
+            if delta > 0:
+                counter.inc(delta)
+            _pool_reported[key] = stats[key]
+        delta = stats['wait_ms_total'] - _pool_reported['wait_ms_total']
+        if delta > 0:
+            DB_POOL_WAIT.inc(delta / 1000)
+        _pool_reported['wait_ms_total'] = stats['wait_ms_total']
+
+
+def render_metrics():
+    """Metrics in the Prometheus text format, summed over workers in multiprocess mode"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def _internal_request():
+    """Whether the request comes from loopback or a private network, both as relayed and as connected"""
+    # ProxyFix keeps the peer address; a client behind the proxy shows up as the proxy's private address there
+    connected = request.environ.get('werkzeug.proxy_fix.orig', {}).get('REMOTE_ADDR', request.remote_addr)
+    try:
+        return all(ipaddress.ip_address(address).is_private for address in (request.remote_addr, connected))
+    except ValueError:
+        return False
+
+
+def init_metrics(app, db):
+    """Time every request and add the /metrics endpoint"""
+    token = os.environ.get('METRICS_TOKEN')
+
+    @app.before_request
+    def start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is None or request.endpoint in ('static', 'metrics'):
+            return response
+        endpoint = request.endpoint or '<unmatched>'
+        HTTP_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        update_pool_metrics(db.engine)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        if not token and not _internal_request():
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        update_pool_metrics(db.engine)
+        return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -24,6 +24,8 @@ class User(db.Model):
         return f'<User {self.email}>'
 
 class FoodLog(db.Model):
+    __table_args__ = (db.Index('ix_food_log_user_meal_time', 'user_id', 'meal_time'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     meal_type = db.Column(db.String(50), nullable=False)  # breakfast, lunch, dinner, snack
@@ -37,6 +39,8 @@ class FoodLog(db.Model):
         return f'<FoodLog {self.food_name} - {self.meal_type}>'
 
 class CalorieEntry(db.Model):
+    __table_args__ = (db.Index('ix_calorie_entry_user_entry_time', 'user_id', 'entry_time'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     food_item = db.Column(db.String(200), nullable=False)
@@ -49,6 +53,8 @@ class CalorieEntry(db.Model):
         return f'<CalorieEntry {self.food_item} - {self.calories} cal>'
 
 class EnergyBurnEntry(db.Model):
+    __table_args__ = (db.Index('ix_energy_burn_entry_user_entry_time', 'user_id', 'entry_time'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     source = db.Column(db.String(20), nullable=False, default='neat')  # neat, cardio, exercise, other
@@ -77,6 +83,8 @@ class UserProfile(db.Model):
         return f'<UserProfile user={self.user_id} goal={self.daily_calorie_goal}>'
 
 class ExerciseLog(db.Model):
+    __table_args__ = (db.Index('ix_exercise_log_user_workout_time', 'user_id', 'workout_time'),)
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     exercise_name = db.Column(db.String(200), nullable=False)
@@ -99,6 +107,8 @@ class ExerciseLog(db.Model):
 
 
 class ExerciseSetLog(db.Model):
+    __table_args__ = (db.Index('ix_exercise_set_log_log_id', 'exercise_log_id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     exercise_log_id = db.Column(db.Integer, db.ForeignKey('exercise_log.id'), nullable=False)
     set_number = db.Column(db.Integer, nullable=False)
@@ -125,6 +135,186 @@ class UserExerciseTarget(db.Model):
     def __repr__(self):
         return f'<UserExerciseTarget {self.exercise_name} user={self.user_id}>'
 
+class DailyUserSummary(db.Model):
+    """Per-user, per-day totals kept up to date as logs are written"""
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', name='uq_daily_user_summary_user_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    calories_in = db.Column(db.Integer, nullable=False, default=0)
+    # Energy burned by EnergyBurnEntry.source
+    burned_neat = db.Column(db.Integer, nullable=False, default=0)
+    burned_cardio = db.Column(db.Integer, nullable=False, default=0)
+    burned_exercise = db.Column(db.Integer, nullable=False, default=0)
+    burned_other = db.Column(db.Integer, nullable=False, default=0)
+    # Exercise totals; sets/reps/max_weight use ExerciseLog values like the /exercise dashboard
+    exercises = db.Column(db.Integer, nullable=False, default=0)
+    sets = db.Column(db.Integer, nullable=False, default=0)
+    reps = db.Column(db.Integer, nullable=False, default=0)
+    volume = db.Column(db.Float, nullable=False, default=0)
+    max_weight = db.Column(db.Float, nullable=True)
+    # Score sums/counts so averages can be maintained incrementally
+    form_sum = db.Column(db.Float, nullable=False, default=0)
+    form_count = db.Column(db.Integer, nullable=False, default=0)
+    effort_sum = db.Column(db.Float, nullable=False, default=0)
+    effort_count = db.Column(db.Integer, nullable=False, default=0)
+    quality_sum = db.Column(db.Float, nullable=False, default=0)
+    quality_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def calories_burned(self):
+        return self.burned_neat + self.burned_cardio + self.burned_exercise + self.burned_other
+
+    @property
+    def avg_form(self):
+        return self.form_sum / self.form_count if self.form_count else None
+
+    @property
+    def avg_effort(self):
+        return self.effort_sum / self.effort_count if self.effort_count else None
+
+    @property
+    def avg_quality(self):
+        return self.quality_sum / self.quality_count if self.quality_count else None
+
+    def __repr__(self):
+        return f'<DailyUserSummary user={self.user_id} day={self.day}>'
+
+class PersonalRecord(db.Model):
+    """A user's best set of an exercise for one kind of record, kept current by app.personal_records"""
+    __table_args__ = (db.UniqueConstraint('user_id', 'exercise_name', 'kind', 'at_weight',
+                                          name='uq_personal_record_user_exercise_kind'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    exercise_name = db.Column(db.String(200), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)   # weight, e1rm, reps, quality
+    at_weight = db.Column(db.Float, nullable=False, default=0)  # reps records are per weight (0 = bodyweight)
+    value = db.Column(db.Float, nullable=False)
+    reps = db.Column(db.Integer, nullable=True)
+    weight = db.Column(db.Float, nullable=True)
+    exercise_log_id = db.Column(db.Integer, db.ForeignKey('exercise_log.id'), nullable=True)
+    set_number = db.Column(db.Integer, nullable=True)
+    achieved_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PersonalRecord {self.exercise_name} {self.kind}={self.value}>'
+
+class SyncKey(db.Model):
+    """Client idempotency key of an entry uploaded through /api/sync, and the row it created"""
+    __table_args__ = (db.UniqueConstraint('user_id', 'key', name='uq_sync_key_user_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)   # food, calories, neat, exercise
+    entity_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SyncKey {self.key} user={self.user_id}>'
+
+class ImportJob(db.Model):
+    """A bulk import of an uploaded file and its progress (see app.imports)"""
+    __table_args__ = (db.Index('ix_import_job_user_created', 'user_id', 'created_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)     # exercise, calories
+    format = db.Column(db.String(10), nullable=False)   # csv, json
+    filename = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    bytes_total = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_read = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_read = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    duplicates = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    error_sample = db.Column(db.Text, nullable=True)    # JSON list of the first errors
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.kind} {self.status}>'
+
+# Exercise catalog: exercises, the muscles they target, and workout templates whose
+# slots each have a primary exercise plus ranked alternatives (see app.catalog)
+exercise_muscle = db.Table(
+    'exercise_muscle',
+    db.Column('exercise_id', db.Integer, db.ForeignKey('exercise.id'), primary_key=True),
+    db.Column('muscle_id', db.Integer, db.ForeignKey('muscle.id'), primary_key=True),
+    db.Column('position', db.Integer, nullable=False, default=0),
+)
+
+class Exercise(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False, unique=True)
+    exercise_type = db.Column(db.String(50), nullable=False)  # strength, cardio, flexibility, sports
+    # Suggestions for exercises logged on their own (cardio, flexibility)
+    default_sets = db.Column(db.Integer, nullable=True)
+    default_reps = db.Column(db.String(50), nullable=True)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+
+    def __repr__(self):
+        return f'<Exercise {self.name}>'
+
+class Muscle(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f'<Muscle {self.name}>'
+
+class WorkoutTemplate(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(50), nullable=False, unique=True)  # workout_a, workout_b
+    name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+
+    def __repr__(self):
+        return f'<WorkoutTemplate {self.slug}>'
+
+class WorkoutTemplateExercise(db.Model):
+    """One slot of a workout template: its primary exercise and prescription"""
+    id = db.Column(db.Integer, primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), nullable=False, index=True)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    category = db.Column(db.String(100), nullable=False)
+    sets = db.Column(db.Integer, nullable=False)
+    reps = db.Column(db.String(50), nullable=False)
+
+    def __repr__(self):
+        return f'<WorkoutTemplateExercise template={self.template_id} exercise={self.exercise_id}>'
+
+class ExerciseAlternative(db.Model):
+    """An exercise that can replace a template slot's primary exercise"""
+    __table_args__ = (db.UniqueConstraint('slot_id', 'exercise_id', name='uq_exercise_alternative_slot_exercise'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    slot_id = db.Column(db.Integer, db.ForeignKey('workout_template_exercise.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    note = db.Column(db.String(255), nullable=True)
+
+    def __repr__(self):
+        return f'<ExerciseAlternative slot={self.slot_id} exercise={self.exercise_id}>'
+
+class CatalogVersion(db.Model):
+    """Single row bumped on every catalog change; workers reload the catalog when it moves"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
+
 class ChatRoom(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
@@ -140,6 +330,8 @@ class ChatRoom(db.Model):
         return f'<ChatRoom {self.name}>'
 
 class ChatMessage(db.Model):
+    __table_args__ = (db.Index('ix_chat_message_room_created_id', 'room_id', 'created_at', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('chat_room.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -156,6 +348,8 @@ class ChatMessage(db.Model):
         return f'<ChatMessage {self.user.name}: {self.message[:50]}>'
 
 class ChatParticipant(db.Model):
+    __table_args__ = (db.UniqueConstraint('room_id', 'user_id', name='uq_chat_participant_room_user'),)
+
     id = db.Column(db.Integer, primary_key=True)
     room_id = db.Column(db.Integer, db.ForeignKey('chat_room.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
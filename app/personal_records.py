@@ -0,0 +1,226 @@
+"""
+Personal records, kept in the personal_record table as sets are saved.
+
+Each user has at most one record per (exercise, kind, at_weight):
+
+  weight   heaviest weight lifted, any reps
+  e1rm     best estimated 1RM (Epley, weighted sets of 1..E1RM_MAX_REPS reps)
+  reps     most reps in one set, per weight (at_weight; 0 for bodyweight)
+  quality  best set quality score
+
+save_exercises() passes every new set through update_personal_records(),
+so PR badges and "new record" notices are a lookup instead of a scan of the
+user's history. Ties keep the earliest set. Anything that changes or removes
+saved sets must call rebuild_personal_records() for the exercises touched,
+since a record may point at a set that no longer holds it.
+"""
+from datetime import datetime
+from sqlalchemy import select, delete, func, null
+from sqlalchemy.exc import IntegrityError
+from app.models import db, PersonalRecord, ExerciseLog, ExerciseSetLog
+from app.progress import E1RM_MAX_REPS
+
+KINDS = ('weight', 'e1rm', 'reps', 'quality')
+LABELS = {'weight': 'heaviest weight', 'e1rm': 'estimated 1RM', 'reps': 'most reps', 'quality': 'best quality'}
+
+
+def e1rm(weight, reps):
+    """Epley estimate, or None outside the rep range it holds up for"""
+    if not weight or weight <= 0 or not reps or not (1 <= reps <= E1RM_MAX_REPS):
+        return None
+    return weight if reps == 1 else round(weight * (1 + reps / 30.0), 2)
+
+
+def _values(reps, weight, quality):
+    """(kind, at_weight, value) for each record a set counts towards"""
+    if weight is not None and weight > 0:
+        yield 'weight', 0.0, weight
+    estimate = e1rm(weight, reps)
+    if estimate is not None:
+        yield 'e1rm', 0.0, estimate
+    if reps:
+        yield 'reps', float(weight or 0), reps
+    if quality is not None:
+        yield 'quality', 0.0, quality
+
+
+def _beats(value, when, best):
+    return value > best['value'] or (value == best['value'] and when < best['achieved_at'])
+
+
+def best_sets(rows):
+    """The best set per (exercise, kind, at_weight) among rows
+
+    rows are (exercise_name, exercise_log_id, set_number, achieved_at, reps,
+    weight, quality_score) tuples; the result maps keys to record column dicts.
+    """
+    best = {}
+    for name, log_id, set_number, when, reps, weight, quality in rows:
+        for kind, at_weight, value in _values(reps, weight, quality):
+            key = (name, kind, at_weight)
+            if key not in best or _beats(value, when, best[key]):
+                best[key] = {'exercise_name': name, 'kind': kind, 'at_weight': at_weight, 'value': value,
+                             'reps': reps, 'weight': weight, 'exercise_log_id': log_id,
+                             'set_number': set_number, 'achieved_at': when}
+    return best
+
+
+def set_rows(logs_and_sets):
+    """best_sets() rows for (ExerciseLog, set row dicts) pairs, as save_exercises() has them"""
+    for log, sets in logs_and_sets:
+        for s in sets:
+            yield (log.exercise_name, log.id, s['set_number'], log.workout_time,
+                   s['reps'], s['weight'], s.get('quality_score'))
+
+
+def update_personal_records(user_id, rows):
+    """Raise the user's records to any better sets among rows; the caller commits
+
+    Returns the records that went up, sorted by exercise and kind, as dicts
+    with the previous value (None for a first record).
+    """
+    candidates = best_sets(rows)
+    if not candidates:
+        return []
+    names = {name for name, _, _ in candidates}
+    existing = {(r.exercise_name, r.kind, r.at_weight): r for r in db.session.scalars(
+        select(PersonalRecord).where(PersonalRecord.user_id == user_id,
+                                     PersonalRecord.exercise_name.in_(names)))}
+
+    changed, fresh = [], []
+    now = datetime.utcnow()
+    for key, best in candidates.items():
+        record = existing.get(key)
+        if record is None:
+            fresh.append(best)
+        elif _beats(best['value'], best['achieved_at'], {'value': record.value, 'achieved_at': record.achieved_at}):
+            previous = record.value
+            for column, value in best.items():
+                setattr(record, column, value)
+            record.updated_at = now
+            if best['value'] > previous:
+                changed.append(dict(best, previous=previous))
+
+    if fresh:
+        try:
+            with db.session.begin_nested():
+                db.session.add_all([PersonalRecord(user_id=user_id, updated_at=now, **best) for best in fresh])
+            changed.extend(dict(best, previous=None) for best in fresh)
+        except IntegrityError:
+            # Some were saved concurrently by another request: merge one at a time instead
+            changed.extend(_merge_one(user_id, best, now) for best in fresh)
+            changed = [record for record in changed if record is not None]
+    changed.sort(key=lambda r: (r['exercise_name'], KINDS.index(r['kind']), r['at_weight']))
+    return changed
+
+
+def _merge_one(user_id, best, now):
+    try:
+        with db.session.begin_nested():
+            db.session.add(PersonalRecord(user_id=user_id, updated_at=now, **best))
+        return dict(best, previous=None)
+    except IntegrityError:
+        pass
+    record = db.session.scalars(select(PersonalRecord).filter_by(
+        user_id=user_id, exercise_name=best['exercise_name'], kind=best['kind'], at_weight=best['at_weight'])).one()
+    if not _beats(best['value'], best['achieved_at'], {'value': record.value, 'achieved_at': record.achieved_at}):
+        return None
+    previous = record.value
+    for column, value in best.items():
+        setattr(record, column, value)
+    record.updated_at = now
+    return dict(best, previous=previous) if best['value'] > previous else None
+
+
+def record_rows(user_id=None, exercise_names=None):
+    """best_sets() rows from saved history; logs without set rows count as one set"""
+    L, S = ExerciseLog, ExerciseSetLog
+    filters = []
+    if user_id is not None:
+        filters.append(L.user_id == user_id)
+    if exercise_names is not None:
+        filters.append(L.exercise_name.in_(exercise_names))
+    yield from db.session.execute(
+        select(L.exercise_name, L.id, S.set_number, L.workout_time, S.reps, S.weight, S.quality_score)
+        .join(S, S.exercise_log_id == L.id).where(*filters))
+    quality = func.round(L.form_score * (L.effort_score / 10.0), 2)
+    yield from db.session.execute(
+        select(L.exercise_name, L.id, null(), L.workout_time, L.reps, L.weight, quality)
+        .where(*filters, ~select(S.id).where(S.exercise_log_id == L.id).exists()))
+
+
+def rebuild_personal_records(user_id, exercise_names=None):
+    """Recompute records from history, e.g. after sets are edited or deleted; the caller commits"""
+    query = delete(PersonalRecord).where(PersonalRecord.user_id == user_id)
+    if exercise_names is not None:
+        query = query.where(PersonalRecord.exercise_name.in_(exercise_names))
+    db.session.execute(query)
+    now = datetime.utcnow()
+    records = [dict(best, user_id=user_id, updated_at=now)
+               for best in best_sets(record_rows(user_id, exercise_names)).values()]
+    if records:
+        db.session.execute(PersonalRecord.__table__.insert(), records)
+
+
+def records_for(user_id, exercise_name=None):
+    """The user's records, grouped by exercise"""
+    query = select(PersonalRecord).where(PersonalRecord.user_id == user_id)
+    if exercise_name is not None:
+        query = query.where(PersonalRecord.exercise_name == exercise_name)
+    grouped = {}
+    for record in db.session.scalars(query.order_by(PersonalRecord.exercise_name, PersonalRecord.at_weight)):
+        entry = grouped.setdefault(record.exercise_name, {'exercise_name': record.exercise_name, 'reps_at_weight': []})
+        if record.kind == 'reps':
+            entry['reps_at_weight'].append(record_dict(record))
+        else:
+            entry[record.kind] = record_dict(record)
+    return list(grouped.values())
+
+
+def record_dict(record):
+    return {
+        'kind': record.kind,
+        'value': record.value,
+        'reps': record.reps,
+        'weight': record.weight,
+        'at_weight': record.at_weight if record.kind == 'reps' else None,
+        'exercise_log_id': record.exercise_log_id,
+        'set_number': record.set_number,
+        'achieved_at': record.achieved_at.isoformat(),
+    }
+
+
+def record_logs(user_id, log_ids):
+    """The ids among log_ids holding a current weight or e1RM record, for PR badges"""
+    if not log_ids:
+        return set()
+    return set(db.session.scalars(select(PersonalRecord.exercise_log_id).where(
+        PersonalRecord.user_id == user_id, PersonalRecord.kind.in_(('weight', 'e1rm')),
+        PersonalRecord.exercise_log_id.in_(log_ids))))
+
+
+def notice(record):
+    """A changed record from update_personal_records() as JSON"""
+    return {
+        'exercise_name': record['exercise_name'],
+        'kind': record['kind'],
+        'value': record['value'],
+        'previous': record['previous'],
+        'at_weight': record['at_weight'] if record['kind'] == 'reps' else None,
+        'exercise_log_id': record['exercise_log_id'],
+        'set_number': record['set_number'],
+        'achieved_at': record['achieved_at'].isoformat(),
+        'message': describe(record),
+    }
+
+
+def describe(record):
+    """Short notice text for a changed record"""
+    if record['kind'] == 'reps':
+        where = f" at {record['at_weight']:g}" if record['at_weight'] else ''
+        text = f"{record['value']:g} reps{where}"
+    else:
+        text = f"{LABELS[record['kind']]} {record['value']:g}"
+    if record['previous'] is not None:
+        text += f" (was {record['previous']:g})"
+    return f"{record['exercise_name']}: {text}"
@@ -0,0 +1,266 @@
+"""
+Chat presence with heartbeats.
+
+Every connection that joins a room holds a presence entry that it refreshes
+by joining, sending, or emitting `heartbeat` (chat.js does so every
+20s). Entries not refreshed within PRESENCE_TTL_S are expired by a
+sweep. Presence is therefore self-healing: a worker that dies simply
+stops refreshing its connections. A user is online in a room while any
+of their connections is.
+
+Online/offline transitions are coalesced and sent once per
+PRESENCE_FLUSH_MS as one `presence` event per room ({room, joined, left}).
+Participant rows are only written on transitions and, for users who stay
+online, at most every PRESENCE_PERSIST_S. Both go through the chat
+write-behind buffer. ChatParticipant.is_online is kept for reporting.
+Rows left online by a crashed process are switched off once their
+last_active is old enough.
+
+The store is in-process by default, or Redis sorted sets (member
+"<user_id>:<sid>", score = last heartbeat) when CHAT_STATE_URL is redis://.
+The store also remembers each room's name, so whichever worker sweeps a
+room can announce the change even if none of its own connections joined it.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from app.models import db, ChatParticipant
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL_S', '60'))
+PRESENCE_FLUSH = int(os.environ.get('PRESENCE_FLUSH_MS', '1000')) / 1000.0
+PRESENCE_SWEEP = int(os.environ.get('PRESENCE_SWEEP_S', '10'))
+PRESENCE_PERSIST = int(os.environ.get('PRESENCE_PERSIST_S', '60'))
+
+
+class MemoryPresenceStore:
+    """Presence entries for this process: room id -> {sid: (user_id, last_seen)}"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}
+        self._names = {}
+
+    def touch(self, room_id, room_name, sid, user_id, now):
+        """Refresh an entry; True if the user was not online in the room before"""
+        with self._lock:
+            self._names[room_id] = room_name
+            entries = self._rooms.setdefault(room_id, {})
+            was_online = any(uid == user_id for uid, _ in entries.values())
+            entries[sid] = (user_id, now)
+        return not was_online
+
+    def remove(self, room_id, sid, user_id):
+        """Drop an entry; True if that took the user offline in the room"""
+        with self._lock:
+            entries = self._rooms.get(room_id, {})
+            if entries.pop(sid, None) is None:
+                return False
+            return not any(uid == user_id for uid, _ in entries.values())
+
+    def expire(self, cutoff):
+        """Drop entries last seen before cutoff; (room_id, user_id) pairs that went offline"""
+        offline = []
+        with self._lock:
+            for room_id, entries in self._rooms.items():
+                stale = [(sid, uid) for sid, (uid, seen) in entries.items() if seen < cutoff]
+                for sid, _ in stale:
+                    del entries[sid]
+                remaining = {uid for uid, _ in entries.values()}
+                offline.extend((room_id, uid) for uid in {uid for _, uid in stale} - remaining)
+        return offline
+
+    def users(self, room_id, cutoff):
+        with self._lock:
+            return {uid for uid, seen in self._rooms.get(room_id, {}).values() if seen >= cutoff}
+
+    def room_names(self, room_ids):
+        """{room_id: name} for rooms that have had presence entries"""
+        with self._lock:
+            return {room_id: self._names[room_id] for room_id in room_ids if room_id in self._names}
+
+
+class RedisPresenceStore:
+    """Presence entries shared by all workers, one sorted set per room"""
+
+    def __init__(self, url, prefix='chat'):
+        import redis
+        self.redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, room_id):
+        return f'{self.prefix}:presence:{room_id}'
+
+    @property
+    def _rooms_key(self):
+        # Hash of room id -> name for every room with presence entries, from any worker
+        return f'{self.prefix}:presence:room_names'
+
+    def _has_user(self, room_id, user_id):
+        marker = f'{user_id}:'.encode()
+        return any(m.startswith(marker) for m in self.redis.zrange(self._key(room_id), 0, -1))
+
+    def touch(self, room_id, room_name, sid, user_id, now):
+        was_online = self._has_user(room_id, user_id)
+        pipe = self.redis.pipeline()
+        pipe.zadd(self._key(room_id), {f'{user_id}:{sid}': now})
+        pipe.hset(self._rooms_key, room_id, room_name)
+        pipe.execute()
+        return not was_online
+
+    def remove(self, room_id, sid, user_id):
+        if not self.redis.zrem(self._key(room_id), f'{user_id}:{sid}'):
+            return False
+        return not self._has_user(room_id, user_id)
+
+    def expire(self, cutoff):
+        offline = []
+        for raw_room in self.redis.hkeys(self._rooms_key):
+            room_id = int(raw_room)
+            for member in self.redis.zrangebyscore(self._key(room_id), '-inf', f'({cutoff}'):
+                # Whichever worker removes the entry reports the transition
+                if self.redis.zrem(self._key(room_id), member):
+                    user_id = int(member.split(b':', 1)[0])
+                    if not self._has_user(room_id, user_id):
+                        offline.append((room_id, user_id))
+        return offline
+
+    def users(self, room_id, cutoff):
+        return {int(m.split(b':', 1)[0]) for m in self.redis.zrangebyscore(self._key(room_id), cutoff, '+inf')}
+
+    def room_names(self, room_ids):
+        room_ids = list(room_ids)
+        if not room_ids:
+            return {}
+        names = self.redis.hmget(self._rooms_key, room_ids)
+        return {room_id: name.decode() for room_id, name in zip(room_ids, names) if name is not None}
+
+
+def create_presence_store():
+    url = os.environ.get('CHAT_STATE_URL', 'memory://')
+    if url.startswith('redis'):
+        return RedisPresenceStore(url)
+    return _shared_memory_store
+
+
+_shared_memory_store = MemoryPresenceStore()
+
+
+class Presence:
+    """Tracks who is online per room and tells rooms about changes in batches"""
+
+    def __init__(self, socketio, writer, store=None, ttl=PRESENCE_TTL):
+        self.socketio = socketio
+        self.writer = writer
+        self.store = store or create_presence_store()
+        self.ttl = ttl
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending = {}      # room id -> {'joined': {user_id: name}, 'left': set()}
+        self._persisted = {}    # (user_id, room_id) -> time last_active was queued
+        self._pid = None
+        self._last_heal = 0
+
+    def join(self, room, user_id, user_name, sid):
+        self._refresh(room, user_id, user_name, sid)
+        self._ensure_started()
+
+    def heartbeat(self, rooms, user_id, user_name, sid):
+        for room in rooms:
+            self._refresh(room, user_id, user_name, sid)
+        self._ensure_started()
+
+    def leave(self, room, user_id, sid):
+        if self.store.remove(room['id'], sid, user_id):
+            self._went_offline(room['id'], user_id)
+        self._ensure_started()
+
+    def online(self, room_id):
+        return self.store.users(room_id, time.time() - self.ttl)
+
+    def _refresh(self, room, user_id, user_name, sid):
+        room_id = room['id']
+        now = time.time()
+        if self.store.touch(room_id, room['name'], sid, user_id, now):
+            with self._lock:
+                pending = self._pending.setdefault(room_id, {'joined': {}, 'left': set()})
+                pending['left'].discard(user_id)
+                pending['joined'][user_id] = user_name
+            self._persist(user_id, room_id, now, True)
+        elif now - self._persisted.get((user_id, room_id), 0) >= PRESENCE_PERSIST:
+            self._persist(user_id, room_id, now, True)
+
+    def _went_offline(self, room_id, user_id):
+        with self._lock:
+            pending = self._pending.setdefault(room_id, {'joined': {}, 'left': set()})
+            pending['joined'].pop(user_id, None)
+            pending['left'].add(user_id)
+        self._persist(user_id, room_id, time.time(), False)
+
+    def _persist(self, user_id, room_id, now, is_online):
+        if is_online:
+            self._persisted[(user_id, room_id)] = now
+        else:
+            self._persisted.pop((user_id, room_id), None)
+        self.writer.touch(user_id, room_id, datetime.utcfromtimestamp(now), is_online=is_online)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            if self.app is None:
+                self.app = current_app._get_current_object()
+            self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        last_sweep = time.monotonic()
+        while True:
+            self.socketio.sleep(PRESENCE_FLUSH)
+            try:
+                with self.app.app_context():
+                    if time.monotonic() - last_sweep >= PRESENCE_SWEEP:
+                        last_sweep = time.monotonic()
+                        self.sweep()
+                    self.flush()
+            except Exception:
+                logger.exception('Presence update failed')
+
+    def sweep(self):
+        """Expire connections that stopped heartbeating, and stale is_online rows"""
+        for room_id, user_id in self.store.expire(time.time() - self.ttl):
+            self._went_offline(room_id, user_id)
+
+        # Live users refresh last_active every PRESENCE_PERSIST; anything much older is left over
+        if time.monotonic() - self._last_heal < PRESENCE_PERSIST:
+            return
+        self._last_heal = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl + 2 * PRESENCE_PERSIST)
+        db.session.execute(update(ChatParticipant)
+                           .where(ChatParticipant.is_online == True, ChatParticipant.last_active < cutoff)
+                           .values(is_online=False))
+        db.session.commit()
+
+    def flush(self):
+        """Send the coalesced joins and leaves for each room"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        pending = {room_id: changes for room_id, changes in pending.items() if changes['joined'] or changes['left']}
+        # From the store, not this worker's joins: a sweep reports rooms any worker's connections were in
+        room_names = self.store.room_names(pending)
+        for room_id, changes in pending.items():
+            room_name = room_names.get(room_id)
+            if room_name is None:
+                continue
+            self.socketio.emit('presence', {
+                'room': room_name,
+                'joined': [{'user_id': uid, 'user_name': name} for uid, name in changes['joined'].items()],
+                'left': sorted(changes['left']),
+            }, to=room_name)
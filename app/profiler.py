@@ -0,0 +1,168 @@
+"""
+Per-request SQL profiling.
+
+SQLAlchemy cursor events and Flask request hooks record, for every request,
+the number of statements, total DB time, the slowest statement and the time
+spent rendering templates. With PROFILE_HEADERS (on by default in debug
+mode) the numbers are returned as X-DB-* and Server-Timing headers.
+Requests slower than SLOW_REQUEST_MS are logged as one JSON line on the
+app.slow_requests logger. Per-endpoint totals for this worker are served
+by /debug/db.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '500'))
+STATEMENT_PREVIEW = 300
+
+slow_log = logging.getLogger('app.slow_requests')
+
+_endpoints = {}
+_lock = threading.Lock()
+_engine_hooks_installed = False
+
+
+def _enabled(flag, default):
+    value = os.environ.get(flag)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_profile_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_profile_started'].pop()
+    if not has_request_context():
+        return  # background tasks, CLI scripts
+    profile = g.get('_sql_profile')
+    if profile is None:
+        return
+    elapsed = (time.perf_counter() - started) * 1000
+    profile['queries'] += 1
+    profile['db_ms'] += elapsed
+    if elapsed > profile['slowest_ms']:
+        profile['slowest_ms'] = elapsed
+        profile['slowest_sql'] = ' '.join(statement.split())[:STATEMENT_PREVIEW]
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute doesn't fire for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('_profile_started'):
+        conn.info['_profile_started'].pop()
+
+
+def _before_render(sender, template, context, **extra):
+    profile = g.get('_sql_profile') if has_request_context() else None
+    if profile is not None and profile['render_started'] is None:
+        profile['render_started'] = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    profile = g.get('_sql_profile') if has_request_context() else None
+    if profile is not None and profile['render_started'] is not None:
+        profile['render_ms'] += (time.perf_counter() - profile['render_started']) * 1000
+        profile['render_started'] = None
+
+
+def _record(endpoint, profile, total_ms):
+    with _lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = {
+                'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0, 'max_queries': 0,
+                'db_ms': 0.0, 'render_ms': 0.0, 'slow_requests': 0, 'slowest_sql_ms': 0.0, 'slowest_sql': None,
+            }
+        stats['requests'] += 1
+        stats['total_ms'] += total_ms
+        stats['max_ms'] = max(stats['max_ms'], total_ms)
+        stats['queries'] += profile['queries']
+        stats['max_queries'] = max(stats['max_queries'], profile['queries'])
+        stats['db_ms'] += profile['db_ms']
+        stats['render_ms'] += profile['render_ms']
+        if total_ms >= SLOW_REQUEST_MS:
+            stats['slow_requests'] += 1
+        if profile['slowest_ms'] > stats['slowest_sql_ms']:
+            stats['slowest_sql_ms'] = profile['slowest_ms']
+            stats['slowest_sql'] = profile['slowest_sql']
+
+
+def endpoint_stats():
+    """Per-endpoint request, query and timing totals for this worker"""
+    with _lock:
+        snapshot = {name: dict(stats) for name, stats in _endpoints.items()}
+    for stats in snapshot.values():
+        n = stats['requests']
+        stats['avg_ms'] = round(stats['total_ms'] / n, 2)
+        stats['avg_queries'] = round(stats['queries'] / n, 2)
+        stats['avg_db_ms'] = round(stats['db_ms'] / n, 2)
+        stats['avg_render_ms'] = round(stats['render_ms'] / n, 2)
+        for key in ('total_ms', 'max_ms', 'db_ms', 'render_ms', 'slowest_sql_ms'):
+            stats[key] = round(stats[key], 2)
+    return dict(sorted(snapshot.items(), key=lambda item: item[1]['total_ms'], reverse=True))
+
+
+def init_profiler(app):
+    """Install the SQL/request hooks unless PROFILE_SQL is turned off"""
+    global _engine_hooks_installed
+    if not _enabled('PROFILE_SQL', True):
+        return
+    headers = _enabled('PROFILE_HEADERS', app.debug)
+
+    # Listen on the Engine class so the hooks don't need an app context to find db.engine
+    if not _engine_hooks_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _engine_hooks_installed = True
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_profile():
+        g._sql_profile = {
+            'started': time.perf_counter(), 'queries': 0, 'db_ms': 0.0, 'render_ms': 0.0,
+            'render_started': None, 'slowest_ms': 0.0, 'slowest_sql': None,
+        }
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('_sql_profile', None)
+        if profile is None or request.endpoint == 'static':
+            return response
+        total_ms = (time.perf_counter() - profile['started']) * 1000
+        endpoint = request.endpoint or '<unmatched>'
+        _record(endpoint, profile, total_ms)
+
+        if headers:
+            response.headers['X-DB-Queries'] = str(profile['queries'])
+            response.headers['X-DB-Time-ms'] = f"{profile['db_ms']:.2f}"
+            response.headers['X-Render-Time-ms'] = f"{profile['render_ms']:.2f}"
+            response.headers['Server-Timing'] = (
+                f"db;dur={profile['db_ms']:.2f}, render;dur={profile['render_ms']:.2f}, total;dur={total_ms:.2f}"
+            )
+
+        if total_ms >= SLOW_REQUEST_MS:
+            slow_log.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'db_ms': round(profile['db_ms'], 2),
+                'queries': profile['queries'],
+                'render_ms': round(profile['render_ms'], 2),
+                'slowest_sql_ms': round(profile['slowest_ms'], 2),
+                'slowest_sql': profile['slowest_sql'],
+            }))
+        return response
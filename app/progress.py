@@ -0,0 +1,181 @@
+"""
+Strength progression for one exercise, computed over whole columns with NumPy.
+
+A user's sets for an exercise are fetched as plain (time, reps, weight)
+tuples and turned into arrays once; everything after that is vectorized:
+
+  - estimated 1RM per set (Epley by default, Brzycki on request), only for
+    weighted sets of 1..E1RM_MAX_REPS reps, where the formulas hold up
+  - per-session (calendar day) best e1RM, top weight, sets, reps and
+    volume load (reps x weight), via reduceat over day boundaries
+  - trailing rolling averages over a window of calendar days, from
+    cumulative sums and searchsorted rather than a loop per session
+  - the least-squares slope of best e1RM and of volume, per week
+  - personal records: sessions whose best e1RM beats every earlier one
+
+Logs saved before per-set rows existed count as `sets` identical sets,
+the same fallback the dashboard uses.
+"""
+import numpy as np
+from sqlalchemy import select
+from app.models import db, ExerciseLog, ExerciseSetLog
+
+E1RM_MAX_REPS = 12
+DEFAULT_WINDOW_DAYS = 28
+MAX_WINDOW_DAYS = 365
+# ?days= lookback cap; far beyond any history, well inside what date arithmetic can represent
+MAX_LOOKBACK_DAYS = 366 * 20
+
+
+def epley(weight, reps):
+    return np.where(reps == 1, weight, weight * (1 + reps / 30.0))
+
+
+def brzycki(weight, reps):
+    return weight * 36.0 / (37.0 - reps)
+
+
+FORMULAS = {'epley': epley, 'brzycki': brzycki}
+
+
+def load_sets(user_id, exercise_name, start=None):
+    """(day numbers, reps, weights) arrays of the user's sets of an exercise, oldest first"""
+    L, S = ExerciseLog, ExerciseSetLog
+    filters = [L.user_id == user_id, L.exercise_name == exercise_name]
+    if start is not None:
+        filters.append(L.workout_time >= start)
+    set_rows = db.session.execute(
+        select(L.workout_time, S.reps, S.weight).join(S, S.exercise_log_id == L.id).where(*filters)
+    ).all()
+    # Logs without set rows stand for `sets` copies of their reps/weight
+    log_rows = db.session.execute(
+        select(L.workout_time, L.reps, L.weight, L.sets).where(
+            *filters, ~select(S.id).where(S.exercise_log_id == L.id).exists())
+    ).all()
+
+    times = [row[0] for row in set_rows] + [row[0] for row in log_rows]
+    if not times:
+        return None
+    copies = np.concatenate([np.ones(len(set_rows), dtype=np.int64),
+                             np.maximum(np.array([row[3] or 1 for row in log_rows], dtype=np.int64), 1)])
+    days = np.array(times, dtype='datetime64[D]').astype(np.int64)
+    reps = np.array([row[1] for row in set_rows] + [row[1] for row in log_rows], dtype=float)
+    weights = np.array([row[2] for row in set_rows] + [row[2] for row in log_rows], dtype=float)
+    days, reps, weights = (np.repeat(column, copies) for column in (days, reps, weights))
+
+    order = np.argsort(days, kind='stable')
+    return days[order], reps[order], weights[order]
+
+
+def estimated_1rm(weights, reps, formula='epley'):
+    """e1RM per set; NaN for bodyweight sets and rep counts the formulas don't cover"""
+    valid = (weights > 0) & (reps >= 1) & (reps <= E1RM_MAX_REPS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        e1rm = FORMULAS[formula](weights, reps)
+    return np.where(valid, e1rm, np.nan)
+
+
+def _rolling_mean(days, values, window):
+    """Mean of the non-NaN values in the trailing window of calendar days ending at each point"""
+    present = ~np.isnan(values)
+    value_sums = np.concatenate([[0.0], np.cumsum(np.where(present, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(present)])
+    end = np.arange(1, len(days) + 1)
+    begin = np.searchsorted(days, days - window + 1, side='left')
+    n = counts[end] - counts[begin]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, (value_sums[end] - value_sums[begin]) / n, np.nan)
+
+
+def _weekly_slope(days, values):
+    """Least-squares slope of values against time, per week; None with under two points"""
+    present = ~np.isnan(values)
+    if present.sum() < 2 or np.ptp(days[present]) == 0:
+        return None
+    slope, _ = np.polyfit(days[present].astype(float), values[present], 1)
+    return float(slope * 7)
+
+
+def _round(value, digits):
+    return None if value is None else round(value, digits)
+
+
+def _rounded(values, digits=1):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def _day_iso(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def progress(user_id, exercise_name, start=None, window=DEFAULT_WINDOW_DAYS, formula='epley'):
+    """Per-session progression series and summary for one exercise, or None if never logged"""
+    loaded = load_sets(user_id, exercise_name, start)
+    if loaded is None:
+        return None
+    days, reps, weights = loaded
+
+    e1rm = estimated_1rm(weights, reps, formula)
+    volume = reps * np.nan_to_num(weights)
+
+    # Sessions are calendar days; days is sorted, so each session is a contiguous run
+    starts = np.flatnonzero(np.concatenate([[True], days[1:] != days[:-1]]))
+    session_days = days[starts]
+    with np.errstate(invalid='ignore'):
+        best_e1rm = np.fmax.reduceat(e1rm, starts)
+        top_weight = np.fmax.reduceat(weights, starts)
+    session_volume = np.add.reduceat(volume, starts)
+    session_reps = np.add.reduceat(reps, starts)
+    session_sets = np.diff(np.concatenate([starts, [len(days)]]))
+
+    # A PR is a session beating the best e1RM of every earlier session
+    previous_best = np.concatenate([[np.nan], np.fmax.accumulate(best_e1rm)[:-1]])
+    is_pr = ~np.isnan(best_e1rm) & (np.isnan(previous_best) | (best_e1rm > previous_best))
+
+    rolling_e1rm = _rolling_mean(session_days, best_e1rm, window)
+    rolling_volume = _rolling_mean(session_days, session_volume, window)
+
+    def record(values):
+        if np.all(np.isnan(values)):
+            return None
+        i = int(np.nanargmax(values))
+        return {'value': round(float(values[i]), 1), 'date': _day_iso(session_days[i])}
+
+    return {
+        'exercise_name': exercise_name,
+        'formula': formula,
+        'window_days': window,
+        'summary': {
+            'sessions': int(len(starts)),
+            'sets': int(len(days)),
+            'reps': int(reps.sum()),
+            'volume': round(float(volume.sum()), 1),
+            'first_session': _day_iso(session_days[0]),
+            'last_session': _day_iso(session_days[-1]),
+            'best_e1rm': record(best_e1rm),
+            'top_weight': record(top_weight),
+            'best_volume': record(session_volume),
+            'e1rm_slope_per_week': _round(_weekly_slope(session_days, best_e1rm), 2),
+            'volume_slope_per_week': _round(_weekly_slope(session_days, session_volume), 1),
+            'prs': int(is_pr.sum()),
+        },
+        'sessions': {
+            'dates': session_days.astype('datetime64[D]').astype(str).tolist(),
+            'best_e1rm': _rounded(best_e1rm),
+            'top_weight': _rounded(top_weight),
+            'volume': _rounded(session_volume),
+            'sets': session_sets.tolist(),
+            'reps': session_reps.astype(int).tolist(),
+            'rolling_e1rm': _rounded(rolling_e1rm),
+            'rolling_volume': _rounded(rolling_volume),
+            'pr': is_pr.tolist(),
+        },
+    }
+
+
+def window_days(value):
+    try:
+        window = int(value) if value is not None else DEFAULT_WINDOW_DAYS
+    except (TypeError, ValueError):
+        window = DEFAULT_WINDOW_DAYS
+    return max(1, min(window, MAX_WINDOW_DAYS))
@@ -0,0 +1,194 @@
+"""
+Incremental maintenance of the daily_user_summary rollup table.
+
+Writers call the record_* helpers in the same transaction as the raw rows
+they insert; the caller is responsible for committing. Every change drops
+the user's cached trend series (app.trends).
+"""
+from datetime import date, timedelta
+from sqlalchemy import case, select, update
+from sqlalchemy.exc import IntegrityError
+from app.models import db, DailyUserSummary
+from app.trends import build_trends, invalidate_user_trends, MAX_POINTS
+
+BURN_COLUMNS = {
+    'neat': 'burned_neat',
+    'cardio': 'burned_cardio',
+    'exercise': 'burned_exercise',
+}
+
+
+def _day(when):
+    return when.date() if hasattr(when, 'date') else when
+
+
+def _update(user_id, day, deltas, max_weight=None, core=False):
+    """UPDATE adding deltas to one summary row; core=True skips the ORM session synchronization"""
+    S = DailyUserSummary.__table__.c if core else DailyUserSummary
+    values = {name: getattr(S, name) + delta for name, delta in deltas.items()}
+    if max_weight is not None:
+        values['max_weight'] = case(
+            ((S.max_weight.is_(None)) | (S.max_weight < max_weight), max_weight),
+            else_=S.max_weight,
+        )
+    target = DailyUserSummary.__table__ if core else DailyUserSummary
+    return update(target).where(S.user_id == user_id, S.day == day).values(**values)
+
+
+def _bump(user_id, day, deltas, max_weight=None):
+    """Add deltas to the user's row for day, creating the row if it doesn't exist yet"""
+    S = DailyUserSummary
+    invalidate_user_trends(user_id)
+    stmt = _update(user_id, day, deltas, max_weight)
+    if db.session.execute(stmt).rowcount:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(S(user_id=user_id, day=day, max_weight=max_weight, **deltas))
+    except IntegrityError:
+        # Another writer created the row first
+        db.session.execute(stmt)
+
+
+def _bump_days(user_id, days):
+    """_bump for many days at once, given {day: (deltas, max_weight)} with the same delta names
+
+    One query finds which rows exist; those are updated and the rest inserted with a
+    single executemany, so importing years of history doesn't cost a savepoint per day.
+    The updates bypass the session, which is fine as long as the caller hasn't loaded
+    these summary rows in the same transaction.
+    """
+    if len(days) < 2:
+        for day, (deltas, max_weight) in days.items():
+            _bump(user_id, day, deltas, max_weight=max_weight)
+        return
+
+    S = DailyUserSummary
+    invalidate_user_trends(user_id)
+    existing = set(db.session.scalars(select(S.day).where(S.user_id == user_id, S.day.in_(list(days)))))
+    for day in existing:
+        deltas, max_weight = days[day]
+        db.session.execute(_update(user_id, day, deltas, max_weight, core=True))
+    missing = [day for day in days if day not in existing]
+    if not missing:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(S.__table__.insert(), [
+                dict(days[day][0], user_id=user_id, day=day, max_weight=days[day][1]) for day in missing
+            ])
+    except IntegrityError:
+        # Another writer created some of the rows first
+        for day in missing:
+            _bump(user_id, day, *days[day])
+
+
+def record_calories(user_id, when, calories):
+    _bump(user_id, _day(when), {'calories_in': calories})
+
+
+def record_energy_burn(user_id, when, source, calories_burned):
+    column = BURN_COLUMNS.get(source, 'burned_other')
+    _bump(user_id, _day(when), {column: calories_burned})
+
+
+def _exercise_deltas(log, sets):
+    """Summary deltas for an ExerciseLog and its set rows (dicts of ExerciseSetLog columns)"""
+    deltas = {
+        'exercises': 1,
+        'sets': log.sets or 0,
+        'reps': log.reps or 0,
+        'volume': 0.0,
+        'form_sum': 0.0, 'form_count': 0,
+        'effort_sum': 0.0, 'effort_count': 0,
+        'quality_sum': 0.0, 'quality_count': 0,
+    }
+    if sets:
+        scored = [(s['form_score'], s['effort_score'], s['quality_score'], s['reps'], s['weight']) for s in sets]
+    else:
+        # No per-set rows: score the log as a single entry like the dashboard does
+        quality = None
+        if log.form_score is not None and log.effort_score is not None:
+            quality = log.form_score * (log.effort_score / 10.0)
+        scored = [(log.form_score, log.effort_score, quality, (log.sets or 0) * (log.reps or 0), log.weight)]
+
+    for form, effort, quality, reps, weight in scored:
+        if form is not None:
+            deltas['form_sum'] += form
+            deltas['form_count'] += 1
+        if effort is not None:
+            deltas['effort_sum'] += effort
+            deltas['effort_count'] += 1
+        if quality is not None:
+            deltas['quality_sum'] += quality
+            deltas['quality_count'] += 1
+        if weight is not None:
+            deltas['volume'] += (reps or 0) * float(weight)
+    return deltas
+
+
+def record_exercises(items):
+    """Fold (ExerciseLog, set rows) pairs into the summaries with one bump per user and day"""
+    merged = {}
+    for log, sets in items:
+        key = (log.user_id, _day(log.workout_time))
+        deltas = _exercise_deltas(log, sets)
+        if key not in merged:
+            merged[key] = [deltas, log.weight]
+            continue
+        acc = merged[key]
+        for name, value in deltas.items():
+            acc[0][name] += value
+        if log.weight is not None and (acc[1] is None or log.weight > acc[1]):
+            acc[1] = log.weight
+
+    by_user = {}
+    for (user_id, day), value in merged.items():
+        by_user.setdefault(user_id, {})[day] = tuple(value)
+    for user_id, days in by_user.items():
+        _bump_days(user_id, days)
+
+
+def summary_for(user_id, day):
+    return DailyUserSummary.query.filter_by(user_id=user_id, day=day).first()
+
+
+def summaries_between(user_id, start, end):
+    """Summary rows for days in [start, end), keyed by day"""
+    rows = DailyUserSummary.query.filter(
+        DailyUserSummary.user_id == user_id,
+        DailyUserSummary.day >= start,
+        DailyUserSummary.day < end,
+    ).all()
+    return {row.day: row for row in rows}
+
+
+def exercise_summary_stats(user_id, start, end):
+    """Dashboard stats and per-day trends for days in [start, end)"""
+    rows = summaries_between(user_id, start, end)
+    exercise_rows = [r for r in rows.values() if r.exercises]
+
+    form_sum = sum(r.form_sum for r in exercise_rows)
+    form_count = sum(r.form_count for r in exercise_rows)
+    effort_sum = sum(r.effort_sum for r in exercise_rows)
+    effort_count = sum(r.effort_count for r in exercise_rows)
+
+    # Uncached: the totals above are live, and another worker's cached series could lag behind them
+    daily = build_trends(user_id, start, end - timedelta(days=1), 'day', MAX_POINTS)
+
+    weights = [r.max_weight for r in exercise_rows if r.max_weight]
+    return {
+        'workouts': len(exercise_rows),
+        'sets': sum(r.sets for r in exercise_rows),
+        'reps': sum(r.reps for r in exercise_rows),
+        'max_weight': max(weights, default=0),
+        'avg_form': round(form_sum / form_count, 1) if form_count else 0,
+        'avg_effort': round(effort_sum / effort_count, 1) if effort_count else 0,
+        'volume': int(sum(r.volume for r in exercise_rows)),
+        'trend_labels': [date.fromisoformat(label).strftime('%m/%d') for label in daily['labels']],
+        'trend_form': daily['series']['avg_form'],
+        'trend_effort': daily['series']['avg_effort'],
+        'trend_quality': daily['series']['avg_quality'],
+        'trend_volume': daily['series']['volume'],
+    }
@@ -0,0 +1,61 @@
+"""
+Socket.IO server options, including the message queue that lets several
+gunicorn workers (or nodes) broadcast to each other's clients.
+
+SOCKETIO_MESSAGE_QUEUE takes any URL Flask-SocketIO understands
+(redis://, kafka://, zmq+tcp://, amqp://...). The special value local://
+uses an in-process queue so multiple servers in one process can be wired
+together for tests and benchmarks without a broker.
+"""
+import os
+import pickle
+import queue
+import threading
+from socketio import PubSubManager
+
+
+class LocalPubSubManager(PubSubManager):
+    """In-process stand-in for Redis pub/sub: every manager on a channel sees every publish"""
+    name = 'local'
+
+    _channels = {}
+    _channels_lock = threading.Lock()
+
+    def __init__(self, url='local://', channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._inbox = queue.Queue()
+
+    def initialize(self):
+        # Subscribe only once the server is running, so idle managers don't buffer messages
+        if not self.write_only:
+            with self._channels_lock:
+                self._channels.setdefault(self.channel, []).append(self._inbox)
+        super().initialize()
+
+    def _publish(self, data):
+        message = pickle.dumps(data)
+        with self._channels_lock:
+            inboxes = list(self._channels.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(message)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+def socketio_options():
+    """Keyword arguments for SocketIO(app, ...) from SOCKETIO_* environment variables"""
+    options = {
+        'cors_allowed_origins': '*',
+        # eventlet needs gunicorn's eventlet worker, which gunicorn.conf.py selects from the same variable
+        'async_mode': os.environ.get('SOCKETIO_ASYNC_MODE', 'threading'),
+    }
+    url = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = os.environ.get('SOCKETIO_CHANNEL', 'flask-socketio')
+    if url and url.startswith('local://'):
+        options['client_manager'] = LocalPubSubManager(url, channel=channel)
+    elif url:
+        options['message_queue'] = url
+        options['channel'] = channel
+    return options
@@ -0,0 +1,157 @@
+"""
+Batch upload of entries queued by the offline client (/api/sync).
+
+Each item is one queued form submission: {"key": <client-generated id>,
+"type": "food" | "calories" | "neat" | "exercise", "data": {form fields},
+"queued_at": <ISO time it was queued>}. Items are validated like the /add_*
+forms, saved in one transaction and answered one result per item, in order:
+
+  created    saved now; "id" is the new row
+  duplicate  the key was saved before (or earlier in this batch); nothing
+             was written and "id" is the row from the first upload
+  error      rejected by validation; retrying won't help
+  retry      not saved because concurrent uploads of the same keys kept
+             conflicting; send it again
+
+Keys are stored in sync_key with the row they created, so a client that
+retries after a timeout or a partial failure never creates a row twice.
+"""
+import os
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app.models import db, SyncKey
+from app.entries import (parse_food_form, parse_calories_form, parse_neat_form, parse_exercise_form,
+                         save_food, save_calories, save_energy_burns)
+from app.workouts import save_exercises
+from app.dateranges import to_local
+
+SYNC_MAX_ITEMS = int(os.environ.get('SYNC_MAX_ITEMS', '200'))
+MAX_KEY_LENGTH = 64
+
+# type -> (parse form fields, save a list of parsed entries)
+ENTRY_TYPES = {
+    'food': (parse_food_form, save_food),
+    'calories': (parse_calories_form, save_calories),
+    'neat': (parse_neat_form, save_energy_burns),
+    'exercise': (parse_exercise_form, save_exercises),
+}
+
+
+def _queued_time(value, tz):
+    """When the client queued the entry, as wall-clock time in the user's timezone"""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return to_local(moment, tz) if moment.tzinfo else moment
+
+
+def _item_error(item):
+    if not isinstance(item, dict):
+        return 'each item must be an object'
+    key = item.get('key')
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        return f'key must be a string of 1-{MAX_KEY_LENGTH} characters'
+    if item.get('type') not in ENTRY_TYPES:
+        return f"type must be one of {', '.join(sorted(ENTRY_TYPES))}"
+    data = item.get('data', {})
+    if not isinstance(data, dict):
+        return 'data must be an object'
+    # Form fields, as the offline client queued them; the parsers expect nothing else
+    if not all(isinstance(value, str) or value is None for value in data.values()):
+        return 'data values must be strings'
+    return None
+
+
+def _recorded_keys(user_id, items):
+    """SyncKey rows already stored for the valid items' keys, by key"""
+    keys = {item['key'] for item in items if _item_error(item) is None}
+    if not keys:
+        return {}
+    return {row.key: row for row in SyncKey.query.filter(SyncKey.user_id == user_id, SyncKey.key.in_(keys))}
+
+
+def _duplicate(row):
+    return {'key': row.key, 'status': 'duplicate', 'type': row.kind, 'id': row.entity_id}
+
+
+def _save_batch(user_id, items, tz):
+    results = [None] * len(items)
+    existing = _recorded_keys(user_id, items)
+
+    first_seen = {}
+    repeats = []
+    pending = {}
+    for i, item in enumerate(items):
+        error = _item_error(item)
+        if error:
+            key = item.get('key') if isinstance(item, dict) else None
+            results[i] = {'key': key, 'status': 'error', 'error': error}
+            continue
+        key = item['key']
+        if key in existing:
+            results[i] = _duplicate(existing[key])
+            continue
+        if key in first_seen:
+            repeats.append((i, first_seen[key]))
+            continue
+        first_seen[key] = i
+
+        parse, _ = ENTRY_TYPES[item['type']]
+        try:
+            entry = parse(item.get('data') or {}, tz, _queued_time(item.get('queued_at'), tz))
+        except ValueError as e:
+            results[i] = {'key': key, 'status': 'error', 'type': item['type'], 'error': str(e)}
+            continue
+        pending.setdefault(item['type'], []).append((i, entry))
+
+    # One batch per type; the keys are recorded in the same transaction as the rows
+    now = datetime.utcnow()
+    key_rows = []
+    for kind, batch in pending.items():
+        _, save = ENTRY_TYPES[kind]
+        rows = save(user_id, [entry for _, entry in batch])
+        for (i, _), row in zip(batch, rows):
+            results[i] = {'key': items[i]['key'], 'status': 'created', 'type': kind, 'id': row.id}
+            key_rows.append({'user_id': user_id, 'key': items[i]['key'], 'kind': kind,
+                             'entity_id': row.id, 'created_at': now})
+    if key_rows:
+        db.session.execute(SyncKey.__table__.insert(), key_rows)
+
+    for i, first in repeats:
+        result = dict(results[first])
+        if result['status'] == 'created':
+            result['status'] = 'duplicate'
+        results[i] = result
+    return results
+
+
+def _unsaved_results(user_id, items):
+    """Results when nothing could be saved: recorded keys are duplicates, other valid items are retried"""
+    existing = _recorded_keys(user_id, items)
+    results = []
+    for item in items:
+        error = _item_error(item)
+        if error:
+            results.append({'key': item.get('key') if isinstance(item, dict) else None,
+                            'status': 'error', 'error': error})
+        elif item['key'] in existing:
+            results.append(_duplicate(existing[item['key']]))
+        else:
+            results.append({'key': item['key'], 'status': 'retry', 'type': item['type']})
+    return results
+
+
+def sync_entries(user_id, items, tz=None):
+    """Save a batch of queued entries in one transaction; returns one result per item"""
+    # A concurrent upload of the same batch may record a key first; the second attempt then sees it
+    for _ in range(2):
+        try:
+            results = _save_batch(user_id, items, tz)
+            db.session.commit()
+            return results
+        except IntegrityError:
+            db.session.rollback()
+    return _unsaved_results(user_id, items)
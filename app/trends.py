@@ -0,0 +1,184 @@
+"""
+Trend series at day, week, month or year resolution for /api/trends.
+
+Series come from the daily_user_summary rollup, so a range costs one
+indexed read of at most one row per day, never a scan of raw entries. The
+day rows are turned into arrays once and bucketed with NumPy:
+
+  - every bucket in the range is present, empty ones included; weeks start
+    on Monday, months and years on their first day, and the first and last
+    buckets may be partial
+  - sums and counts add up per bucket (bincount); averages are recomputed
+    from the summed score totals and counts, so a month's average form is
+    weighted by sets, not an average of daily averages
+  - when there are more buckets than the requested number of points,
+    runs of adjacent buckets are merged the same way, so a chart gets at
+    most `points` values whatever the range
+
+Results are cached per process, keyed by user, range, resolution and
+points, for TRENDS_CACHE_TTL seconds in an LRU of at most TRENDS_CACHE_SIZE
+series; the rollup writers in app.rollups call invalidate_user_trends(), so
+new entries show up at once in the process that saved them. Other workers
+may serve a series up to the TTL old, so callers that show it next to live
+totals (the dashboard) use build_trends() directly.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import select
+from app.models import db, DailyUserSummary
+from app.metrics import record_cache
+
+RESOLUTIONS = ('day', 'week', 'month', 'year')
+TRENDS_CACHE_TTL = int(os.environ.get('TRENDS_CACHE_TTL', '60'))
+TRENDS_CACHE_SIZE = int(os.environ.get('TRENDS_CACHE_SIZE', '1024'))
+DEFAULT_POINTS = 120
+MAX_POINTS = 1000
+MAX_RANGE_DAYS = 366 * 20
+
+SUMS = ('calories_in', 'calories_burned', 'exercises', 'sets', 'reps', 'volume',
+        'form_sum', 'form_count', 'effort_sum', 'effort_count', 'quality_sum', 'quality_count')
+AVERAGES = {'avg_form': ('form_sum', 'form_count'), 'avg_effort': ('effort_sum', 'effort_count'),
+            'avg_quality': ('quality_sum', 'quality_count')}
+
+# (user_id, start, end, resolution, points) -> (expires, result), least recently used first
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _bucket_keys(days, resolution):
+    """Bucket number of each day (days since the epoch); consecutive buckets have consecutive numbers"""
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        # The epoch was a Thursday; shifting by 3 puts week boundaries on Mondays
+        return (days + 3) // 7
+    unit = 'M' if resolution == 'month' else 'Y'
+    return days.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype(np.int64)
+
+
+def _bucket_start(key, resolution):
+    if resolution == 'day':
+        return np.datetime64(int(key), 'D')
+    if resolution == 'week':
+        return np.datetime64(int(key) * 7 - 3, 'D')
+    unit = 'M' if resolution == 'month' else 'Y'
+    return np.datetime64(int(key), unit).astype('datetime64[D]')
+
+
+def load_days(user_id, start, end):
+    """(day numbers, {column: array}) of the user's summary rows for days in [start, end]"""
+    S = DailyUserSummary
+    rows = db.session.execute(
+        select(S.day, S.calories_in, S.burned_neat + S.burned_cardio + S.burned_exercise + S.burned_other,
+               S.exercises, S.sets, S.reps, S.volume, S.form_sum, S.form_count, S.effort_sum,
+               S.effort_count, S.quality_sum, S.quality_count, S.max_weight)
+        .where(S.user_id == user_id, S.day >= start, S.day <= end)
+    ).all()
+    days = np.array([row[0] for row in rows], dtype='datetime64[D]').astype(np.int64)
+    columns = {name: np.array([row[i + 1] or 0 for row in rows], dtype=float) for i, name in enumerate(SUMS)}
+    columns['max_weight'] = np.array([row[-1] if row[-1] is not None else np.nan for row in rows], dtype=float)
+    return days, columns
+
+
+def _rounded(values, digits):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def build_trends(user_id, start, end, resolution='day', points=DEFAULT_POINTS):
+    """Bucketed series for days in [start, end] (dates), merged down to at most `points` values"""
+    days, columns = load_days(user_id, start, end)
+    first = _bucket_keys(np.array([start], dtype='datetime64[D]').astype(np.int64), resolution)[0]
+    last = _bucket_keys(np.array([end], dtype='datetime64[D]').astype(np.int64), resolution)[0]
+    buckets = int(last - first + 1)
+    index = (_bucket_keys(days, resolution) - first).astype(np.int64)
+
+    sums = {name: np.bincount(index, weights=values, minlength=buckets) for name, values in columns.items()
+            if name != 'max_weight'}
+    sums['active_days'] = np.bincount(index, weights=(columns['exercises'] > 0).astype(float), minlength=buckets)
+    max_weight = np.full(buckets, np.nan)
+    np.fmax.at(max_weight, index, columns['max_weight'])
+
+    # Merge runs of `size` adjacent buckets so a long range still fits in `points` values
+    size = -(-buckets // points)
+    group_starts = np.arange(0, buckets, size)
+    if size > 1:
+        sums = {name: np.add.reduceat(values, group_starts) for name, values in sums.items()}
+        with np.errstate(invalid='ignore'):
+            max_weight = np.fmax.reduceat(max_weight, group_starts)
+
+    series = {
+        'calories_in': sums['calories_in'].astype(int).tolist(),
+        'calories_burned': sums['calories_burned'].astype(int).tolist(),
+        'active_days': sums['active_days'].astype(int).tolist(),
+        'exercises': sums['exercises'].astype(int).tolist(),
+        'sets': sums['sets'].astype(int).tolist(),
+        'reps': sums['reps'].astype(int).tolist(),
+        'volume': np.round(sums['volume']).astype(int).tolist(),
+        'max_weight': _rounded(max_weight, 1),
+    }
+    for name, (total, count) in AVERAGES.items():
+        with np.errstate(invalid='ignore', divide='ignore'):
+            series[name] = _rounded(np.where(sums[count] > 0, sums[total] / sums[count], np.nan), 2)
+
+    totals = {name: sum(series[name]) for name in
+              ('calories_in', 'calories_burned', 'active_days', 'exercises', 'sets', 'reps', 'volume')}
+    totals['max_weight'] = None if np.all(np.isnan(max_weight)) else round(float(np.nanmax(max_weight)), 1)
+    for name, (total, count) in AVERAGES.items():
+        n = sums[count].sum()
+        totals[name] = round(float(sums[total].sum() / n), 2) if n else None
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'resolution': resolution,
+        # Each point covers this many buckets of the resolution
+        'bucket_size': size,
+        'labels': [str(_bucket_start(first + i, resolution)) for i in group_starts],
+        'series': series,
+        'totals': totals,
+    }
+
+
+def trends(user_id, start, end, resolution='day', points=DEFAULT_POINTS):
+    """build_trends() through the per-process cache"""
+    key = (user_id, start, end, resolution, points)
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now:
+            _cache.move_to_end(key)
+        else:
+            cached = None
+    if cached:
+        record_cache('trends', True)
+        return cached[1]
+    record_cache('trends', False)
+    result = build_trends(user_id, start, end, resolution, points)
+    with _lock:
+        _cache[key] = (now + TRENDS_CACHE_TTL, result)
+        _cache.move_to_end(key)
+        while len(_cache) > TRENDS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def invalidate_user_trends(user_id):
+    with _lock:
+        for key in [key for key in _cache if key[0] == user_id]:
+            del _cache[key]
+
+
+def clear_trends_cache():
+    with _lock:
+        _cache.clear()
+
+
+def trend_points(value):
+    try:
+        points = int(value) if value is not None else DEFAULT_POINTS
+    except (TypeError, ValueError):
+        points = DEFAULT_POINTS
+    return max(1, min(points, MAX_POINTS))
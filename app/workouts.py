@@ -0,0 +1,213 @@
+"""
+Validation and single-transaction bulk writes for exercise logs.
+
+Both the /add_exercise form and the JSON workout endpoint go through
+save_exercises(), which inserts the logs, all their sets and any energy
+burn entries with executemany-style statements and no intermediate commits.
+"""
+import math
+from datetime import datetime
+from app.models import db, ExerciseLog, ExerciseSetLog, EnergyBurnEntry
+from app.rollups import record_exercises, record_energy_burn
+from app.exercise_search import invalidate_user_exercises
+from app.personal_records import update_personal_records, set_rows as record_set_rows
+from app.dateranges import to_local
+
+MAX_SETS = 100
+
+
+def parse_score(value, low, high, label):
+    """Optional integer score; raises ValueError when outside [low, high]"""
+    if value in (None, ''):
+        return None
+    score = int(value)
+    if not (low <= score <= high):
+        raise ValueError(f'{label} must be between {low} and {high}')
+    return score
+
+
+def check_length(value, column, label):
+    """value, or ValueError when it is longer than the String column it is saved to"""
+    limit = column.type.length
+    if value is not None and len(value) > limit:
+        raise ValueError(f'{label} must be at most {limit} characters')
+    return value
+
+
+def parse_workout_time(value, tz=None):
+    """Naive wall-clock time; a time with an offset is converted to tz (server local time when None)"""
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace('T', ' '))
+    return to_local(moment, tz) if moment.tzinfo else moment
+
+
+def quality_score(form_score, effort_score):
+    if form_score is None or effort_score is None:
+        return None
+    return round(form_score * (effort_score / 10.0), 2)
+
+
+def build_set(set_number, reps, weight=None, form_score=None, effort_score=None):
+    """Validated ExerciseSetLog column values (without exercise_log_id)"""
+    if reps in (None, ''):
+        raise ValueError('reps is required')
+    reps = int(reps)
+    weight = float(weight) if weight not in (None, '') else None
+    if weight is not None and not math.isfinite(weight):
+        raise ValueError('weight must be a finite number')
+    form_score = parse_score(form_score, 1, 5, 'Form score')
+    effort_score = parse_score(effort_score, 1, 10, 'Effort score')
+    return {
+        'set_number': set_number,
+        'reps': reps,
+        'weight': weight,
+        'form_score': form_score,
+        'effort_score': effort_score,
+        'quality_score': quality_score(form_score, effort_score),
+    }
+
+
+def optional_burn(calories_burned, duration_minutes):
+    """(calories, duration) for an exercise burn entry, or None if absent/invalid
+
+    Energy burn details never block exercise logging, so bad values are dropped.
+    """
+    try:
+        calories = int(calories_burned) if calories_burned else 0
+        duration = float(duration_minutes) if duration_minutes else None
+    except (TypeError, ValueError):
+        return None
+    return (calories, duration) if calories > 0 else None
+
+
+def parse_exercise(data, default_time=None, tz=None):
+    """Validate one JSON exercise entry into the dict save_exercises() expects
+
+    ``sets`` is either a list of per-set objects or a count used with the
+    top-level ``reps``/``weight``/``form_score``/``effort_score``; either
+    way there may be 1..MAX_SETS sets. A ``workout_time`` with an offset is
+    stored as wall-clock time in tz.
+    """
+    name, exercise_type = data.get('exercise_name') or '', data.get('exercise_type') or ''
+    if not isinstance(name, str) or not isinstance(exercise_type, str):
+        raise ValueError('exercise_name and exercise_type must be strings')
+    name, exercise_type = name.strip(), exercise_type.strip()
+    time_value = data.get('workout_time') or default_time
+    if not name or not exercise_type or not time_value:
+        raise ValueError('exercise_name, exercise_type and workout_time are required')
+    check_length(name, ExerciseLog.exercise_name, 'exercise_name')
+    check_length(exercise_type, ExerciseLog.exercise_type, 'exercise_type')
+
+    notes = data.get('notes')
+    if notes is None:
+        notes = ''
+    elif not isinstance(notes, str):
+        raise ValueError('notes must be a string')
+
+    raw_sets = data.get('sets')
+    if isinstance(raw_sets, list):
+        if not raw_sets:
+            raise ValueError('sets cannot be empty')
+        if len(raw_sets) > MAX_SETS:
+            raise ValueError(f'at most {MAX_SETS} sets per exercise')
+        if not all(isinstance(s, dict) for s in raw_sets):
+            raise ValueError('each set must be an object')
+        sets = [
+            build_set(i, s.get('reps'), s.get('weight'), s.get('form_score'), s.get('effort_score'))
+            for i, s in enumerate(raw_sets, start=1)
+        ]
+        # Exercise-level columns summarize the sets
+        forms = [s['form_score'] for s in sets if s['form_score'] is not None]
+        efforts = [s['effort_score'] for s in sets if s['effort_score'] is not None]
+        weights = [s['weight'] for s in sets if s['weight'] is not None]
+        summary = {
+            'reps': sets[0]['reps'],
+            'weight': max(weights) if weights else None,
+            'form_score': round(sum(forms) / len(forms)) if forms else None,
+            'effort_score': round(sum(efforts) / len(efforts)) if efforts else None,
+        }
+    else:
+        if raw_sets in (None, ''):
+            raise ValueError('sets is required')
+        count = int(raw_sets)
+        if not (1 <= count <= MAX_SETS):
+            raise ValueError(f'sets must be between 1 and {MAX_SETS}')
+        summary = build_set(1, data.get('reps'), data.get('weight'), data.get('form_score'), data.get('effort_score'))
+        sets = [dict(summary, set_number=i) for i in range(1, count + 1)]
+
+    return {
+        'exercise_name': name,
+        'exercise_type': exercise_type,
+        'sets': len(sets),
+        'reps': summary['reps'],
+        'weight': summary['weight'],
+        'form_score': summary['form_score'],
+        'effort_score': summary['effort_score'],
+        'workout_time': parse_workout_time(time_value, tz),
+        'notes': notes,
+        'set_rows': sets,
+        'burn': optional_burn(data.get('calories_burned'), data.get('duration_minutes')),
+    }
+
+
+def save_exercises(user_id, entries, new_records=None):
+    """Insert exercise logs, their sets and burn entries; the caller commits
+
+    Personal records are raised to any better sets; pass a list as
+    ``new_records`` to get the records that changed appended to it.
+    """
+    logs = []
+    for entry in entries:
+        log = ExerciseLog(
+            user_id=user_id,
+            exercise_name=entry['exercise_name'],
+            exercise_type=entry['exercise_type'],
+            sets=entry['sets'],
+            reps=entry['reps'],
+            weight=entry['weight'],
+            form_score=entry['form_score'],
+            effort_score=entry['effort_score'],
+            workout_time=entry['workout_time'],
+            notes=entry.get('notes', ''),
+        )
+        logs.append(log)
+    db.session.add_all(logs)
+    # Flush for the log ids (batched into one INSERT where the driver supports RETURNING)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    set_rows = []
+    burn_rows = []
+    for log, entry in zip(logs, entries):
+        for s in entry['set_rows']:
+            set_rows.append(dict(s, exercise_log_id=log.id, created_at=now))
+        if entry.get('burn'):
+            calories, duration = entry['burn']
+            burn_rows.append({
+                'user_id': user_id,
+                'source': 'exercise',
+                'activity_name': log.exercise_name,
+                'calories_burned': calories,
+                'duration_minutes': duration,
+                'entry_time': log.workout_time,
+                'notes': f'Logged via exercise form ({log.exercise_type})',
+            })
+
+    # Core executemany keeps every row in one batch (ORM bulk inserts split on NULL columns)
+    if set_rows:
+        db.session.execute(ExerciseSetLog.__table__.insert(), set_rows)
+    if burn_rows:
+        db.session.execute(EnergyBurnEntry.__table__.insert(), burn_rows)
+
+    saved = [(log, entry['set_rows']) for log, entry in zip(logs, entries)]
+    record_exercises(saved)
+    changed = update_personal_records(user_id, record_set_rows(saved))
+    if new_records is not None:
+        new_records.extend(changed)
+    burned_by_day = {}
+    for row in burn_rows:
+        day = row['entry_time'].date()
+        burned_by_day[day] = burned_by_day.get(day, 0) + row['calories_burned']
+    for day, calories in burned_by_day.items():
+        record_energy_burn(user_id, day, 'exercise', calories)
+    invalidate_user_exercises(user_id)
+    return logs
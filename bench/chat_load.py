@@ -0,0 +1,248 @@
+"""
+Chat load test: how many concurrent chat users can one worker handle?
+
+Starts the app in-process on a local port (one worker, like a single
+gunicorn/eventlet process), seeds --clients users and --rooms rooms, and
+connects one Socket.IO client per user. Clients are spread across the rooms
+and join them, then for --duration seconds each client sends messages at
+--message-rate and typing events at --typing-rate (per second, with
+jitter). The report includes:
+
+  - broadcast latency percentiles (send -> every room member receiving it)
+  - join latency percentiles
+  - messages sent/sec and deliveries/sec
+  - SQL statements per handled Socket.IO event, with statements issued by
+    background tasks (the write-behind flush, presence) counted separately
+
+    python bench/chat_load.py --clients 50 --rooms 5 --duration 20 --output chat-load.json
+
+Needs no network beyond localhost, so it runs offline in CI. Uses a
+throwaway SQLite database unless DATABASE_URL points at e.g. a local
+MariaDB. Exits non-zero if any broadcast was not delivered.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+
+from common import ensure_room, percentile, seed_users, session_cookie, start_server, use_scratch_database
+
+
+def latency_summary(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'mean': round(statistics.mean(values), 3) if values else None,
+    }
+
+
+class EventTracer:
+    """Counts handled Socket.IO events and the SQL statements each one issues"""
+
+    def __init__(self, socketio, engine):
+        from sqlalchemy import event
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.events = {}
+        self.background_queries = 0
+
+        server = socketio.server
+        trigger = server._trigger_event
+
+        def traced(name, namespace, *args):
+            self.local.event = name
+            try:
+                return trigger(name, namespace, *args)
+            finally:
+                self.local.event = None
+                with self.lock:
+                    self.events.setdefault(name, [0, 0])[0] += 1
+
+        server._trigger_event = traced
+        event.listen(engine, 'before_cursor_execute', self.on_query)
+
+    def on_query(self, *args):
+        name = getattr(self.local, 'event', None)
+        with self.lock:
+            if name is None:
+                self.background_queries += 1
+            else:
+                self.events.setdefault(name, [0, 0])[1] += 1
+
+    def reset(self):
+        with self.lock:
+            self.events = {}
+            self.background_queries = 0
+
+    def report(self):
+        with self.lock:
+            return {
+                'events': {
+                    name: {'handled': handled, 'queries': queries,
+                           'queries_per_event': round(queries / handled, 3) if handled else None}
+                    for name, (handled, queries) in sorted(self.events.items())
+                },
+                'background_queries': self.background_queries,
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--rooms', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of steady-state load')
+    parser.add_argument('--message-rate', type=float, default=0.5, help='messages per second per client')
+    parser.add_argument('--typing-rate', type=float, default=1.0, help='typing_start events per second per client')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--drain', type=float, default=3.0, help='seconds to wait for in-flight broadcasts')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    database_url = use_scratch_database('chat-load-')
+
+    import socketio as sio
+    from app import create_app
+    from app.models import db
+
+    flask_app, _, socketio = create_app()
+    with flask_app.app_context():
+        db.create_all()
+        room_names = [f'load-{i}' for i in range(args.rooms)]
+        for name in room_names:
+            ensure_room(name, 'Chat load test')
+        user_ids = seed_users(args.clients, 'chatload')
+        tracer = EventTracer(socketio, db.engine)
+    _, url = start_server(flask_app)
+
+    lock = threading.Lock()
+    sent_at = {}
+    deliveries = {}
+    broadcast_ms = []
+    join_ms = []
+    members = {name: 0 for name in room_names}
+
+    def connect(index, user_id):
+        room = room_names[index % len(room_names)]
+        client = sio.Client(reconnection=False)
+        joined = threading.Event()
+
+        @client.on('room_joined')
+        def on_joined(data):
+            joined.set()
+
+        @client.on('new_message')
+        def on_message(data):
+            now = time.perf_counter()
+            marker = data.get('message', '')
+            with lock:
+                if marker in sent_at:
+                    broadcast_ms.append((now - sent_at[marker]) * 1000)
+                    deliveries[marker] = deliveries.get(marker, 0) + 1
+
+        client.connect(url, headers={'Cookie': session_cookie(flask_app, user_id)}, transports=['polling'])
+        started = time.perf_counter()
+        client.emit('join_room', {'room': room})
+        if joined.wait(10):
+            join_ms.append((time.perf_counter() - started) * 1000)
+        with lock:
+            members[room] += 1
+        return client, room
+
+    connect_started = time.perf_counter()
+    clients = [connect(i, user_id) for i, user_id in enumerate(user_ids)]
+    connect_seconds = time.perf_counter() - connect_started
+
+    # Measure steady state separately: joins and their write-behind flush are done
+    time.sleep(0.5)
+    join_db = tracer.report()
+    tracer.reset()
+    stop = threading.Event()
+    room_of = {}
+
+    def drive(index, client, room):
+        local_rng = random.Random(args.seed * 1000 + index)
+        next_message = time.perf_counter() + local_rng.expovariate(args.message_rate) if args.message_rate else None
+        next_typing = time.perf_counter() + local_rng.expovariate(args.typing_rate) if args.typing_rate else None
+        seq = 0
+        while not stop.is_set():
+            now = time.perf_counter()
+            if next_message is not None and now >= next_message:
+                marker = f'load:{index}:{seq}'
+                seq += 1
+                with lock:
+                    sent_at[marker] = time.perf_counter()
+                    room_of[marker] = room
+                client.emit('send_message', {'room': room, 'message': marker})
+                next_message = now + local_rng.expovariate(args.message_rate)
+            if next_typing is not None and now >= next_typing:
+                client.emit('typing_start', {'room': room})
+                next_typing = now + local_rng.expovariate(args.typing_rate)
+            waits = [t for t in (next_message, next_typing) if t is not None]
+            stop.wait(max(0.001, min(waits) - time.perf_counter()) if waits else 0.1)
+
+    threads = [threading.Thread(target=drive, args=(i, client, room), daemon=True)
+               for i, (client, room) in enumerate(clients)]
+    load_started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    load_seconds = time.perf_counter() - load_started
+
+    # Let in-flight broadcasts and the write-behind buffer drain before counting
+    deadline = time.perf_counter() + args.drain
+    while time.perf_counter() < deadline:
+        with lock:
+            if all(deliveries.get(m, 0) >= members[room_of[m]] for m in sent_at):
+                break
+        time.sleep(0.05)
+    time.sleep(0.5)
+
+    with lock:
+        sent = len(sent_at)
+        delivered = sum(deliveries.values())
+        expected = sum(members[room_of[m]] for m in sent_at)
+    report = {
+        'config': {
+            'clients': len(clients),
+            'rooms': args.rooms,
+            'duration_s': args.duration,
+            'message_rate': args.message_rate,
+            'typing_rate': args.typing_rate,
+            'seed': args.seed,
+            'database': database_url.split(':', 1)[0],
+            'python': platform.python_version(),
+        },
+        'connect_s': round(connect_seconds, 3),
+        'join_latency_ms': latency_summary(join_ms),
+        'messages_sent': sent,
+        'messages_per_sec': round(sent / load_seconds, 2) if load_seconds else None,
+        'deliveries': delivered,
+        'expected_deliveries': expected,
+        'deliveries_per_sec': round(delivered / load_seconds, 2) if load_seconds else None,
+        'broadcast_latency_ms': latency_summary(broadcast_ms),
+        'db': tracer.report(),
+        'db_join_phase': join_db,
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+    for client, _ in clients:
+        client.disconnect()
+    return 0 if delivered >= expected else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
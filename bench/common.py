@@ -0,0 +1,64 @@
+"""
+Shared helpers for the benchmark scripts: throwaway databases, in-thread
+HTTP servers and signed session cookies for simulated logged-in users.
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def use_scratch_database(prefix='bench-'):
+    """Point DATABASE_URL at a fresh SQLite file unless one is already configured"""
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(prefix=prefix), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    return os.environ['DATABASE_URL']
+
+
+def start_server(flask_app):
+    """Serve flask_app (with its Socket.IO middleware) on a free localhost port in a daemon thread"""
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def session_cookie(flask_app, user_id):
+    """Cookie header value that logs a client in as user_id"""
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    value = serializer.dumps({'user_id': user_id})
+    return f"{flask_app.config.get('SESSION_COOKIE_NAME', 'session')}={value}"
+
+
+def seed_users(count, prefix):
+    """Create (or reuse) count bench users; returns their ids. Needs an app context."""
+    from app.models import db, User
+    for i in range(count):
+        email = f'{prefix}{i}@bench.local'
+        if not User.query.filter_by(email=email).first():
+            db.session.add(User(google_id=f'{prefix}-{i}', email=email, name=f'{prefix.title()} {i}'))
+    db.session.commit()
+    users = User.query.filter(User.email.like(f'{prefix}%@bench.local')).order_by(User.id).limit(count)
+    return [u.id for u in users]
+
+
+def ensure_room(name, description=''):
+    """Create an active chat room if missing. Needs an app context."""
+    from app.models import db, ChatRoom
+    if not ChatRoom.query.filter_by(name=name).first():
+        db.session.add(ChatRoom(name=name, description=description, is_active=True))
+        db.session.commit()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
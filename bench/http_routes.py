@@ -0,0 +1,265 @@
+"""
+HTTP benchmark for the logging and dashboard routes.
+
+Seeds a database with --users synthetic users and --days of food, calorie,
+energy burn and exercise (with per-set) history, plus the matching
+daily_user_summary rows. It then drives the routes through the Flask test
+client as the first user:
+
+    GET  /exercise /calories /neat /food
+    POST /add_exercise /add_calories /add_neat /add_food
+
+For every route it records latency percentiles, requests/sec and the number
+of SQL statements per request; statement counts are deterministic, so an
+N+1 shows up as a diff even when timings are noisy.
+
+    python bench/http_routes.py --output bench/http_baseline.json      # record a baseline
+    python bench/http_routes.py --baseline bench/http_baseline.json    # compare against it
+
+With --baseline the exit status is non-zero if any route issues more
+statements than before (or, with --latency-tolerance, got slower by more
+than that percentage at p50). Uses a throwaway SQLite database unless
+DATABASE_URL is set.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from common import percentile, use_scratch_database
+
+FOODS = [('Oatmeal', 150), ('Chicken breast', 280), ('Rice', 210), ('Apple', 95), ('Greek yogurt', 130),
+         ('Salmon', 360), ('Eggs', 155), ('Banana', 105), ('Protein shake', 160), ('Pasta', 390)]
+EXERCISES = [('Bench Press (Barbell)', 'strength'), ('Back Squat', 'strength'), ('Deadlift', 'strength'),
+             ('Pull-up', 'strength'), ('Overhead Press', 'strength'), ('Running', 'cardio'),
+             ('Rowing', 'cardio'), ('Yoga Flow', 'flexibility')]
+BURNS = [('neat', 'Walking'), ('neat', 'Housework'), ('cardio', 'Cycling'), ('other', 'Gardening')]
+MEALS = ['breakfast', 'lunch', 'dinner', 'snack']
+
+GET_ROUTES = ['/exercise', '/calories', '/neat', '/food']
+
+
+def post_routes(now):
+    stamp = now.strftime('%Y-%m-%dT%H:%M')
+    return {
+        '/add_exercise': {'exercise-name': 'Bench Press (Barbell)', 'exercise-type': 'strength', 'sets': '3',
+                          'reps': '8', 'weight': '100', 'form-score': '4', 'effort-score': '8',
+                          'workout-time': stamp, 'calories-burned': '50', 'duration-minutes': '10'},
+        '/add_calories': {'food-item': 'Apple', 'calories': '95', 'quantity': '1'},
+        '/add_neat': {'activity-name': 'Walking', 'calories-burned': '120', 'duration-minutes': '30',
+                      'entry-time': stamp},
+        '/add_food': {'meal-type': 'lunch', 'food-name': 'Rice', 'portion-size': '1 cup', 'meal-time': stamp},
+    }
+
+
+def seed(args):
+    """Insert synthetic history in bulk; returns the id of the user to benchmark as and row counts"""
+    from app.models import (db, User, FoodLog, CalorieEntry, EnergyBurnEntry, ExerciseLog, ExerciseSetLog,
+                            DailyUserSummary)
+    from app.rollups import BURN_COLUMNS, _exercise_deltas
+    from app.workouts import quality_score
+
+    rng = random.Random(args.seed)
+    users = [{'google_id': f'bench-http-{i}', 'email': f'http{i}@bench.local', 'name': f'Bench User {i}'}
+             for i in range(args.users)]
+    db.session.execute(User.__table__.insert(), users)
+    user_ids = [u.id for u in User.query.filter(User.email.like('http%@bench.local')).order_by(User.id)]
+
+    food, calories, burns, logs, set_specs = [], [], [], [], []
+    summary = {}
+
+    def day_row(user_id, when):
+        key = (user_id, when.date())
+        if key not in summary:
+            summary[key] = {'user_id': user_id, 'day': when.date(), 'calories_in': 0, 'burned_neat': 0,
+                            'burned_cardio': 0, 'burned_exercise': 0, 'burned_other': 0, 'exercises': 0,
+                            'sets': 0, 'reps': 0, 'volume': 0.0, 'max_weight': None, 'form_sum': 0.0,
+                            'form_count': 0, 'effort_sum': 0.0, 'effort_count': 0, 'quality_sum': 0.0,
+                            'quality_count': 0}
+        return summary[key]
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for user_id in user_ids:
+        for offset in range(args.days):
+            day = today - timedelta(days=offset)
+
+            def at():
+                return day + timedelta(minutes=rng.randrange(6 * 60, 22 * 60))
+
+            for _ in range(args.food_per_day):
+                name, _ = rng.choice(FOODS)
+                food.append({'user_id': user_id, 'meal_type': rng.choice(MEALS), 'food_name': name,
+                             'portion_size': '1 serving', 'meal_time': at(), 'notes': ''})
+            for _ in range(args.calories_per_day):
+                name, kcal = rng.choice(FOODS)
+                when = at()
+                calories.append({'user_id': user_id, 'food_item': name, 'calories': kcal, 'quantity': '1',
+                                 'entry_time': when, 'notes': ''})
+                day_row(user_id, when)['calories_in'] += kcal
+            for _ in range(args.burns_per_day):
+                source, name = rng.choice(BURNS)
+                when, kcal = at(), rng.randrange(50, 400)
+                burns.append({'user_id': user_id, 'source': source, 'activity_name': name,
+                              'calories_burned': kcal, 'duration_minutes': 30.0, 'entry_time': when, 'notes': ''})
+                day_row(user_id, when)[BURN_COLUMNS.get(source, 'burned_other')] += kcal
+            for _ in range(args.exercises_per_day):
+                name, kind = rng.choice(EXERCISES)
+                weight = float(rng.randrange(20, 140, 5)) if kind == 'strength' else None
+                reps, form, effort = rng.randrange(5, 13), rng.randrange(2, 6), rng.randrange(5, 11)
+                log = {'user_id': user_id, 'exercise_name': name, 'exercise_type': kind, 'sets': args.sets,
+                       'reps': reps, 'weight': weight, 'form_score': form, 'effort_score': effort,
+                       'workout_time': at(), 'notes': ''}
+                sets = [{'set_number': n, 'reps': reps, 'weight': weight, 'form_score': form,
+                         'effort_score': effort, 'quality_score': quality_score(form, effort)}
+                        for n in range(1, args.sets + 1)]
+                logs.append(log)
+                set_specs.append(sets)
+
+                row = day_row(user_id, log['workout_time'])
+                for column, delta in _exercise_deltas(SimpleNamespace(**log), sets).items():
+                    row[column] += delta
+                if weight is not None and (row['max_weight'] is None or weight > row['max_weight']):
+                    row['max_weight'] = weight
+
+    def insert(table, rows, chunk=5000):
+        for i in range(0, len(rows), chunk):
+            db.session.execute(table.insert(), rows[i:i + chunk])
+
+    insert(FoodLog.__table__, food)
+    insert(CalorieEntry.__table__, calories)
+    insert(EnergyBurnEntry.__table__, burns)
+    insert(ExerciseLog.__table__, logs)
+    # Autoincrement ids follow list order, so the newest len(logs) ids line up with set_specs
+    log_ids = [log_id for (log_id,) in db.session.query(ExerciseLog.id).order_by(ExerciseLog.id)]
+    insert(ExerciseSetLog.__table__, [dict(s, exercise_log_id=log_id)
+                                      for log_id, sets in zip(log_ids[-len(logs):], set_specs) for s in sets])
+    insert(DailyUserSummary.__table__, list(summary.values()))
+    db.session.commit()
+
+    return user_ids[0], {
+        'food_log': len(food), 'calorie_entry': len(calories), 'energy_burn_entry': len(burns),
+        'exercise_log': len(logs), 'exercise_set_log': sum(len(s) for s in set_specs),
+        'daily_user_summary': len(summary),
+    }
+
+
+def measure(client, counter, method, path, data, requests, warmup):
+    for _ in range(warmup):
+        client.open(path, method=method, data=data)
+    timings, queries, statuses = [], [], set()
+    started = time.perf_counter()
+    for _ in range(requests):
+        counter[0] = 0
+        t = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        timings.append((time.perf_counter() - t) * 1000)
+        queries.append(counter[0])
+        statuses.add(response.status_code)
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'status': sorted(statuses),
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'rps': round(requests / elapsed, 1),
+        'queries': int(statistics.median(queries)),
+        'queries_max': max(queries),
+    }
+
+
+def compare(report, baseline, latency_tolerance):
+    """Print a route-by-route diff; returns the list of regressions"""
+    regressions = []
+    print(f"{'route':<22}{'queries':>16}{'p50 ms':>24}", file=sys.stderr)
+    for route, now in report['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if before is None:
+            print(f'{route:<22}{"(new)":>16}', file=sys.stderr)
+            continue
+        change = (now['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        print(f"{route:<22}{before['queries']:>7} -> {now['queries']:<6}"
+              f"{before['p50_ms']:>10.2f} -> {now['p50_ms']:<8.2f}({change:+.0f}%)", file=sys.stderr)
+        if now['queries'] > before['queries']:
+            regressions.append(f"{route}: {before['queries']} -> {now['queries']} queries")
+        if latency_tolerance is not None and change > latency_tolerance:
+            regressions.append(f'{route}: p50 {change:+.0f}%')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--food-per-day', type=int, default=3)
+    parser.add_argument('--calories-per-day', type=int, default=4)
+    parser.add_argument('--burns-per-day', type=int, default=1)
+    parser.add_argument('--exercises-per-day', type=int, default=4)
+    parser.add_argument('--sets', type=int, default=3, help='sets per exercise')
+    parser.add_argument('--requests', type=int, default=30, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report (e.g. a new baseline) here')
+    parser.add_argument('--baseline', help='compare against a previous report')
+    parser.add_argument('--latency-tolerance', type=float, help='fail if p50 grows by more than this many percent')
+    args = parser.parse_args()
+
+    database_url = use_scratch_database('http-bench-')
+
+    from sqlalchemy import event
+    # The routes are registered on the module-level app
+    from app import app as flask_app
+    from app.models import db
+
+    with flask_app.app_context():
+        db.create_all()
+        seed_started = time.perf_counter()
+        user_id, seeded = seed(args)
+        seed_seconds = time.perf_counter() - seed_started
+
+        counter = [0]
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: counter.__setitem__(0, counter[0] + 1))
+
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    routes = {}
+    for path in GET_ROUTES:
+        routes[f'GET {path}'] = measure(client, counter, 'GET', path, None, args.requests, args.warmup)
+    for path, form in post_routes(datetime.now()).items():
+        routes[f'POST {path}'] = measure(client, counter, 'POST', path, form, args.requests, args.warmup)
+
+    report = {
+        'config': {
+            'users': args.users, 'days': args.days, 'food_per_day': args.food_per_day,
+            'calories_per_day': args.calories_per_day, 'burns_per_day': args.burns_per_day,
+            'exercises_per_day': args.exercises_per_day, 'sets': args.sets, 'requests': args.requests,
+            'seed': args.seed, 'database': database_url.split(':', 1)[0], 'python': platform.python_version(),
+        },
+        'seeded_rows': seeded,
+        'seed_s': round(seed_seconds, 2),
+        'routes': routes,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.latency_tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Broadcast fan-out load test across Socket.IO servers sharing a message queue.
+
+Starts --workers independent chat servers on localhost ports (each one is
+what a gunicorn worker runs), connects --clients logged-in Socket.IO clients
+spread across them round-robin, joins everyone to one room and sends
+--messages from a client on worker 0. Every broadcast must reach every
+client on every worker; the report shows deliveries per worker and delivery
+latency, and the exit status is non-zero if any delivery was missed.
+
+    python bench/socketio_fanout.py                                  # in-process queue
+    python bench/socketio_fanout.py --queue redis://localhost:6379/0  # real Redis
+    python bench/socketio_fanout.py --queue none                      # no queue: shows the gap
+
+Uses a throwaway SQLite database unless DATABASE_URL is already set.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+from common import ensure_room, percentile, seed_users, session_cookie, start_server, use_scratch_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--queue', default='local://', help="message queue URL, or 'none'")
+    parser.add_argument('--timeout', type=float, default=5.0, help='seconds to wait for each broadcast')
+    args = parser.parse_args()
+
+    use_scratch_database('fanout-')
+    if args.queue == 'none':
+        os.environ.pop('SOCKETIO_MESSAGE_QUEUE', None)
+    else:
+        os.environ['SOCKETIO_MESSAGE_QUEUE'] = args.queue
+
+    import socketio as sio
+    from app import create_app
+    from app.models import db
+
+    workers = [create_app() for _ in range(args.workers)]
+    with workers[0][0].app_context():
+        db.create_all()
+        ensure_room('fanout', 'Fan-out benchmark')
+        user_ids = seed_users(args.clients, 'fanout')
+    urls = [start_server(flask_app)[1] for flask_app, _, _ in workers]
+
+    lock = threading.Lock()
+    sent_at = {}
+    received = {}
+    latencies = []
+
+    def make_client(index, worker, user_id):
+        client = sio.Client(reconnection=False)
+        joined = threading.Event()
+
+        @client.on('room_joined')
+        def on_joined(data):
+            joined.set()
+
+        @client.on('new_message')
+        def on_message(data):
+            now = time.perf_counter()
+            marker = data.get('message', '')
+            with lock:
+                if marker in sent_at:
+                    latencies.append((now - sent_at[marker]) * 1000)
+                    received.setdefault(marker, set()).add((index, worker))
+
+        client.connect(urls[worker], headers={'Cookie': session_cookie(workers[worker][0], user_id)},
+                       transports=['polling'], wait_timeout=args.timeout)
+        client.emit('join_room', {'room': 'fanout'})
+        joined.wait(args.timeout)
+        return client
+
+    clients = [(i % args.workers, make_client(i, i % args.workers, user_id)) for i, user_id in enumerate(user_ids)]
+
+    sender = clients[0][1]
+    started = time.perf_counter()
+    for seq in range(args.messages):
+        marker = f'fanout:{seq}'
+        with lock:
+            sent_at[marker] = time.perf_counter()
+        sender.emit('send_message', {'room': 'fanout', 'message': marker})
+        deadline = time.perf_counter() + args.timeout
+        while time.perf_counter() < deadline:
+            with lock:
+                if len(received.get(marker, ())) >= len(clients):
+                    break
+            time.sleep(0.002)
+    elapsed = time.perf_counter() - started
+
+    deliveries = {w: 0 for w in range(args.workers)}
+    for recipients in received.values():
+        for _, worker in recipients:
+            deliveries[worker] += 1
+    total = sum(deliveries.values())
+    expected = len(clients) * args.messages
+    report = {
+        'queue': args.queue,
+        'workers': args.workers,
+        'clients': len(clients),
+        'messages': args.messages,
+        'deliveries': total,
+        'expected_deliveries': expected,
+        'missing_deliveries': expected - total,
+        'per_worker': {
+            str(w): {
+                'clients': sum(1 for cw, _ in clients if cw == w),
+                'delivered': deliveries[w],
+                'expected': sum(1 for cw, _ in clients if cw == w) * args.messages,
+            }
+            for w in range(args.workers)
+        },
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': round(statistics.mean(latencies), 3) if latencies else None,
+        },
+        'deliveries_per_sec': round(total / elapsed, 1) if elapsed else None,
+    }
+    print(json.dumps(report, indent=2))
+
+    for _, client in clients:
+        client.disconnect()
+    return 0 if total == expected else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
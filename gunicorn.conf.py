@@ -0,0 +1,37 @@
+"""
+Gunicorn settings: the worker class that matches SOCKETIO_ASYNC_MODE, a
+startup check that several workers share chat state through Redis, and
+hooks for Prometheus multiprocess mode (see app/metrics.py).
+
+Gunicorn loads ./gunicorn.conf.py automatically, so the command line flags in
+the Dockerfile and nixpacks.toml still apply.
+"""
+import glob
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# The eventlet worker monkey-patches the standard library before loading the app;
+# under the default sync worker every green wait would block the whole process
+if os.environ.get('SOCKETIO_ASYNC_MODE') == 'eventlet':
+    worker_class = 'eventlet'
+
+
+def on_starting(server):
+    # In-process chat state is per worker, so each worker would serve its own stale room history
+    if server.cfg.workers > 1 and not os.environ.get('CHAT_STATE_URL', '').startswith('redis'):
+        raise RuntimeError(f'{server.cfg.workers} workers need CHAT_STATE_URL=redis://... (see app/chat_state.py)')
+
+    # Counters left over from a previous run would be summed into this one
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,121 @@
+"""Add daily_user_summary rollup table and backfill it
+
+Revision ID: 006
+Revises: 88ac99f98349
+Create Date: 2026-10-17
+
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '88ac99f98349'
+branch_labels = None
+depends_on = None
+
+BURN_COLUMNS = {'neat': 'burned_neat', 'cardio': 'burned_cardio', 'exercise': 'burned_exercise'}
+COUNTERS = [
+    'calories_in', 'burned_neat', 'burned_cardio', 'burned_exercise', 'burned_other',
+    'exercises', 'sets', 'reps', 'volume',
+    'form_sum', 'form_count', 'effort_sum', 'effort_count', 'quality_sum', 'quality_count',
+]
+
+
+def upgrade() -> None:
+    summary = op.create_table(
+        'daily_user_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('calories_in', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('burned_neat', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('burned_cardio', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('burned_exercise', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('burned_other', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('exercises', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sets', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('reps', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('volume', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('max_weight', sa.Float(), nullable=True),
+        sa.Column('form_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('form_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('effort_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('effort_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('quality_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('quality_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'day', name='uq_daily_user_summary_user_day')
+    )
+
+    # Backfill: aggregate each source per (user, day) and merge the results
+    conn = op.get_bind()
+    rows = {}
+
+    def row(user_id, day):
+        if isinstance(day, str):
+            # SQLite returns DATE() as text
+            day = date.fromisoformat(day)
+        key = (user_id, day)
+        if key not in rows:
+            rows[key] = dict.fromkeys(COUNTERS, 0)
+            rows[key].update(user_id=user_id, day=day, max_weight=None)
+        return rows[key]
+
+    for user_id, day, calories in conn.execute(sa.text(
+        "SELECT user_id, DATE(entry_time) AS d, SUM(calories) FROM calorie_entry GROUP BY user_id, d"
+    )):
+        row(user_id, day)['calories_in'] += int(calories or 0)
+
+    for user_id, day, source, burned in conn.execute(sa.text(
+        "SELECT user_id, DATE(entry_time) AS d, source, SUM(calories_burned) "
+        "FROM energy_burn_entry GROUP BY user_id, d, source"
+    )):
+        row(user_id, day)[BURN_COLUMNS.get(source, 'burned_other')] += int(burned or 0)
+
+    for user_id, day, exercises, sets, reps, max_weight in conn.execute(sa.text(
+        "SELECT user_id, DATE(workout_time) AS d, COUNT(*), SUM(sets), SUM(reps), MAX(weight) "
+        "FROM exercise_log GROUP BY user_id, d"
+    )):
+        r = row(user_id, day)
+        r.update(exercises=exercises, sets=int(sets or 0), reps=int(reps or 0), max_weight=max_weight)
+
+    # Set-level scores, then exercise-level fallback for logs without set rows
+    score_queries = [
+        """
+        SELECT l.user_id, DATE(l.workout_time) AS d,
+               SUM(s.form_score), COUNT(s.form_score),
+               SUM(s.effort_score), COUNT(s.effort_score),
+               SUM(s.quality_score), COUNT(s.quality_score),
+               SUM(COALESCE(s.reps, 0) * s.weight)
+        FROM exercise_set_log s JOIN exercise_log l ON l.id = s.exercise_log_id
+        GROUP BY l.user_id, d
+        """,
+        """
+        SELECT l.user_id, DATE(l.workout_time) AS d,
+               SUM(l.form_score), COUNT(l.form_score),
+               SUM(l.effort_score), COUNT(l.effort_score),
+               SUM(l.form_score * (l.effort_score / 10.0)), COUNT(l.form_score * l.effort_score),
+               SUM(COALESCE(l.sets, 0) * COALESCE(l.reps, 0) * l.weight)
+        FROM exercise_log l
+        WHERE NOT EXISTS (SELECT 1 FROM exercise_set_log s WHERE s.exercise_log_id = l.id)
+        GROUP BY l.user_id, d
+        """,
+    ]
+    score_columns = ['form_sum', 'form_count', 'effort_sum', 'effort_count', 'quality_sum', 'quality_count', 'volume']
+    for query in score_queries:
+        for result in conn.execute(sa.text(query)):
+            r = row(result[0], result[1])
+            for name, value in zip(score_columns, result[2:]):
+                r[name] += float(value or 0) if name.endswith('_sum') or name == 'volume' else int(value or 0)
+
+    batch = list(rows.values())
+    for i in range(0, len(batch), 1000):
+        op.bulk_insert(summary, batch[i:i + 1000])
+
+
+def downgrade() -> None:
+    op.drop_table('daily_user_summary')
@@ -0,0 +1,31 @@
+"""Add composite (user_id, time) indexes to the log tables
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_food_log_user_meal_time', 'food_log', ['user_id', 'meal_time']),
+    ('ix_calorie_entry_user_entry_time', 'calorie_entry', ['user_id', 'entry_time']),
+    ('ix_energy_burn_entry_user_entry_time', 'energy_burn_entry', ['user_id', 'entry_time']),
+    ('ix_exercise_log_user_workout_time', 'exercise_log', ['user_id', 'workout_time']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
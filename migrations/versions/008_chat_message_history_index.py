@@ -0,0 +1,22 @@
+"""Add chat_message(room_id, created_at, id) index for keyset-paginated history
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_chat_message_room_created_id', 'chat_message', ['room_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_message_room_created_id', table_name='chat_message')
@@ -0,0 +1,293 @@
+"""Move the exercise catalog into tables and seed them from the built-in catalog
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+# The catalog that was hardcoded in app/exercises.py when the tables were introduced, as
+# app.catalog.catalog_rows() laid it out. Frozen here so later edits to the app don't change
+# what this revision seeds.
+# (id, name, exercise_type, default_sets, default_reps)
+EXERCISES = [
+    (1, 'Barbell Back Squat', 'strength', None, None),
+    (2, 'Bench Press (Barbell)', 'strength', None, None),
+    (3, 'Dumbbell Rows', 'strength', None, None),
+    (4, 'Dumbbell Lateral Raises', 'strength', None, None),
+    (5, 'Plank', 'strength', None, None),
+    (6, '45-Degree Back Extension', 'strength', None, None),
+    (7, 'Seated Dumbbell Shoulder Press', 'strength', None, None),
+    (8, 'Lat Pulldowns', 'strength', None, None),
+    (9, 'Seated Cable Rows', 'strength', None, None),
+    (10, 'Leg Press', 'strength', None, None),
+    (11, 'Goblet Squats', 'strength', None, None),
+    (12, 'Dumbbell Front Squats', 'strength', None, None),
+    (13, 'Dumbbell Bench Press', 'strength', None, None),
+    (14, 'Incline Dumbbell Press', 'strength', None, None),
+    (15, 'Machine Chest Press', 'strength', None, None),
+    (16, 'Barbell Rows', 'strength', None, None),
+    (17, 'T-Bar Rows', 'strength', None, None),
+    (18, 'Cable Lateral Raises', 'strength', None, None),
+    (19, 'Machine Lateral Raises', 'strength', None, None),
+    (20, 'Ab Wheel Rollouts', 'strength', None, None),
+    (21, 'Hanging Knee Raises', 'strength', None, None),
+    (22, 'Dead Bugs', 'strength', None, None),
+    (23, 'Romanian Deadlifts (RDLs)', 'strength', None, None),
+    (24, 'Good Mornings', 'strength', None, None),
+    (25, 'Kettlebell Swings', 'strength', None, None),
+    (26, 'Standing Barbell Overhead Press (OHP)', 'strength', None, None),
+    (27, 'Arnold Press', 'strength', None, None),
+    (28, 'Machine Shoulder Press', 'strength', None, None),
+    (29, 'Pull-ups / Chin-ups', 'strength', None, None),
+    (30, 'Close-Grip Pulldowns', 'strength', None, None),
+    (31, 'Machine-Assisted Pull-ups', 'strength', None, None),
+    (32, 'Face Pulls', 'strength', None, None),
+    (33, 'Band Pull-Aparts', 'strength', None, None),
+    (34, 'Reverse Pec-Deck Machine', 'strength', None, None),
+    (35, 'Bulgarian Split Squats', 'strength', None, None),
+    (36, 'Walking Lunges', 'strength', None, None),
+    (37, 'Leg Extensions', 'strength', None, None),
+    (38, 'Running', 'cardio', 1, '30 minutes'),
+    (39, 'Cycling', 'cardio', 1, '45 minutes'),
+    (40, 'Swimming', 'cardio', 1, '30 minutes'),
+    (41, 'Yoga', 'flexibility', 1, '45 minutes'),
+    (42, 'Stretching', 'flexibility', 1, '30 minutes'),
+]
+
+# (id, name)
+MUSCLES = [
+    (1, 'quads'),
+    (2, 'glutes'),
+    (3, 'hamstrings'),
+    (4, 'core'),
+    (5, 'chest'),
+    (6, 'shoulders'),
+    (7, 'triceps'),
+    (8, 'lats'),
+    (9, 'rhomboids'),
+    (10, 'biceps'),
+    (11, 'lower_back'),
+    (12, 'delts'),
+    (13, 'abs'),
+    (14, 'upper_back'),
+    (15, 'rear_delts'),
+    (16, 'legs'),
+    (17, 'cardiovascular'),
+    (18, 'full_body'),
+]
+
+# exercise id -> muscle ids, in position order
+EXERCISE_MUSCLES = {
+    1: [1, 2, 3, 4],
+    2: [5, 6, 7],
+    3: [8, 9, 10, 11],
+    4: [6, 12],
+    5: [4, 13],
+    6: [2, 3, 11, 4],
+    7: [6, 12, 7],
+    8: [8, 10, 14],
+    9: [15, 9, 14],
+    10: [1, 2, 3],
+    11: [1, 2, 3, 4],
+    12: [1, 2, 3, 4],
+    13: [5, 6, 7],
+    14: [5, 6, 7],
+    15: [5, 6, 7],
+    16: [8, 9, 10, 11],
+    17: [8, 9, 10, 11],
+    18: [6, 12],
+    19: [6, 12],
+    20: [4, 13],
+    21: [4, 13],
+    22: [4, 13],
+    23: [2, 3, 11, 4],
+    24: [2, 3, 11, 4],
+    25: [2, 3, 11, 4],
+    26: [6, 12, 7],
+    27: [6, 12, 7],
+    28: [6, 12, 7],
+    29: [8, 10, 14],
+    30: [8, 10, 14],
+    31: [8, 10, 14],
+    32: [15, 9, 14],
+    33: [15, 9, 14],
+    34: [15, 9, 14],
+    35: [1, 2, 3],
+    36: [1, 2, 3],
+    37: [1, 2, 3],
+    38: [16, 17],
+    39: [16, 17],
+    40: [18, 17],
+    41: [18, 4],
+    42: [18],
+}
+
+# (id, slug, name, description)
+WORKOUT_TEMPLATES = [
+    (1, 'workout_a', 'Workout A - Full Body (Horizontal Focus)', 'Balanced full-body session with horizontal pushing/pulling and squat pattern'),
+    (2, 'workout_b', 'Workout B - Full Body (Posterior Chain Focus)', 'Balanced full-body session with posterior chain, vertical pushing/pulling'),
+]
+
+# (id, template_id, position, exercise_id, category, sets, reps)
+TEMPLATE_EXERCISES = [
+    (1, 1, 0, 1, 'Lower Body (Squat Pattern)', 4, '6-10'),
+    (2, 1, 1, 2, 'Upper Body (Horizontal Push)', 4, '6-10'),
+    (3, 1, 2, 3, 'Upper Body (Horizontal Pull)', 4, '8-12 per arm'),
+    (4, 1, 3, 4, 'Shoulders (Lateral Head)', 3, '10-15'),
+    (5, 1, 4, 5, 'Core (Anterior Stability)', 3, 'Hold for Time'),
+    (6, 2, 0, 6, 'Posterior Chain (Hinge Pattern)', 4, '10-15'),
+    (7, 2, 1, 7, 'Upper Body (Vertical Push)', 4, '8-12'),
+    (8, 2, 2, 8, 'Upper Body (Vertical Pull)', 4, '8-12'),
+    (9, 2, 3, 9, 'Upper Back / Posture', 3, '10-15'),
+    (10, 2, 4, 10, 'Lower Body (Accessory)', 3, '10-15'),
+]
+
+# (id, slot_id, position, exercise_id, note)
+ALTERNATIVES = [
+    (1, 1, 0, 11, 'Best for learning form'),
+    (2, 1, 1, 12, 'Excellent core engagement'),
+    (3, 1, 2, 10, 'Good for isolating legs if back is tired'),
+    (4, 2, 0, 13, 'Better range of motion, easier on shoulders'),
+    (5, 2, 1, 14, 'Emphasizes the upper chest'),
+    (6, 2, 2, 15, 'Great for stability and safety'),
+    (7, 3, 0, 16, 'More overall back engagement, but more lower back stress'),
+    (8, 3, 1, 17, 'A great middle-ground option'),
+    (9, 3, 2, 9, 'Excellent for isolating the mid-back'),
+    (10, 4, 0, 18, 'Provides constant tension'),
+    (11, 4, 1, 19, 'Strict form, good for isolation'),
+    (12, 5, 0, 20, 'Advanced and highly effective'),
+    (13, 5, 1, 21, 'Targets lower abs'),
+    (14, 5, 2, 22, 'Excellent for core control and stability'),
+    (15, 6, 0, 23, 'The gold standard, but requires perfect form'),
+    (16, 6, 1, 24, 'Advanced, requires light weight and strict form'),
+    (17, 6, 2, 25, 'More explosive, great for conditioning'),
+    (18, 7, 0, 26, "The 'king' of shoulder exercises"),
+    (19, 7, 1, 27, 'Hits all three heads of the shoulder'),
+    (20, 7, 2, 28, 'Great for stability and safety'),
+    (21, 8, 0, 29, 'The ultimate goal. Use assistance bands'),
+    (22, 8, 1, 30, 'Emphasizes more of the lats and biceps'),
+    (23, 8, 2, 31, 'Excellent for learning the movement'),
+    (24, 9, 0, 32, 'The best for shoulder health and posture'),
+    (25, 9, 1, 33, 'Can be done anywhere, great for warm-ups'),
+    (26, 9, 2, 34, 'Excellent isolation for the rear delts'),
+    (27, 10, 0, 35, 'Brutal but incredibly effective for legs and glutes'),
+    (28, 10, 1, 36, 'Great for overall leg development and stability'),
+    (29, 10, 2, 37, 'Pure quad isolation'),
+]
+
+
+def upgrade() -> None:
+    tables = {}
+    tables['exercise'] = op.create_table(
+        'exercise',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('exercise_type', sa.String(length=50), nullable=False),
+        sa.Column('default_sets', sa.Integer(), nullable=True),
+        sa.Column('default_reps', sa.String(length=50), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    tables['muscle'] = op.create_table(
+        'muscle',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    tables['exercise_muscle'] = op.create_table(
+        'exercise_muscle',
+        sa.Column('exercise_id', sa.Integer(), nullable=False),
+        sa.Column('muscle_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ),
+        sa.ForeignKeyConstraint(['muscle_id'], ['muscle.id'], ),
+        sa.PrimaryKeyConstraint('exercise_id', 'muscle_id')
+    )
+    tables['workout_template'] = op.create_table(
+        'workout_template',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('slug', sa.String(length=50), nullable=False),
+        sa.Column('name', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+    )
+    tables['workout_template_exercise'] = op.create_table(
+        'workout_template_exercise',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('template_id', sa.Integer(), nullable=False),
+        sa.Column('exercise_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('sets', sa.Integer(), nullable=False),
+        sa.Column('reps', sa.String(length=50), nullable=False),
+        sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ),
+        sa.ForeignKeyConstraint(['template_id'], ['workout_template.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_workout_template_exercise_template_id', 'workout_template_exercise', ['template_id'])
+    tables['exercise_alternative'] = op.create_table(
+        'exercise_alternative',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('slot_id', sa.Integer(), nullable=False),
+        sa.Column('exercise_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('note', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ),
+        sa.ForeignKeyConstraint(['slot_id'], ['workout_template_exercise.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slot_id', 'exercise_id', name='uq_exercise_alternative_slot_exercise')
+    )
+    tables['catalog_version'] = op.create_table(
+        'catalog_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Seed with the catalog that was hardcoded until now (parents before children for the FKs)
+    op.bulk_insert(tables['exercise'], [
+        {'id': id, 'name': name, 'exercise_type': exercise_type, 'default_sets': sets, 'default_reps': reps,
+         'is_active': True}
+        for id, name, exercise_type, sets, reps in EXERCISES])
+    op.bulk_insert(tables['muscle'], [{'id': id, 'name': name} for id, name in MUSCLES])
+    op.bulk_insert(tables['exercise_muscle'], [
+        {'exercise_id': exercise_id, 'muscle_id': muscle_id, 'position': position}
+        for exercise_id, muscle_ids in EXERCISE_MUSCLES.items() for position, muscle_id in enumerate(muscle_ids)])
+    op.bulk_insert(tables['workout_template'], [
+        {'id': id, 'slug': slug, 'name': name, 'description': description, 'position': position, 'is_active': True}
+        for position, (id, slug, name, description) in enumerate(WORKOUT_TEMPLATES)])
+    op.bulk_insert(tables['workout_template_exercise'], [
+        {'id': id, 'template_id': template_id, 'position': position, 'exercise_id': exercise_id,
+         'category': category, 'sets': sets, 'reps': reps}
+        for id, template_id, position, exercise_id, category, sets, reps in TEMPLATE_EXERCISES])
+    op.bulk_insert(tables['exercise_alternative'], [
+        {'id': id, 'slot_id': slot_id, 'position': position, 'exercise_id': exercise_id, 'note': note}
+        for id, slot_id, position, exercise_id, note in ALTERNATIVES])
+    op.bulk_insert(tables['catalog_version'], [{'id': 1, 'version': 1, 'updated_at': datetime.utcnow()}])
+
+
+def downgrade() -> None:
+    op.drop_table('catalog_version')
+    op.drop_table('exercise_alternative')
+    op.drop_index('ix_workout_template_exercise_template_id', table_name='workout_template_exercise')
+    op.drop_table('workout_template_exercise')
+    op.drop_table('workout_template')
+    op.drop_table('exercise_muscle')
+    op.drop_table('muscle')
+    op.drop_table('exercise')
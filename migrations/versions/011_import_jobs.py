@@ -0,0 +1,45 @@
+"""Add import_job table for bulk history imports
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'import_job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('format', sa.String(length=10), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('bytes_total', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('bytes_read', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('rows_read', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('imported', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('duplicates', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error_sample', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_import_job_user_created', 'import_job', ['user_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_import_job_user_created', table_name='import_job')
+    op.drop_table('import_job')
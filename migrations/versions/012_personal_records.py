@@ -0,0 +1,126 @@
+"""Add personal_record table and backfill it from exercise history
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+USER_CHUNK = 200
+INSERT_BATCH = 1000
+E1RM_MAX_REPS = 12
+
+exercise_log = sa.table(
+    'exercise_log',
+    sa.column('id', sa.Integer), sa.column('user_id', sa.Integer), sa.column('exercise_name', sa.String),
+    sa.column('workout_time', sa.DateTime), sa.column('reps', sa.Integer), sa.column('weight', sa.Float),
+    sa.column('form_score', sa.Integer), sa.column('effort_score', sa.Integer),
+)
+exercise_set_log = sa.table(
+    'exercise_set_log',
+    sa.column('id', sa.Integer), sa.column('exercise_log_id', sa.Integer), sa.column('set_number', sa.Integer),
+    sa.column('reps', sa.Integer), sa.column('weight', sa.Float), sa.column('quality_score', sa.Float),
+)
+
+
+# The record rules of app.personal_records as of this revision, frozen so later changes to the
+# app don't change what this backfill writes
+def _e1rm(weight, reps):
+    if not weight or weight <= 0 or not reps or not (1 <= reps <= E1RM_MAX_REPS):
+        return None
+    return weight if reps == 1 else round(weight * (1 + reps / 30.0), 2)
+
+
+def _values(reps, weight, quality):
+    """(kind, at_weight, value) for each record a set counts towards"""
+    if weight is not None and weight > 0:
+        yield 'weight', 0.0, weight
+    estimate = _e1rm(weight, reps)
+    if estimate is not None:
+        yield 'e1rm', 0.0, estimate
+    if reps:
+        yield 'reps', float(weight or 0), reps
+    if quality is not None:
+        yield 'quality', 0.0, quality
+
+
+def _best_sets(rows):
+    """The best set per (exercise, kind, at_weight); ties keep the earliest set"""
+    best = {}
+    for name, log_id, set_number, when, reps, weight, quality in rows:
+        for kind, at_weight, value in _values(reps, weight, quality):
+            key = (name, kind, at_weight)
+            current = best.get(key)
+            if current is None or value > current['value'] or (
+                    value == current['value'] and when < current['achieved_at']):
+                best[key] = {'exercise_name': name, 'kind': kind, 'at_weight': at_weight, 'value': value,
+                             'reps': reps, 'weight': weight, 'exercise_log_id': log_id,
+                             'set_number': set_number, 'achieved_at': when}
+    return best
+
+
+def _rows(conn, user_ids):
+    """_best_sets() rows for a chunk of users, with (user_id, exercise_name) in place of the name"""
+    L, S = exercise_log.c, exercise_set_log.c
+    queries = [
+        sa.select(L.user_id, L.exercise_name, L.id, S.set_number, L.workout_time, S.reps, S.weight, S.quality_score)
+        .select_from(exercise_log.join(exercise_set_log, S.exercise_log_id == L.id))
+        .where(L.user_id.in_(user_ids)),
+        # Logs saved before per-set rows existed count as one set
+        sa.select(L.user_id, L.exercise_name, L.id, sa.null(), L.workout_time, L.reps, L.weight,
+                  sa.func.round(L.form_score * (L.effort_score / 10.0), 2))
+        .where(L.user_id.in_(user_ids),
+               ~sa.select(S.id).where(S.exercise_log_id == L.id).exists()),
+    ]
+    for query in queries:
+        for user_id, name, *rest in conn.execution_options(yield_per=INSERT_BATCH).execute(query):
+            yield ((user_id, name), *rest)
+
+
+def upgrade() -> None:
+    records = op.create_table(
+        'personal_record',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('exercise_name', sa.String(length=200), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('at_weight', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('value', sa.Float(), nullable=False),
+        sa.Column('reps', sa.Integer(), nullable=True),
+        sa.Column('weight', sa.Float(), nullable=True),
+        sa.Column('exercise_log_id', sa.Integer(), nullable=True),
+        sa.Column('set_number', sa.Integer(), nullable=True),
+        sa.Column('achieved_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.ForeignKeyConstraint(['exercise_log_id'], ['exercise_log.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'exercise_name', 'kind', 'at_weight',
+                            name='uq_personal_record_user_exercise_kind')
+    )
+
+    # Backfill a chunk of users at a time, so memory holds one chunk's records and not the whole history
+    conn = op.get_bind()
+    user_ids = [row[0] for row in conn.execute(
+        sa.select(exercise_log.c.user_id).distinct().order_by(exercise_log.c.user_id))]
+    now = datetime.utcnow()
+    for i in range(0, len(user_ids), USER_CHUNK):
+        batch = []
+        for best in _best_sets(_rows(conn, user_ids[i:i + USER_CHUNK])).values():
+            user_id, name = best['exercise_name']
+            batch.append(dict(best, user_id=user_id, exercise_name=name, updated_at=now))
+        for j in range(0, len(batch), INSERT_BATCH):
+            op.bulk_insert(records, batch[j:j + INSERT_BATCH])
+
+
+def downgrade() -> None:
+    op.drop_table('personal_record')
@@ -0,0 +1,39 @@
+"""Make chat_participant unique per room and user
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+chat_participant = sa.table(
+    'chat_participant',
+    sa.column('id', sa.Integer), sa.column('room_id', sa.Integer), sa.column('user_id', sa.Integer),
+)
+
+
+def upgrade() -> None:
+    # Concurrent joins could insert the same participant twice; keep the first row of each pair
+    conn = op.get_bind()
+    p = chat_participant.c
+    duplicates = conn.execute(
+        sa.select(p.room_id, p.user_id, sa.func.min(p.id))
+        .group_by(p.room_id, p.user_id)
+        .having(sa.func.count() > 1)
+    ).all()
+    for room_id, user_id, keep_id in duplicates:
+        conn.execute(chat_participant.delete().where(p.room_id == room_id, p.user_id == user_id, p.id != keep_id))
+
+    op.create_unique_constraint('uq_chat_participant_room_user', 'chat_participant', ['room_id', 'user_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_chat_participant_room_user', 'chat_participant', type_='unique')
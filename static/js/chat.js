@@ -8,7 +8,12 @@
       this.currentRoom = null;
       this.currentUser = null;
       this.typingTimeout = null;
-      this.typingUsers = new Set();
+      this.lastTypingSent = 0;
+      this.typingSources = new Map();
+      this.participants = new Map();
+      this.heartbeatTimer = null;
+      this.historyCursor = null;
+      this.loadingHistory = false;
 
       this.initializeChat();
       this.setupEventListeners();
@@ -63,22 +68,28 @@
         this.joinRoom(data);
       });
 
+      this.socket.on('history_page', (data) => {
+        this.prependHistory(data);
+      });
+
       this.socket.on('new_message', (data) => {
         this.displayMessage(data);
       });
 
       this.socket.on('user_joined', (data) => {
-        this.displaySystemMessage(data.message);
-        this.updateParticipants();
+        if (data.message) this.displaySystemMessage(data.message);
       });
 
       this.socket.on('user_left', (data) => {
-        this.displaySystemMessage(data.message);
-        this.updateParticipants();
+        if (data.message) this.displaySystemMessage(data.message);
       });
 
-      this.socket.on('user_typing', (data) => {
-        this.handleTypingIndicator(data);
+      this.socket.on('presence', (data) => {
+        this.applyPresence(data);
+      });
+
+      this.socket.on('users_typing', (data) => {
+        this.handleTypingSnapshot(data);
       });
 
       this.socket.on('error', (data) => {
@@ -98,6 +109,14 @@
         });
       }
 
+      // Load older messages when scrolled to the top
+      const container = document.getElementById('messages-container');
+      if (container) {
+        container.addEventListener('scroll', () => {
+          if (container.scrollTop < 40) this.loadOlderMessages();
+        });
+      }
+
       // Typing indicators
       if (messageInput) {
         messageInput.addEventListener('input', () => this.startTyping());
@@ -135,8 +154,11 @@
 
       // Leave current room if any
       if (this.currentRoom) {
+        this.stopTyping();
         this.socket.emit('leave_room', { room: this.currentRoom });
       }
+      this.typingSources.clear();
+      this.renderTyping();
 
       // Join new room
       this.currentRoom = roomName;
@@ -158,9 +180,14 @@
       (data.messages || []).forEach(message => {
         this.displayMessage(message, false);
       });
+      this.historyCursor = data.next_cursor || null;
+      this.loadingHistory = false;
+      this.scrollToBottom();
 
       // Update participants
-      this.updateParticipants(data.participants || []);
+      this.participants = new Map((data.participants || []).map(p => [p.user_id, p]));
+      this.updateParticipants(Array.from(this.participants.values()));
+      this.startHeartbeat();
 
       // Update room header
       const nameEl = document.getElementById('current-room-name');
@@ -181,9 +208,41 @@
       this.stopTyping();
     }
 
+    loadOlderMessages() {
+      if (!this.currentRoom || !this.historyCursor || this.loadingHistory) return;
+      this.loadingHistory = true;
+      this.socket.emit('load_history', { room: this.currentRoom, before: this.historyCursor });
+    }
+
+    prependHistory(data) {
+      if (data.room !== this.currentRoom) return;
+      this.loadingHistory = false;
+      this.historyCursor = data.next_cursor || null;
+
+      const messagesList = document.getElementById('messages-list');
+      const container = document.getElementById('messages-container');
+      if (!messagesList || !container) return;
+
+      // Keep the current view still while older messages are inserted above it
+      const previousHeight = container.scrollHeight;
+      const users = data.users || {};
+      const fragment = document.createDocumentFragment();
+      (data.messages || []).forEach(message => {
+        message.user_name = users[message.user_id] || 'User';
+        fragment.appendChild(this.buildMessageElement(message));
+      });
+      messagesList.insertBefore(fragment, messagesList.firstChild);
+      container.scrollTop += container.scrollHeight - previousHeight;
+    }
+
     displayMessage(message, scrollToBottom = true) {
       const messagesList = document.getElementById('messages-list');
       if (!messagesList) return;
+      messagesList.appendChild(this.buildMessageElement(message));
+      if (scrollToBottom) this.scrollToBottom();
+    }
+
+    buildMessageElement(message) {
       const messageElement = document.createElement('div');
 
       const isCurrentUser = message.user_id === this.currentUser.id;
@@ -209,8 +268,7 @@
         `;
       }
 
-      messagesList.appendChild(messageElement);
-      if (scrollToBottom) this.scrollToBottom();
+      return messageElement;
     }
 
     displaySystemMessage(message) {
@@ -218,36 +276,80 @@
     }
 
     startTyping() {
-      if (this.typingTimeout) return;
-      this.socket.emit('typing_start', { room: this.currentRoom });
-      this.typingTimeout = setTimeout(() => this.stopTyping(), 1000);
+      if (!this.currentRoom) return;
+      // While typing, refresh the server at most every 3s (it forgets typers after 5s)
+      const now = Date.now();
+      if (now - this.lastTypingSent > 3000) {
+        this.lastTypingSent = now;
+        this.socket.emit('typing_start', { room: this.currentRoom });
+      }
+      clearTimeout(this.typingTimeout);
+      this.typingTimeout = setTimeout(() => this.stopTyping(), 2000);
     }
 
     stopTyping() {
-      if (this.typingTimeout) {
-        clearTimeout(this.typingTimeout);
-        this.typingTimeout = null;
+      if (!this.typingTimeout) return;
+      clearTimeout(this.typingTimeout);
+      this.typingTimeout = null;
+      this.lastTypingSent = 0;
+      if (this.currentRoom) this.socket.emit('typing_stop', { room: this.currentRoom });
+    }
+
+    handleTypingSnapshot(data) {
+      if (data.room !== this.currentRoom) return;
+      // Each server process sends its own snapshot; show the union of the recent ones
+      this.typingSources.set(data.source, { users: data.users || [], at: Date.now() });
+      this.renderTyping();
+      if (!this.typingSweep) {
+        this.typingSweep = setInterval(() => this.renderTyping(), 2000);
       }
-      this.socket.emit('typing_stop', { room: this.currentRoom });
     }
 
-    handleTypingIndicator(data) {
+    renderTyping() {
       const indicator = document.getElementById('typing-indicator');
       const typingText = document.getElementById('typing-text');
       if (!indicator || !typingText) return;
 
-      if (data.is_typing && data.user_id !== this.currentUser.id) {
-        this.typingUsers.add(data.user_id);
-        typingText.textContent = `${data.user_name} is typing...`;
-        indicator.classList.remove('hidden');
-      } else {
-        this.typingUsers.delete(data.user_id);
-        if (this.typingUsers.size === 0) {
-          indicator.classList.add('hidden');
-        } else {
-          typingText.textContent = `${this.typingUsers.size} people are typing...`;
+      const now = Date.now();
+      const names = new Map();
+      this.typingSources.forEach((snapshot, source) => {
+        if (now - snapshot.at > 6000) {
+          this.typingSources.delete(source);
+          return;
         }
+        snapshot.users.forEach(u => {
+          if (u.user_id !== this.currentUser.id) names.set(u.user_id, u.user_name);
+        });
+      });
+
+      const typing = Array.from(names.values());
+      if (typing.length === 0) {
+        indicator.classList.add('hidden');
+        return;
+      }
+      if (typing.length === 1) {
+        typingText.textContent = `${typing[0]} is typing...`;
+      } else if (typing.length === 2) {
+        typingText.textContent = `${typing[0]} and ${typing[1]} are typing...`;
+      } else {
+        typingText.textContent = `${typing.length} people are typing...`;
       }
+      indicator.classList.remove('hidden');
+    }
+
+    applyPresence(data) {
+      if (data.room !== this.currentRoom) return;
+      (data.joined || []).forEach(p => this.participants.set(p.user_id, { ...p, is_online: true }));
+      (data.left || []).forEach(userId => this.participants.delete(userId));
+      this.updateParticipants(Array.from(this.participants.values()));
+    }
+
+    startHeartbeat() {
+      // Presence expires connections that go quiet, so check in well inside the server's TTL
+      if (this.heartbeatTimer) return;
+      this.heartbeatTimer = setInterval(() => {
+        if (this.currentRoom && this.socket.connected) this.socket.emit('heartbeat');
+      }, 20000);
     }
 
     updateParticipants(participants = []) {
@@ -283,6 +385,8 @@
     clearMessages() {
       const messagesList = document.getElementById('messages-list');
       if (messagesList) messagesList.innerHTML = '';
+      this.historyCursor = null;
+      this.loadingHistory = false;
     }
 
     enableMessageInput() {
@@ -1,38 +1,32 @@
 /*
   Exercise page logic extracted from templates/exercise.html
-  - Defines workoutPlans
+  - Loads workout plans from /api/catalog
+  - Suggests exercise names from /api/exercises/search while typing
   - Exposes functions used by inline buttons: loadWorkoutPlan, fillExerciseTemplate, fillExerciseTemplateFromPlan, copyPreviousExercise
   - Initializes sliders, default datetime, and renders charts from JSON provided by #trend-data
 */
 (function () {
   'use strict';
 
-  // Workout plans database
-  const workoutPlans = {
-    workout_a: {
-      name: 'Workout A - Full Body (Horizontal Focus)',
-      exercises: [
-        { name: 'Barbell Back Squat', type: 'strength', sets: 4, reps: '6-10', category: 'Lower Body (Squat Pattern)' },
-        { name: 'Bench Press (Barbell)', type: 'strength', sets: 4, reps: '6-10', category: 'Upper Body (Horizontal Push)' },
-        { name: 'Dumbbell Rows', type: 'strength', sets: 4, reps: '8-12 per arm', category: 'Upper Body (Horizontal Pull)' },
-        { name: 'Dumbbell Lateral Raises', type: 'strength', sets: 3, reps: '10-15', category: 'Shoulders (Lateral Head)' },
-        { name: 'Plank', type: 'strength', sets: 3, reps: 'Hold for Time', category: 'Core (Anterior Stability)' }
-      ]
-    },
-    workout_b: {
-      name: 'Workout B - Full Body (Posterior Chain Focus)',
-      exercises: [
-        { name: '45-Degree Back Extension', type: 'strength', sets: 4, reps: '10-15', category: 'Posterior Chain (Hinge Pattern)' },
-        { name: 'Seated Dumbbell Shoulder Press', type: 'strength', sets: 4, reps: '8-12', category: 'Upper Body (Vertical Push)' },
-        { name: 'Lat Pulldowns', type: 'strength', sets: 4, reps: '8-12', category: 'Upper Body (Vertical Pull)' },
-        { name: 'Seated Cable Rows', type: 'strength', sets: 3, reps: '10-15', category: 'Upper Back / Posture' },
-        { name: 'Leg Press', type: 'strength', sets: 3, reps: '10-15', category: 'Lower Body (Accessory)' }
-      ]
+  // Workout plans come from /api/catalog (revalidated by ETag, cached by the service worker)
+  let catalogRequest = null;
+  function loadCatalog() {
+    if (!catalogRequest) {
+      catalogRequest = fetch('/api/catalog', { credentials: 'same-origin' })
+        .then(response => (response.ok ? response.json() : { plans: {} }))
+        .catch(() => {
+          catalogRequest = null;
+          return { plans: {} };
+        });
     }
-  };
+    return catalogRequest;
+  }
 
   function loadWorkoutPlan(planName) {
-    const plan = workoutPlans[planName];
+    return loadCatalog().then(catalog => showWorkoutPlan((catalog.plans || {})[planName]));
+  }
+
+  function showWorkoutPlan(plan) {
     if (!plan) return;
 
     // Show workout plan notification
@@ -241,8 +235,46 @@
     }
   }
 
+  // Exercise name suggestions: one request per pause in typing, latest answer wins
+  function initExerciseSuggestions() {
+    const list = document.getElementById('exercise-list');
+    if (!list) return;
+    let timer = null;
+    let latest = 0;
+
+    function render(results) {
+      list.innerHTML = '';
+      results.forEach(result => {
+        const option = document.createElement('option');
+        option.value = result.name;
+        if (result.source === 'history') option.label = `${result.name} (logged ${result.uses}x)`;
+        list.appendChild(option);
+      });
+    }
+
+    function fetchSuggestions(query) {
+      const requestId = ++latest;
+      fetch(`/api/exercises/search?q=${encodeURIComponent(query)}&limit=10`, { credentials: 'same-origin' })
+        .then(response => (response.ok ? response.json() : { results: [] }))
+        .then(data => {
+          if (requestId === latest) render(data.results || []);
+        })
+        .catch(() => {});
+    }
+
+    document.querySelectorAll('input[list="exercise-list"]').forEach(input => {
+      input.addEventListener('focus', () => fetchSuggestions(input.value));
+      input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fetchSuggestions(input.value), 120);
+      });
+    });
+  }
+
   document.addEventListener('DOMContentLoaded', function () {
     initFormDefaults();
+    initExerciseSuggestions();
+    loadCatalog();
     initCharts();
     // Attach plan loader buttons
     document.querySelectorAll('.load-plan-btn').forEach(btn => {
@@ -1,5 +1,7 @@
 class OfflineManager {
   constructor() {
+    // Must not exceed SYNC_MAX_ITEMS on the server
+    this.syncBatchSize = 100;
     this.dbName = 'FitnessAppDB';
     this.dbVersion = 1;
     this.isOnline = navigator.onLine;
@@ -126,7 +128,7 @@ class OfflineManager {
       const data = this.formDataToObject(formData);
 
       // Store offline data locally
-      await this.storeOfflineData(endpoint, 'POST', data);
+      await this.storeOfflineData(endpoint, 'POST', data, type);
 
       // Also store in local fitness data for immediate display
       await this.storeFitnessData(type, data);
@@ -147,7 +149,20 @@ class OfflineManager {
     return obj;
   }
 
-  async storeOfflineData(url, method, payload) {
+  generateKey() {
+    // Idempotency key: lets /api/sync recognise an entry it has already saved
+    if (window.crypto && crypto.randomUUID) {
+      return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+  }
+
+  syncType(data) {
+    // Entries queued before /api/sync existed only have the form URL
+    return data.type || data.url.replace(/^\/add_/, '');
+  }
+
+  async storeOfflineData(url, method, payload, type) {
     return new Promise((resolve, reject) => {
       const transaction = this.db.transaction(['offlineData'], 'readwrite');
       const store = transaction.objectStore('offlineData');
@@ -156,6 +171,8 @@ class OfflineManager {
         url,
         method,
         payload,
+        type,
+        key: this.generateKey(),
         timestamp: new Date().toISOString(),
         synced: false
       };
@@ -263,34 +280,71 @@ class OfflineManager {
   }
 
   async syncPendingData() {
-    if (!this.isOnline) return;
+    if (!this.isOnline || this.syncing) return;
+    this.syncing = true;
 
     try {
       const offlineData = await this.getOfflineData();
+      let synced = 0;
+      let rejected = 0;
+
+      // Whole batches go in one request; keys make a retried batch safe
+      for (let start = 0; start < offlineData.length; start += this.syncBatchSize) {
+        const batch = offlineData.slice(start, start + this.syncBatchSize);
+        for (const data of batch) {
+          if (!data.key) {
+            data.key = this.generateKey();
+            await this.updateOfflineData(data);
+          }
+        }
 
-      for (const data of offlineData) {
-        try {
-          const response = await fetch(data.url, {
-            method: data.method,
-            headers: {
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(data.payload)
-          });
+        const response = await fetch('/api/sync', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          credentials: 'same-origin',
+          body: JSON.stringify({
+            items: batch.map((data) => ({
+              key: data.key,
+              type: this.syncType(data),
+              data: data.payload,
+              queued_at: data.timestamp
+            }))
+          })
+        });
+        if (!response.ok) {
+          // Not logged in or the server failed: keep everything for the next attempt
+          console.error('Sync failed:', response.status);
+          break;
+        }
 
-          if (response.ok) {
-            await this.removeOfflineData(data.id);
+        const { results } = await response.json();
+        for (let i = 0; i < batch.length; i++) {
+          const result = results[i];
+          // Kept for the next sync: lost a race with another upload of the same keys
+          if (!result || result.status === 'retry') continue;
+          if (result.status === 'error') {
+            // Retrying an entry the server rejected won't help
+            console.error('Offline entry rejected:', batch[i], result.error);
+            rejected++;
+          } else {
+            synced++;
           }
-        } catch (error) {
-          console.error('Sync failed for:', data, error);
+          await this.removeOfflineData(batch[i].id);
         }
       }
 
-      if (offlineData.length > 0) {
+      if (synced > 0) {
         this.showSyncCompleteMessage();
       }
+      if (rejected > 0) {
+        this.showNotification(`${rejected} offline ${rejected === 1 ? 'entry was' : 'entries were'} invalid and could not be saved.`, 'error');
+      }
     } catch (error) {
       console.error('Error syncing pending data:', error);
+    } finally {
+      this.syncing = false;
     }
   }
 
@@ -305,6 +359,17 @@ class OfflineManager {
     });
   }
 
+  async updateOfflineData(data) {
+    return new Promise((resolve) => {
+      const transaction = this.db.transaction(['offlineData'], 'readwrite');
+      const store = transaction.objectStore('offlineData');
+      const request = store.put(data);
+
+      request.onsuccess = () => resolve();
+      request.onerror = () => resolve();
+    });
+  }
+
   async removeOfflineData(id) {
     return new Promise((resolve) => {
       const transaction = this.db.transaction(['offlineData'], 'readwrite');
@@ -1,6 +1,8 @@
 const CACHE_NAME = 'fitness-app-v1';
 const OFFLINE_CACHE = 'fitness-app-offline-v1';
 const STATIC_CACHE = 'fitness-app-static-v1';
+const CATALOG_CACHE = 'fitness-app-catalog-v1';
+const CATALOG_URL = '/api/catalog';
 
 // Version tracking for updates
 const CURRENT_VERSION = '1.0.0';
@@ -65,7 +67,8 @@ self.addEventListener('activate', (event) => {
       return Promise.all(
         cacheNames.map(cacheName => {
           // Delete old caches that don't match current version
-          if (cacheName.startsWith(CACHE_PREFIX) && cacheName !== STATIC_CACHE && cacheName !== OFFLINE_CACHE) {
+          if (cacheName.startsWith(CACHE_PREFIX) && cacheName !== STATIC_CACHE && cacheName !== OFFLINE_CACHE &&
+              cacheName !== CATALOG_CACHE) {
             console.log('Deleting old cache:', cacheName);
             return caches.delete(cacheName);
           }
@@ -93,6 +96,28 @@ self.addEventListener('message', (event) => {
   }
 });
 
+// Exercise catalog: answer from cache at once and refresh it in the background.
+// The refresh revalidates with the stored ETag, so an unchanged catalog costs a 304.
+function catalogResponse(event) {
+  return caches.open(CATALOG_CACHE).then(cache => cache.match(CATALOG_URL).then(cached => {
+    const headers = {};
+    if (cached && cached.headers.get('ETag')) headers['If-None-Match'] = cached.headers.get('ETag');
+    const refresh = fetch(CATALOG_URL, { credentials: 'same-origin', headers, cache: 'no-cache' })
+      .then(response => {
+        if (response.status === 200) {
+          cache.put(CATALOG_URL, response.clone());
+          return response;
+        }
+        return cached || response;
+      });
+    if (cached) {
+      event.waitUntil(refresh.catch(() => {}));
+      return cached;
+    }
+    return refresh;
+  }));
+}
+
 // Fetch event - serve cached content when offline
 self.addEventListener('fetch', (event) => {
   // Skip non-GET requests
@@ -105,6 +130,26 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  const url = new URL(event.request.url);
+  // Exports are large streamed downloads: let the browser fetch them directly, never cache them
+  if (url.origin === self.location.origin && url.pathname === '/export') {
+    return;
+  }
+  if (url.origin === self.location.origin && url.pathname === CATALOG_URL) {
+    event.respondWith(catalogResponse(event));
+    return;
+  }
+  // Other API responses are per user and change often: network first, cache only as an offline fallback
+  if (url.origin === self.location.origin && url.pathname.startsWith('/api/')) {
+    event.respondWith(
+      fetch(event.request).catch(() => caches.match(event.request).then(cached => cached || new Response(
+        JSON.stringify({ error: 'Offline' }),
+        { status: 503, headers: { 'Content-Type': 'application/json' } }
+      )))
+    );
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then(cachedResponse => {
@@ -0,0 +1,50 @@
+"""
+Shared fixtures: the app runs against a throwaway SQLite database whose
+tables are created fresh for every test.
+"""
+import os
+import tempfile
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='fitness-tests-'), 'test.db')
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+
+import pytest
+from app import app as flask_app
+from app.models import db, User
+from app import identity, trends, exercise_search
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+    # Ids are reused once the tables are recreated, so per-process caches must not outlive a test
+    identity._cache.clear()
+    trends.clear_trends_cache()
+    exercise_search._user_indexes.clear()
+
+
+def make_user(name='Test User'):
+    """A committed user; needs an app context"""
+    count = User.query.count()
+    user = User(google_id=f'test-{count}', email=f'user{count}@test.local', name=name)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def user(app):
+    return make_user()
+
+
+@pytest.fixture
+def client(app, user):
+    """Test client logged in as `user`"""
+    test_client = app.test_client()
+    with test_client.session_transaction() as session:
+        session['user_id'] = user.id
+    return test_client
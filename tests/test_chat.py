@@ -0,0 +1,83 @@
+import os
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.models import db, ChatRoom, ChatParticipant, ChatMessage
+from app.chat_history import cursor_for, history_page
+from app.chat_state import MemoryChatState, serialize_message
+from app.chat_typing import TypingAggregator
+
+
+def test_a_user_is_a_participant_of_a_room_once(app, user):
+    room = ChatRoom(name='general')
+    db.session.add(room)
+    db.session.commit()
+    db.session.add(ChatParticipant(room_id=room.id, user_id=user.id))
+    db.session.commit()
+
+    # Two joins racing past the in-memory membership check: the second insert is rejected
+    db.session.add(ChatParticipant(room_id=room.id, user_id=user.id))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+    assert ChatParticipant.query.count() == 1
+
+
+def test_paging_from_the_room_joined_cursor_skips_buffered_messages(app, user):
+    room = ChatRoom(name='general')
+    db.session.add(room)
+    db.session.commit()
+    state = MemoryChatState()
+    state.ensure_room(room.id)
+    # Older than anything in the buffer, so only reachable through load_history
+    db.session.add(ChatMessage(room_id=room.id, user_id=user.id, message='older', message_type='text',
+                               created_at=datetime(2026, 3, 1, 9, 0, 0)))
+    db.session.commit()
+
+    # A join as chat.py records it: buffered before the flush, so without an id
+    now = datetime.utcnow().replace(microsecond=0)
+    state.append(room.id, serialize_message(None, user.id, user.name, 'joined', 'join', now))
+    # The flush stores it at the column's precision (whole seconds on MariaDB)
+    db.session.add(ChatMessage(room_id=room.id, user_id=user.id, message='joined', message_type='join',
+                               created_at=now.replace(microsecond=0)))
+    db.session.commit()
+
+    history = state.history(room.id)
+    page = history_page(room.id, before=cursor_for(history[0]))
+    assert [m['message'] for m in page['messages']] == ['older']
+
+
+
+class _Stop(BaseException):
+    """Ends the otherwise endless typing loop; not an Exception, so the loop cannot swallow it"""
+
+
+class _FlakySocketIO:
+    """The first emit fails; later intervals run the queued actions, then stop the loop"""
+
+    def __init__(self, actions):
+        self.actions = list(actions)
+        self.emitted = []
+        self.failed = False
+
+    def sleep(self, seconds):
+        if not self.actions:
+            raise _Stop()
+        self.actions.pop(0)()
+
+    def emit(self, event, data, to=None):
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError('message queue unavailable')
+        self.emitted.append(data)
+
+
+def test_typing_updates_keep_running_after_a_failed_emit():
+    socketio = _FlakySocketIO([lambda: None, lambda: typing.start_typing('general', 2, 'Bob')])
+    typing = TypingAggregator(socketio, interval=0)
+    typing._pid = os.getpid()  # _run is driven here rather than as a background task
+    typing.start_typing('general', 1, 'Ann')
+
+    with pytest.raises(_Stop):
+        typing._run()
+    assert [[u['user_name'] for u in data['users']] for data in socketio.emitted] == [['Ann', 'Bob']]
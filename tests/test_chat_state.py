@@ -0,0 +1,62 @@
+import importlib.util
+import os
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from app.models import db, ChatRoom, ChatMessage
+from app.chat_state import MemoryChatState, load_room, serialize_message, message_key, row_key
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+
+def _room():
+    room = ChatRoom(name='general')
+    db.session.add(room)
+    db.session.commit()
+    return room
+
+
+def _message(user, text, when, message_id=None):
+    return serialize_message(message_id, user.id, user.name, text, 'text', when)
+
+
+def test_pending_messages_already_written_are_not_loaded_twice(app, user):
+    room = _room()
+    when = datetime(2026, 3, 1, 9, 0, 0, 123456)
+    # Flushed between reading the pending list and querying the table
+    db.session.add(ChatMessage(room_id=room.id, user_id=user.id, message='hi', message_type='text', created_at=when))
+    db.session.commit()
+    pending = [_message(user, 'hi', when), _message(user, 'still queued', datetime(2026, 3, 1, 9, 1))]
+
+    history, _ = load_room(room.id, pending)
+    assert [m['message'] for m in history] == ['hi', 'still queued']
+    assert history[0]['id'] is not None
+
+
+def test_assign_ids_fills_in_buffered_messages(app, user):
+    room = _room()
+    state = MemoryChatState()
+    state.ensure_room(room.id)
+    first, second = datetime(2026, 3, 1, 9), datetime(2026, 3, 1, 9, 1)
+    state.append(room.id, _message(user, 'one', first))
+    state.append(room.id, _message(user, 'two', second))
+
+    row = {'room_id': room.id, 'user_id': user.id, 'message': 'one', 'message_type': 'text', 'created_at': first}
+    assert row_key(row) == message_key(_message(user, 'one', first))
+    state.assign_ids(room.id, {row_key(row): 41})
+    assert [m['id'] for m in state.history(room.id)] == [41, None]
+
+
+@pytest.mark.parametrize('workers,url,ok', [(1, '', True), (4, '', False), (4, 'redis://localhost:6379/1', True)])
+def test_several_workers_require_redis_chat_state(monkeypatch, workers, url, ok):
+    monkeypatch.setenv('CHAT_STATE_URL', url)
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONFIG)
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    server = SimpleNamespace(cfg=SimpleNamespace(workers=workers))
+    if ok:
+        config.on_starting(server)
+    else:
+        with pytest.raises(RuntimeError):
+            config.on_starting(server)
@@ -0,0 +1,54 @@
+import time
+from datetime import datetime
+from app import socketio
+from app.chat_writer import ChatWriter
+from app.models import db, ChatRoom, ChatMessage
+
+
+def _room():
+    room = ChatRoom(name='general')
+    db.session.add(room)
+    db.session.commit()
+    return room
+
+
+def test_background_task_flushes_and_waits_on_the_servers_event(app, user):
+    room = _room()
+    writer = ChatWriter(socketio, interval=0.01)
+    try:
+        writer.add_message(room.id, user.id, 'hello', 'text', datetime(2026, 3, 1, 9))
+        # The server hands out an event for its async mode; a plain threading.Event would block eventlet's hub
+        assert type(writer._wake) is type(socketio.server.eio.create_event())
+        deadline = time.monotonic() + 5
+        while writer.pending_messages(room.id) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        db.session.expire_all()
+        assert [m.message for m in ChatMessage.query.all()] == ['hello']
+    finally:
+        writer.stop()
+
+
+def test_full_batch_wakes_the_task_early(app, user):
+    room = _room()
+    writer = ChatWriter(socketio, interval=60, batch=2)
+    try:
+        writer.add_message(room.id, user.id, 'one', 'text', datetime(2026, 3, 1, 9))
+        writer.add_message(room.id, user.id, 'two', 'text', datetime(2026, 3, 1, 9, 1))
+        deadline = time.monotonic() + 5
+        while ChatMessage.query.count() < 2 and time.monotonic() < deadline:
+            db.session.remove()
+            time.sleep(0.01)
+        assert ChatMessage.query.count() == 2
+    finally:
+        writer.stop()
+
+
+def test_on_write_gets_the_committed_rows_with_their_ids(app, user):
+    room = _room()
+    written = []
+    writer = ChatWriter(socketio, interval=0, on_write=written.extend)
+    writer.add_message(room.id, user.id, 'one', 'text', datetime(2026, 3, 1, 9))
+    writer.add_message(room.id, user.id, 'two', 'text', datetime(2026, 3, 1, 9, 1))
+
+    ids = {m.message: m.id for m in ChatMessage.query.all()}
+    assert [(row['message'], row['id']) for row in written] == [('one', ids['one']), ('two', ids['two'])]
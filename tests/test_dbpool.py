@@ -0,0 +1,55 @@
+import sqlite3
+import pytest
+from sqlalchemy import exc
+from app.dbpool import InstrumentedQueuePool
+
+
+def _pool(creator, **options):
+    return InstrumentedQueuePool(creator, pool_size=1, max_overflow=0, timeout=0.05, **options)
+
+
+def test_counts_checkouts_and_connects():
+    pool = _pool(lambda: sqlite3.connect(':memory:', check_same_thread=False))
+    pool.connect().close()
+    pool.connect().close()
+    assert (pool.checkouts, pool.connects, pool.timeouts) == (2, 1, 0)
+
+
+def test_full_pool_counts_as_a_timeout():
+    pool = _pool(lambda: sqlite3.connect(':memory:', check_same_thread=False))
+    held = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    held.close()
+    assert pool.timeouts == 1
+
+
+def test_connect_errors_are_not_timeouts():
+    def refuse():
+        raise sqlite3.OperationalError('unable to open database file')
+
+    pool = _pool(refuse)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.connect()
+    assert pool.timeouts == 0
+
+
+def test_debug_pool_is_hidden_outside_debug_mode(app):
+    client = app.test_client()
+    assert client.get('/debug/pool').status_code == 404
+    app.debug = True
+    try:
+        assert client.get('/debug/pool').status_code == 200
+    finally:
+        app.debug = False
+
+
+def test_debug_db_is_hidden_outside_debug_mode(client, app):
+    assert client.get('/debug/db').status_code == 404
+    app.debug = True
+    try:
+        response = client.get('/debug/db')
+        assert response.status_code == 200
+        assert response.get_json()['database_connection'] == 'OK'
+    finally:
+        app.debug = False
@@ -0,0 +1,58 @@
+from datetime import datetime
+import pytest
+from app import exercise_search
+from app.exercise_search import NameIndex, normalize, search_exercises, user_index
+from app.exercises import BUILTIN_CATALOG
+from app.models import db, ExerciseLog
+from tests.conftest import make_user
+
+
+def _index(*names):
+    return NameIndex([{'name': name} for name in names])
+
+
+def _matches(index, query):
+    scores = index.search(normalize(query))
+    return [index.entries[entry_id]['name'] for entry_id in sorted(scores, key=lambda i: -scores[i])]
+
+
+def _log(user, name, times=1):
+    for minute in range(times):
+        db.session.add(ExerciseLog(user_id=user.id, exercise_name=name, exercise_type='strength', sets=3, reps=5,
+                                   workout_time=datetime(2026, 3, 1, 9, minute)))
+    db.session.commit()
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    monkeypatch.setattr(exercise_search, 'get_catalog', lambda: BUILTIN_CATALOG)
+
+
+def test_prefixes_match_the_start_of_any_word():
+    index = _index('Bench Press', 'Incline Bench Press', 'Squat')
+    assert _matches(index, 'bench') == ['Bench Press', 'Incline Bench Press']
+    assert set(_matches(index, 'pre')) == {'Bench Press', 'Incline Bench Press'}
+    assert _matches(index, 'sq') == ['Squat']
+
+
+def test_misspelled_queries_still_find_the_name():
+    index = _index('Dumbbell Rows', 'Barbell Squat', 'Plank')
+    assert _matches(index, 'dumbell rw')[0] == 'Dumbbell Rows'
+    assert 'Plank' not in _matches(index, 'dumbell rw')
+
+
+def test_the_users_own_exercises_rank_above_catalog_matches(app, user, catalog):
+    _log(user, 'Paused Bench Press', times=2)
+    results = search_exercises(user.id, 'bench')
+    assert results[0]['name'] == 'Paused Bench Press'
+    assert (results[0]['source'], results[0]['uses']) == ('history', 2)
+    assert {'Bench Press (Barbell)', 'Dumbbell Bench Press'} <= {r['name'] for r in results[1:]}
+    assert all(r['source'] == 'catalog' for r in results[1:])
+
+
+def test_the_index_cache_keeps_the_most_recently_used_users(app, monkeypatch):
+    monkeypatch.setattr(exercise_search, 'SEARCH_CACHE_SIZE', 2)
+    first, second, third = make_user('Ann'), make_user('Bob'), make_user('Cy')
+    for user in (first, second, first, third):
+        user_index(user.id)
+    assert list(exercise_search._user_indexes) == [first.id, third.id]
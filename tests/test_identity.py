@@ -0,0 +1,28 @@
+from flask import g
+from app import identity
+from app.identity import get_identity
+from tests.conftest import make_user
+
+
+def _lookup(user_id):
+    """get_identity as a fresh request would see it: nothing in the per-request cache"""
+    g.pop('_identities', None)
+    return get_identity(user_id)
+
+
+def test_the_cache_keeps_the_most_recently_used_identities(app, monkeypatch):
+    monkeypatch.setattr(identity, 'IDENTITY_CACHE_SIZE', 2)
+    first, second, third = make_user('Ann'), make_user('Bob'), make_user('Cy')
+    for user in (first, second, first, third):
+        _lookup(user.id)
+    assert list(identity._cache) == [first.id, third.id]
+
+
+def test_expired_identities_are_dropped(app, monkeypatch):
+    ann, bob = make_user('Ann'), make_user('Bob')
+    monkeypatch.setattr(identity, 'IDENTITY_TTL', -1)
+    _lookup(ann.id)
+    monkeypatch.setattr(identity, 'IDENTITY_TTL', 300)
+    _lookup(bob.id)
+    assert list(identity._cache) == [bob.id]
+    assert _lookup(ann.id).name == 'Ann'
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from werkzeug.datastructures import FileStorage
+from app import imports
+from app.imports import create_import, run_import, job_status
+from app.models import db, ImportJob, ExerciseLog, ExerciseSetLog, CalorieEntry
+
+
+def _run(app, user, kind, filename, content):
+    job, path = create_import(user.id, kind, None, FileStorage(io.BytesIO(content.encode()), filename=filename))
+    db.session.commit()
+    run_import(app, job.id, path)
+    db.session.expire_all()
+    return job_status(db.session.get(ImportJob, job.id))
+
+
+def _exercise(minute, **fields):
+    return dict({'workout_time': f'2026-03-01 09:{minute:02d}', 'exercise_name': 'Squat', 'exercise_type': 'strength',
+                 'sets': [{'reps': 5, 'weight': 100}]}, **fields)
+
+
+def _ndjson(records):
+    return '\n'.join(json.dumps(r) for r in records) + '\n'
+
+
+def test_csv_rows_are_grouped_into_exercises(app, user):
+    content = ('workout_time,exercise_name,exercise_type,reps,weight\n'
+               '2026-03-01 09:00,Squat,strength,5,100\n'
+               '2026-03-01 09:00,Squat,strength,5,110\n'
+               '2026-03-01 09:30,Plank,strength,1,\n')
+    status = _run(app, user, 'exercise', 'sets.csv', content)
+    assert (status['status'], status['rows_read'], status['imported'], status['errors']) == ('done', 2, 2, 0)
+    squat = ExerciseLog.query.filter_by(exercise_name='Squat').one()
+    assert (squat.sets, squat.weight) == (2, 110)
+    assert ExerciseSetLog.query.count() == 3
+
+
+def test_badly_shaped_records_are_errors_not_a_failed_job(app, user):
+    records = [_exercise(0), _exercise(1, sets=[5, 5]), _exercise(2, notes={'mood': 'good'}),
+               _exercise(3, exercise_name=['Squat']), 'not an object', _exercise(4)]
+    status = _run(app, user, 'exercise', 'history.json', json.dumps(records))
+    assert (status['status'], status['rows_read'], status['imported'], status['errors']) == ('done', 6, 2, 4)
+    assert [e['line'] for e in status['error_sample']] == [2, 3, 4, 5]
+
+
+def test_importing_the_same_file_again_only_finds_duplicates(app, user):
+    content = ('entry_time,food_item,calories,quantity\n'
+               '2026-03-01 08:00,Oats,350,1\n'
+               '2026-03-01 08:00,Oats,350,1\n'
+               '2026-03-01 19:00,Rice,600,1\n')
+    first = _run(app, user, 'calories', 'food.csv', content)
+    assert (first['imported'], first['duplicates']) == (2, 1)
+    second = _run(app, user, 'calories', 'food.csv', content)
+    assert (second['imported'], second['duplicates']) == (0, 3)
+    assert CalorieEntry.query.count() == 2
+
+
+def test_counters_match_what_was_committed_when_the_file_breaks(app, user, monkeypatch):
+    monkeypatch.setattr(imports, 'IMPORT_BATCH', 2)
+    content = _ndjson([_exercise(0), _exercise(1), _exercise(2)]) + '{"broken\n'
+    status = _run(app, user, 'exercise', 'history.ndjson', content)
+    # The first batch of two was committed; the third record was read but rolled back with the batch
+    assert status['status'] == 'failed'
+    assert (status['rows_read'], status['imported'], status['duplicates']) == (2, 2, 0)
+    assert status['errors'] == 1 and status['error_sample'][0]['error'].startswith('Import stopped')
+    assert status['error_sample'][0]['line'] == 4
+    assert ExerciseLog.query.count() == 2
+
+
+def test_an_unreadable_csv_row_stops_the_job_at_its_line(app, user):
+    content = ('entry_time,food_item,calories,quantity\n'
+               '2026-03-01 08:00,Oats,350,1\n'
+               f'2026-03-01 19:00,"{"x" * (csv.field_size_limit() + 1)}",600,1\n')
+    status = _run(app, user, 'calories', 'food.csv', content)
+    assert (status['status'], status['imported'], status['errors']) == ('failed', 0, 1)
+    assert status['error_sample'][0]['line'] == 3
+    assert 'Invalid CSV on line 3' in status['error_sample'][0]['error']
+
+
+def test_fields_too_long_for_their_column_are_errors_not_a_failed_job(app, user):
+    content = ('entry_time,food_item,calories,quantity\n'
+               '2026-03-01 08:00,Oats,350,1\n'
+               f'2026-03-01 19:00,{"x" * 201},600,1\n')
+    status = _run(app, user, 'calories', 'food.csv', content)
+    assert (status['status'], status['imported'], status['errors']) == ('done', 1, 1)
+    assert status['error_sample'] == [{'line': 3, 'error': 'Food item must be at most 200 characters'}]
+
+    records = [_exercise(0), _exercise(1, exercise_name='x' * 201)]
+    status = _run(app, user, 'exercise', 'history.json', json.dumps(records))
+    assert (status['status'], status['imported'], status['errors']) == ('done', 1, 1)
@@ -0,0 +1,34 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from app import metrics
+
+
+@pytest.mark.parametrize('environ,headers,status', [
+    ({}, {}, 200),
+    ({'REMOTE_ADDR': '10.1.2.3'}, {}, 200),
+    ({'REMOTE_ADDR': '93.184.216.34'}, {}, 403),
+    # Relayed by the proxy on behalf of a public client
+    ({'REMOTE_ADDR': '10.1.2.3'}, {'X-Forwarded-For': '93.184.216.34'}, 403),
+    # A public client claiming to be relayed for a private one
+    ({'REMOTE_ADDR': '93.184.216.34'}, {'X-Forwarded-For': '10.1.2.3'}, 403),
+])
+def test_without_a_token_only_private_addresses_read_metrics(app, environ, headers, status):
+    response = app.test_client().get('/metrics', environ_base=environ, headers=headers)
+    assert response.status_code == status
+
+
+def test_concurrent_reports_count_pool_checkouts_once(monkeypatch):
+    stats = {'size': 5, 'checked_out': 0, 'checked_in': 5, 'overflow': 0,
+             'checkouts': 0, 'connects': 0, 'timeouts': 0, 'wait_ms_total': 0.0}
+    monkeypatch.setattr(metrics, 'pool_stats', lambda engine: dict(stats))
+    monkeypatch.setattr(metrics, '_pool_reported', {'checkouts': 0, 'connects': 0, 'timeouts': 0, 'wait_ms_total': 0.0})
+    before = metrics.DB_POOL_CHECKOUTS._value.get()
+    stats['checkouts'] = 1000
+
+    threads = [threading.Thread(target=metrics.update_pool_metrics, args=(SimpleNamespace(),)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.DB_POOL_CHECKOUTS._value.get() - before == 1000
@@ -0,0 +1,107 @@
+import importlib.util
+import os
+from datetime import datetime
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app.models import db, PersonalRecord, ExerciseLog, ExerciseSetLog
+from app.personal_records import records_for, rebuild_personal_records, e1rm
+from app.workouts import parse_exercise, save_exercises
+from tests.conftest import make_user
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations', 'versions',
+                         '012_personal_records.py')
+
+
+def _log(user, when, sets, name='Bench Press'):
+    new_records = []
+    save_exercises(user.id, [parse_exercise({'exercise_name': name, 'exercise_type': 'strength',
+                                             'workout_time': when, 'sets': sets})], new_records)
+    db.session.commit()
+    return new_records
+
+
+def _records(user_id):
+    return sorted((r.exercise_name, r.kind, r.at_weight, r.value, r.exercise_log_id, r.set_number, r.achieved_at)
+                  for r in PersonalRecord.query.filter_by(user_id=user_id))
+
+
+def test_first_sets_set_every_record(user):
+    changed = _log(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100, 'form_score': 4, 'effort_score': 8},
+                                              {'reps': 8, 'weight': 80}])
+    assert {(r['kind'], r['at_weight']) for r in changed} == {('weight', 0), ('e1rm', 0), ('reps', 100),
+                                                               ('reps', 80), ('quality', 0)}
+    assert all(r['previous'] is None for r in changed)
+
+    bench = records_for(user.id)[0]
+    assert bench['weight']['value'] == 100
+    assert bench['e1rm']['value'] == max(e1rm(100, 5), e1rm(80, 8))
+    assert [(r['at_weight'], r['value']) for r in bench['reps_at_weight']] == [(80, 8), (100, 5)]
+    assert bench['quality']['value'] == 3.2
+
+
+def test_only_better_sets_raise_a_record(user):
+    _log(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100}])
+    assert _log(user, '2026-03-02 09:00', [{'reps': 3, 'weight': 100}]) == []
+    # A tie keeps the earlier set and is not announced
+    assert _log(user, '2026-03-03 09:00', [{'reps': 5, 'weight': 100}]) == []
+
+    changed = _log(user, '2026-03-04 09:00', [{'reps': 2, 'weight': 110}])
+    assert {(r['kind'], r['previous']) for r in changed} == {('weight', 100), ('e1rm', e1rm(100, 5)), ('reps', None)}
+    first = ExerciseLog.query.filter_by(workout_time=datetime(2026, 3, 1, 9)).one()
+    reps_at_100 = PersonalRecord.query.filter_by(user_id=user.id, kind='reps', at_weight=100).one()
+    assert reps_at_100.exercise_log_id == first.id
+
+
+def test_rebuild_after_deleting_the_record_set(user):
+    _log(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100}])
+    _log(user, '2026-03-02 09:00', [{'reps': 1, 'weight': 140}])
+    best = ExerciseLog.query.filter_by(workout_time=datetime(2026, 3, 2, 9)).one()
+    ExerciseSetLog.query.filter_by(exercise_log_id=best.id).delete()
+    db.session.delete(best)
+    rebuild_personal_records(user.id, ['Bench Press'])
+    db.session.commit()
+
+    bench = records_for(user.id)[0]
+    assert (bench['weight']['value'], bench['e1rm']['value']) == (100, e1rm(100, 5))
+
+
+def test_incremental_records_match_a_rebuild_and_the_migration_backfill(app, user):
+    other = make_user('Other')
+    _log(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100, 'form_score': 5, 'effort_score': 9},
+                                    {'reps': 12, 'weight': 60}])
+    _log(user, '2026-03-02 09:00', [{'reps': 6, 'weight': 100}, {'reps': 15}], name='Push Up')
+    _log(user, '2026-03-03 09:00', [{'reps': 5, 'weight': 100}, {'reps': 3, 'weight': 105}])
+    _log(other, '2026-03-01 09:00', [{'reps': 20}], name='Push Up')
+    # A log from before per-set rows existed
+    db.session.add(ExerciseLog(user_id=user.id, exercise_name='Squat', exercise_type='strength', sets=3, reps=5, weight=120, form_score=4,
+                               effort_score=7, workout_time=datetime(2026, 2, 1, 9)))
+    db.session.commit()
+    rebuild_personal_records(user.id, ['Squat'])
+    db.session.commit()
+    incremental = {u.id: _records(u.id) for u in (user, other)}
+
+    for u in (user, other):
+        rebuild_personal_records(u.id)
+    db.session.commit()
+    assert {u.id: _records(u.id) for u in (user, other)} == incremental
+
+    spec = importlib.util.spec_from_file_location('migration_012', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    PersonalRecord.__table__.drop(db.engine)
+    with db.engine.begin() as conn, Operations.context(MigrationContext.configure(conn)):
+        migration.upgrade()
+    assert {u.id: _records(u.id) for u in (user, other)} == incremental
+
+
+def test_api_records_and_workout_notices(client, user):
+    _log(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100}])
+    response = client.post('/api/workouts', json={'exercises': [
+        {'exercise_name': 'Bench Press', 'exercise_type': 'strength', 'workout_time': '2026-03-02T09:00',
+         'sets': [{'reps': 5, 'weight': 105}]}]})
+    notices = {n['kind']: n for n in response.get_json()['personal_records']}
+    assert notices['weight']['previous'] == 100 and notices['weight']['value'] == 105
+    assert notices['weight']['message'] == 'Bench Press: heaviest weight 105 (was 100)'
+
+    records = client.get('/api/records?exercise=Bench Press').get_json()['records']
+    assert records[0]['weight']['value'] == 105
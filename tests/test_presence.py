@@ -0,0 +1,34 @@
+import time
+from app import socketio
+from app.chat_writer import ChatWriter
+from app.presence import MemoryPresenceStore, Presence
+
+
+class Recorder:
+    """Stands in for the SocketIO server: keeps what would have been emitted"""
+
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+
+def test_sweep_announces_rooms_only_another_worker_joined(app, user):
+    # Two workers sharing one store; only the first one's connection joined the room
+    store = MemoryPresenceStore()
+    store.touch(7, 'general', 'sid-1', user.id, time.time() - 120)
+
+    recorder = Recorder()
+    other_worker = Presence(recorder, ChatWriter(socketio, interval=0), store=store, ttl=60)
+    other_worker.sweep()
+    other_worker.flush()
+
+    assert recorder.emitted == [('presence', {'room': 'general', 'joined': [], 'left': [user.id]}, 'general')]
+    assert store.users(7, 0) == set()
+
+
+def test_room_names_come_from_the_store():
+    store = MemoryPresenceStore()
+    store.touch(1, 'general', 'sid-1', 5, time.time())
+    assert store.room_names([1, 2]) == {1: 'general'}
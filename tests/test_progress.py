@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+from app.models import db
+from app.progress import progress, estimated_1rm, window_days, MAX_WINDOW_DAYS
+from app.workouts import parse_exercise, save_exercises
+
+
+def _log(user, when, sets, name='Bench Press'):
+    save_exercises(user.id, [parse_exercise({'exercise_name': name, 'exercise_type': 'strength',
+                                             'workout_time': when, 'sets': sets})])
+    db.session.commit()
+
+
+def test_e1rm_formulas():
+    weights, reps = np.array([100.0, 100.0, 100.0, 0.0, 100.0]), np.array([1.0, 5.0, 10.0, 5.0, 15.0])
+    epley = estimated_1rm(weights, reps, 'epley')
+    assert epley[:3].tolist() == pytest.approx([100.0, 100 * (1 + 5 / 30), 100 * (1 + 10 / 30)])
+    # Bodyweight sets and rep counts past E1RM_MAX_REPS have no estimate
+    assert np.isnan(epley[3]) and np.isnan(epley[4])
+    brzycki = estimated_1rm(weights, reps, 'brzycki')
+    assert brzycki[:3].tolist() == pytest.approx([100.0, 100 * 36 / 32, 100 * 36 / 27])
+
+
+def test_sessions_rolling_averages_and_prs(user):
+    _log(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100}, {'reps': 3, 'weight': 110}])
+    _log(user, '2026-03-01 18:00', [{'reps': 10, 'weight': 60}])
+    _log(user, '2026-03-08 09:00', [{'reps': 5, 'weight': 95}])
+    _log(user, '2026-03-15 09:00', [{'reps': 1, 'weight': 130}, {'reps': 20, 'weight': 40}])
+    _log(user, '2026-03-15 09:00', [{'reps': 8, 'weight': 50}], name='Squat')
+
+    result = progress(user.id, 'Bench Press', window=7)
+    sessions, summary = result['sessions'], result['summary']
+    best = [max(110 * (1 + 3 / 30), 100 * (1 + 5 / 30), 60 * (1 + 10 / 30)), 95 * (1 + 5 / 30), 130]
+    assert sessions['dates'] == ['2026-03-01', '2026-03-08', '2026-03-15']
+    assert sessions['best_e1rm'] == [round(v, 1) for v in best]
+    assert sessions['top_weight'] == [110, 95, 130]
+    assert sessions['sets'] == [3, 1, 2]
+    assert sessions['reps'] == [18, 5, 21]
+    assert sessions['volume'] == [500 + 330 + 600, 475, 130 + 800]
+    # A 7-day window holds only the session itself at weekly spacing
+    assert sessions['rolling_e1rm'] == sessions['best_e1rm']
+    assert sessions['pr'] == [True, False, True]
+    assert summary['prs'] == 2
+    assert summary['best_e1rm'] == {'value': 130.0, 'date': '2026-03-15'}
+    assert summary['sets'] == 6
+
+    wide = progress(user.id, 'Bench Press', window=28)['sessions']['rolling_e1rm']
+    assert wide == [round(best[0], 1), round((best[0] + best[1]) / 2, 1), round(sum(best) / 3, 1)]
+
+
+def test_window_days_is_clamped():
+    assert window_days(None) == 28
+    assert window_days('junk') == 28
+    assert window_days('0') == 1
+    assert window_days('100000') == MAX_WINDOW_DAYS
+
+
+def test_api_progress(client, user):
+    _log(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100}])
+    assert client.get('/api/progress/Bench Press').get_json()['summary']['sessions'] == 1
+    assert client.get('/api/progress/Squat').status_code == 404
+    assert client.get('/api/progress/Bench Press?formula=lombardi').status_code == 400
+    assert client.get('/api/progress/Bench Press?days=soon').status_code == 400
+    # Lookbacks past what a date can hold are clamped instead of overflowing
+    assert client.get('/api/progress/Bench Press?days=99999999999').status_code == 200
+    # A lookback under one day means just today, when nothing was logged
+    assert client.get('/api/progress/Bench Press?days=-5').status_code == 404
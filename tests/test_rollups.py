@@ -0,0 +1,98 @@
+from datetime import date, datetime
+from app.models import db, DailyUserSummary, ExerciseSetLog, ExerciseLog
+from app.rollups import record_calories, record_energy_burn, summaries_between, exercise_summary_stats
+from app.entries import save_calories, save_energy_burns
+from app.workouts import parse_exercise, save_exercises
+from tests.conftest import make_user
+
+
+def _exercise(when, sets, name='Bench Press'):
+    return parse_exercise({'exercise_name': name, 'exercise_type': 'strength',
+                           'workout_time': when, 'sets': sets})
+
+
+def _summary(user_id, day):
+    return DailyUserSummary.query.filter_by(user_id=user_id, day=day).one()
+
+
+def test_calories_and_burns_add_up_per_day(user):
+    record_calories(user.id, datetime(2026, 3, 1, 8), 300)
+    record_calories(user.id, date(2026, 3, 1), 200)
+    record_energy_burn(user.id, date(2026, 3, 1), 'neat', 120)
+    record_energy_burn(user.id, date(2026, 3, 1), 'cardio', 80)
+    record_energy_burn(user.id, date(2026, 3, 1), 'swimming', 50)
+    db.session.commit()
+
+    row = _summary(user.id, date(2026, 3, 1))
+    assert row.calories_in == 500
+    assert (row.burned_neat, row.burned_cardio, row.burned_other) == (120, 80, 50)
+    assert row.calories_burned == 250
+    assert DailyUserSummary.query.count() == 1
+
+
+def test_save_helpers_bump_each_day_once(user):
+    save_calories(user.id, [
+        {'food_item': 'Oats', 'calories': 350, 'quantity': '1', 'entry_time': datetime(2026, 3, 1, 8), 'notes': ''},
+        {'food_item': 'Rice', 'calories': 600, 'quantity': '1', 'entry_time': datetime(2026, 3, 1, 19), 'notes': ''},
+        {'food_item': 'Eggs', 'calories': 200, 'quantity': '2', 'entry_time': datetime(2026, 3, 2, 8), 'notes': ''},
+    ])
+    save_energy_burns(user.id, [
+        {'source': 'neat', 'activity_name': 'Walk', 'calories_burned': 150, 'duration_minutes': 30,
+         'entry_time': datetime(2026, 3, 2, 12), 'notes': ''},
+    ])
+    db.session.commit()
+
+    rows = summaries_between(user.id, date(2026, 3, 1), date(2026, 3, 3))
+    assert rows[date(2026, 3, 1)].calories_in == 950
+    assert rows[date(2026, 3, 2)].calories_in == 200
+    assert rows[date(2026, 3, 2)].burned_neat == 150
+
+
+def test_exercises_match_a_recount_of_the_raw_rows(user):
+    first = [_exercise('2026-03-01 09:00', [{'reps': 5, 'weight': 100, 'form_score': 4, 'effort_score': 8},
+                                             {'reps': 5, 'weight': 110, 'form_score': 3, 'effort_score': 9}]),
+             _exercise('2026-03-02 09:00', [{'reps': 12}], name='Push Up')]
+    save_exercises(user.id, first)
+    db.session.commit()
+    # A later batch spanning an existing day and a new one updates one row and inserts the other
+    save_exercises(user.id, [_exercise('2026-03-01 18:00', [{'reps': 3, 'weight': 120}]),
+                             _exercise('2026-03-03 09:00', [{'reps': 8, 'weight': 60}])])
+    db.session.commit()
+
+    for day in (date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 3)):
+        row = _summary(user.id, day)
+        start, end = datetime.combine(day, datetime.min.time()), datetime.combine(day, datetime.max.time())
+        logs = ExerciseLog.query.filter(ExerciseLog.user_id == user.id, ExerciseLog.workout_time.between(start, end)).all()
+        sets = ExerciseSetLog.query.filter(ExerciseSetLog.exercise_log_id.in_([log.id for log in logs])).all()
+        assert row.exercises == len(logs)
+        assert row.sets == sum(log.sets for log in logs)
+        assert row.volume == sum(s.reps * (s.weight or 0) for s in sets)
+        assert row.max_weight == max((log.weight for log in logs if log.weight), default=None)
+        assert row.form_count == sum(1 for s in sets if s.form_score is not None)
+        assert row.quality_sum == sum(s.quality_score for s in sets if s.quality_score is not None)
+
+    assert _summary(user.id, date(2026, 3, 1)).max_weight == 120
+    assert _summary(user.id, date(2026, 3, 1)).avg_form == 3.5
+
+
+def test_rows_are_per_user(app):
+    alice, bob = make_user('Alice'), make_user('Bob')
+    record_calories(alice.id, date(2026, 3, 1), 100)
+    record_calories(bob.id, date(2026, 3, 1), 900)
+    db.session.commit()
+    assert _summary(alice.id, date(2026, 3, 1)).calories_in == 100
+    assert _summary(bob.id, date(2026, 3, 1)).calories_in == 900
+
+
+def test_dashboard_stats_cover_the_range(user):
+    save_exercises(user.id, [_exercise('2026-03-02 09:00', [{'reps': 10, 'weight': 50, 'form_score': 4, 'effort_score': 5}]),
+                             _exercise('2026-02-28 09:00', [{'reps': 10, 'weight': 500}])])
+    db.session.commit()
+
+    stats = exercise_summary_stats(user.id, date(2026, 3, 1), date(2026, 3, 4))
+    assert stats['workouts'] == 1
+    assert stats['volume'] == 500
+    assert stats['max_weight'] == 50
+    assert stats['trend_labels'] == ['03/01', '03/02', '03/03']
+    assert stats['trend_volume'] == [0, 500, 0]
+    assert stats['trend_form'] == [None, 4.0, None]
@@ -0,0 +1,93 @@
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import sync
+from app.models import CalorieEntry, ExerciseLog, SyncKey
+from app.sync import sync_entries
+from tests.conftest import make_user
+
+
+def _calories(key, food='Oats', calories='350'):
+    return {'key': key, 'type': 'calories', 'data': {'food-item': food, 'calories': calories, 'quantity': '1'},
+            'queued_at': '2026-03-01T08:00:00'}
+
+
+def test_a_retried_batch_creates_nothing_twice(user):
+    first = sync_entries(user.id, [_calories('a'), _calories('b', 'Rice', '600')])
+    assert [r['status'] for r in first] == ['created', 'created']
+
+    again = sync_entries(user.id, [_calories('a'), _calories('b', 'Rice', '600'), _calories('c', 'Eggs', '200')])
+    assert [r['status'] for r in again] == ['duplicate', 'duplicate', 'created']
+    assert [r['id'] for r in again[:2]] == [r['id'] for r in first]
+    assert CalorieEntry.query.count() == 3
+    assert SyncKey.query.count() == 3
+
+
+def test_a_key_repeated_in_one_batch_is_saved_once(user):
+    results = sync_entries(user.id, [_calories('a'), _calories('a')])
+    assert [r['status'] for r in results] == ['created', 'duplicate']
+    assert results[0]['id'] == results[1]['id']
+    assert CalorieEntry.query.count() == 1
+
+
+def test_keys_are_per_user(app, user):
+    other = make_user('Other')
+    sync_entries(user.id, [_calories('a')])
+    assert sync_entries(other.id, [_calories('a')])[0]['status'] == 'created'
+
+
+@pytest.mark.parametrize('item,error', [
+    ('not an object', 'each item must be an object'),
+    ({'key': '', 'type': 'calories', 'data': {}}, 'key must be'),
+    ({'key': 'x' * 65, 'type': 'calories', 'data': {}}, 'key must be'),
+    ({'key': 'k', 'type': 'sleep', 'data': {}}, 'type must be one of'),
+    ({'key': 'k', 'type': 'calories', 'data': ['food']}, 'data must be an object'),
+    ({'key': 'k', 'type': 'neat', 'data': {'activity-name': 'Walk', 'calories-burned': [100]}}, 'data values'),
+    ({'key': 'k', 'type': 'food', 'data': {'meal-type': 'lunch', 'food-name': 'Soup', 'portion-size': '1',
+                                           'meal-time': 1700000000}}, 'data values'),
+    (_calories('k', calories='lots'), 'Calories must be a number'),
+    # Too long for the column: strict MariaDB would fail the whole batch with a DataError
+    (_calories('k', food='x' * 201), 'Food item must be at most 200'),
+    ({'key': 'k', 'type': 'neat', 'data': {'source': 'x' * 21, 'activity-name': 'Walk', 'calories-burned': '100'}},
+     'Source must be at most 20'),
+    ({'key': 'k', 'type': 'exercise', 'data': {'exercise-name': 'x' * 201, 'exercise-type': 'strength', 'sets': '3',
+                                               'reps': '5', 'workout-time': '2026-03-01T08:00'}},
+     'exercise_name must be at most 200'),
+])
+def test_invalid_items_are_errors_and_the_rest_is_saved(user, item, error):
+    results = sync_entries(user.id, [item, _calories('ok')])
+    assert results[0]['status'] == 'error' and error in results[0]['error']
+    assert results[1]['status'] == 'created'
+    assert CalorieEntry.query.count() == 1
+
+
+def test_losing_every_race_reports_duplicates_and_retries(user, monkeypatch):
+    sync_entries(user.id, [_calories('a')])
+
+    def conflict(*args):
+        raise IntegrityError('INSERT INTO sync_key', {}, Exception('duplicate key'))
+
+    monkeypatch.setattr(sync, '_save_batch', conflict)
+    results = sync_entries(user.id, [_calories('a'), _calories('b'), {'key': 'c', 'type': 'sleep'}])
+    assert [r['status'] for r in results] == ['duplicate', 'retry', 'error']
+    assert CalorieEntry.query.count() == 1
+
+
+@pytest.mark.parametrize('body', [[1, 2], 'items', {'items': {}}, {'items': []}, {}])
+def test_api_sync_rejects_malformed_bodies(client, body):
+    response = client.post('/api/sync', json=body)
+    assert response.status_code == 400
+
+
+def test_api_sync_counts_results(client):
+    response = client.post('/api/sync', json={'items': [_calories('a'), _calories('a'), {'key': 'b'}]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['created'], body['duplicate'], body['error'], body['retry']) == (1, 1, 1, 0)
+
+
+def test_an_exercise_without_a_time_is_logged_when_it_was_queued(user):
+    item = {'key': 'e', 'type': 'exercise', 'queued_at': '2026-03-01T07:30:00',
+            'data': {'exercise-name': 'Squat', 'exercise-type': 'strength', 'sets': '3', 'reps': '5'}}
+    assert sync_entries(user.id, [item])[0]['status'] == 'created'
+    assert ExerciseLog.query.one().workout_time == datetime(2026, 3, 1, 7, 30)
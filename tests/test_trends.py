@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+import pytest
+from app import trends as trends_module
+from app.models import db
+from app.rollups import record_calories, exercise_summary_stats
+from app.trends import build_trends, trends, invalidate_user_trends, MAX_RANGE_DAYS
+from app.workouts import parse_exercise, save_exercises
+from tests.conftest import make_user
+
+
+def _lift(user, when, sets):
+    save_exercises(user.id, [parse_exercise({'exercise_name': 'Squat', 'exercise_type': 'strength',
+                                             'workout_time': when, 'sets': sets})])
+
+
+@pytest.fixture
+def history(user):
+    # Sun 1 Mar .. Tue 31 Mar 2026, plus one day in April
+    _lift(user, '2026-03-01 09:00', [{'reps': 5, 'weight': 100, 'form_score': 4, 'effort_score': 8}])
+    _lift(user, '2026-03-02 09:00', [{'reps': 5, 'weight': 110, 'form_score': 2, 'effort_score': 6},
+                                     {'reps': 5, 'weight': 110, 'form_score': 3, 'effort_score': 6}])
+    _lift(user, '2026-03-10 09:00', [{'reps': 3, 'weight': 120}])
+    record_calories(user.id, date(2026, 3, 2), 2000)
+    record_calories(user.id, date(2026, 4, 1), 1500)
+    db.session.commit()
+    return user
+
+
+def test_days_include_empty_ones(history):
+    result = build_trends(history.id, date(2026, 3, 1), date(2026, 3, 3))
+    assert result['labels'] == ['2026-03-01', '2026-03-02', '2026-03-03']
+    assert result['series']['volume'] == [500, 1100, 0]
+    assert result['series']['calories_in'] == [0, 2000, 0]
+    assert result['series']['avg_form'] == [4.0, 2.5, None]
+    assert result['series']['max_weight'] == [100, 110, None]
+
+
+def test_weeks_start_on_monday_and_average_by_set(history):
+    result = build_trends(history.id, date(2026, 3, 1), date(2026, 3, 15), 'week')
+    # 1 Mar is a Sunday: a partial first week, then the weeks of 2 and 9 March
+    assert result['labels'] == ['2026-02-23', '2026-03-02', '2026-03-09']
+    assert result['series']['active_days'] == [1, 1, 1]
+    assert result['series']['sets'] == [1, 2, 1]
+    totals = result['totals']
+    # Weighted by sets: (4 + 2 + 3) / 3, not the mean of the daily averages
+    assert totals['avg_form'] == 3.0
+    assert (totals['volume'], totals['max_weight'], totals['calories_in']) == (1960, 120, 2000)
+
+
+def test_months_and_years(history):
+    months = build_trends(history.id, date(2026, 1, 15), date(2026, 4, 30), 'month')
+    assert months['labels'] == ['2026-01-01', '2026-02-01', '2026-03-01', '2026-04-01']
+    assert months['series']['calories_in'] == [0, 0, 2000, 1500]
+    years = build_trends(history.id, date(2025, 6, 1), date(2026, 12, 31), 'year')
+    assert years['labels'] == ['2025-01-01', '2026-01-01']
+    assert years['series']['exercises'] == [0, 3]
+
+
+def test_long_ranges_are_merged_down_to_the_requested_points(history):
+    full = build_trends(history.id, date(2026, 3, 1), date(2026, 3, 31))
+    merged = build_trends(history.id, date(2026, 3, 1), date(2026, 3, 31), points=4)
+    # 31 days in at most 4 points: runs of 8 days, the last one partial
+    assert merged['bucket_size'] == 8
+    assert merged['labels'] == ['2026-03-01', '2026-03-09', '2026-03-17', '2026-03-25']
+    assert merged['series']['volume'] == [1600, 360, 0, 0]
+    assert merged['series']['max_weight'] == [110, 120, None, None]
+    assert merged['totals'] == full['totals']
+
+
+def test_cache_is_dropped_when_the_user_saves(history):
+    other = make_user('Other')
+    first = trends(history.id, date(2026, 3, 1), date(2026, 3, 31))
+    other_first = trends(other.id, date(2026, 3, 1), date(2026, 3, 31))
+    assert trends(history.id, date(2026, 3, 1), date(2026, 3, 31)) is first
+
+    record_calories(history.id, date(2026, 3, 5), 300)
+    db.session.commit()
+    assert trends(history.id, date(2026, 3, 1), date(2026, 3, 31))['totals']['calories_in'] == 2300
+    # Only that user's entries are dropped
+    assert trends(other.id, date(2026, 3, 1), date(2026, 3, 31)) is other_first
+
+
+def test_cache_is_a_bounded_lru(history, monkeypatch):
+    monkeypatch.setattr(trends_module, 'TRENDS_CACHE_SIZE', 2)
+    day = date(2026, 3, 1)
+    first = trends(history.id, day, day)
+    trends(history.id, day, day + timedelta(days=1))
+    assert trends(history.id, day, day) is first        # now the most recently used
+    trends(history.id, day, day + timedelta(days=2))    # evicts the second range
+    assert len(trends_module._cache) == 2
+    assert trends(history.id, day, day) is first
+
+
+def test_dashboard_series_is_never_stale(history):
+    start, end = date(2026, 3, 1), date(2026, 3, 4)
+    trends(history.id, start, end - timedelta(days=1), 'day', 1000)
+    # Written behind this process's back, as another worker would
+    trends_module._cache[next(iter(trends_module._cache))][1]['series']['volume'][:] = [0, 0, 0]
+    stats = exercise_summary_stats(history.id, start, end)
+    assert stats['trend_volume'] == [500, 1100, 0]
+    assert stats['volume'] == sum(stats['trend_volume'])
+
+
+@pytest.mark.parametrize('query', ['resolution=hour', 'days=many', 'start=yesterday', 'start=2026-03-05&end=2026-03-01',
+                                   'start=1990-01-01&end=2026-03-01', 'end=0001-01-05&days=30'])
+def test_api_trends_rejects_bad_ranges(client, query):
+    assert client.get(f'/api/trends?{query}').status_code == 400
+
+
+def test_api_trends_clamps_days(client, history):
+    huge = client.get('/api/trends?end=2026-03-31&days=99999999999&resolution=year')
+    assert huge.status_code == 200
+    body = huge.get_json()
+    assert (date(2026, 3, 31) - date.fromisoformat(body['start'])).days == MAX_RANGE_DAYS - 1
+    assert body['totals']['exercises'] == 3
+    assert client.get('/api/trends?end=2026-03-31&days=0').get_json()['start'] == '2026-03-31'
@@ -0,0 +1,97 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import pytest
+from app.models import ExerciseLog, ExerciseSetLog
+from app.workouts import parse_exercise, MAX_SETS
+
+
+def _exercise(**fields):
+    return dict({'exercise_name': 'Bench Press', 'exercise_type': 'strength', 'workout_time': '2026-03-01T09:00'}, **fields)
+
+
+def test_logs_a_workout_in_one_request(client):
+    response = client.post('/api/workouts', json={'exercises': [
+        _exercise(sets=[{'reps': 5, 'weight': 100, 'form_score': 4, 'effort_score': 8}, {'reps': 4, 'weight': 105}]),
+        _exercise(exercise_name='Squat', sets=3, reps=5, weight=140),
+    ]})
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['logged'] == 2 and body['sets'] == 5
+    assert ExerciseSetLog.query.count() == 5
+    squat = ExerciseLog.query.filter_by(exercise_name='Squat').one()
+    assert [s.set_number for s in ExerciseSetLog.query.filter_by(exercise_log_id=squat.id)] == [1, 2, 3]
+
+
+def test_set_scores_summarize_to_the_log():
+    entry = parse_exercise(_exercise(sets=[{'reps': 5, 'weight': 100, 'form_score': 4, 'effort_score': 8},
+                                           {'reps': 5, 'weight': 110, 'form_score': 2, 'effort_score': 6}]))
+    assert entry['weight'] == 110
+    assert (entry['form_score'], entry['effort_score']) == (3, 7)
+    assert entry['set_rows'][0]['quality_score'] == 3.2
+
+
+@pytest.mark.parametrize('payload', [
+    [{'exercises': []}],
+    'not an object',
+    {'exercises': 'bench'},
+    {'exercises': []},
+    {'exercises': ['bench']},
+])
+def test_rejects_malformed_payloads(client, payload):
+    response = client.post('/api/workouts', json=payload)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('exercise', [
+    _exercise(exercise_name=42, sets=1, reps=5),
+    _exercise(exercise_type=['strength'], sets=1, reps=5),
+    _exercise(sets=['5x100']),
+    _exercise(sets=[{'reps': 5}, None]),
+    _exercise(sets=-3, reps=5),
+    _exercise(sets=0, reps=5),
+    _exercise(sets=MAX_SETS + 1, reps=5),
+    _exercise(sets=10 ** 9, reps=5),
+    _exercise(sets=[{'reps': 5}] * (MAX_SETS + 1)),
+    _exercise(sets='three', reps=5),
+    _exercise(sets=[{'reps': 5, 'form_score': 9}]),
+    _exercise(sets=[{'weight': 100}]),
+    _exercise(workout_time='yesterday', sets=1, reps=5),
+    _exercise(sets=[{'reps': 5, 'weight': 'nan'}]),
+    _exercise(sets=1, reps=5, weight='inf'),
+    _exercise(sets=1, reps=5, notes=['felt good']),
+])
+def test_rejects_invalid_exercises_without_saving_any(client, exercise):
+    response = client.post('/api/workouts', json={'exercises': [_exercise(sets=1, reps=5), exercise]})
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('exercises[1]: ')
+    assert ExerciseLog.query.count() == 0
+
+
+def test_set_count_bounds_are_inclusive():
+    assert len(parse_exercise(_exercise(sets=1, reps=5))['set_rows']) == 1
+    assert len(parse_exercise(_exercise(sets=MAX_SETS, reps=5))['set_rows']) == MAX_SETS
+
+
+def test_requires_login(app):
+    assert app.test_client().post('/api/workouts', json={'exercises': [_exercise(sets=1, reps=5)]}).status_code == 401
+
+
+@pytest.mark.parametrize('body', [
+    # Flask's JSON parser accepts these bare constants
+    '{"exercises": [{"exercise_name": "Squat", "exercise_type": "strength", "workout_time": "2026-03-01T09:00", '
+    '"sets": [{"reps": 5, "weight": NaN}]}]}',
+    '{"exercises": [{"exercise_name": "Squat", "exercise_type": "strength", "workout_time": "2026-03-01T09:00", '
+    '"sets": 1, "reps": Infinity}]}',
+])
+def test_rejects_non_finite_numbers(client, body):
+    response = client.post('/api/workouts', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert ExerciseLog.query.count() == 0
+
+
+def test_times_with_an_offset_are_stored_as_local_wall_clock_time():
+    entry = parse_exercise(_exercise(sets=1, reps=5, workout_time='2026-03-01T09:00:00+00:00'),
+                           tz=ZoneInfo('America/New_York'))
+    assert entry['workout_time'] == datetime(2026, 3, 1, 4, 0)
+    assert entry['workout_time'].tzinfo is None